@@ -0,0 +1,138 @@
+"""Spike detection over per-State x Violation_Type violation count series.
+
+All series are built in one batched pivot (a single bincount over combined
+series/period codes) and scored together: rolling medians and MADs come from
+sorting every trailing window of every series at once, so there is no Python
+loop per series.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+SERIES_DIMENSIONS = ["State", "Violation_Type"]
+FREQUENCIES = {"Daily": 1, "Weekly": 7}
+
+DEFAULT_WINDOW = 28
+DEFAULT_THRESHOLD = 3.5
+DEFAULT_MIN_COUNT = 3
+# MAD of sparse count series is often 0; never divide by less than this
+MIN_SCALE = 1.0
+MAD_TO_SIGMA = 1.4826
+# Series scored per block; bounds the memory of the materialized windows
+_BLOCK_SERIES = 512
+
+
+def count_series(df, dims=SERIES_DIMENSIONS, date_col="Date"):
+    """Daily counts for every observed combination of dims.
+
+    Returns {"keys": DataFrame of dims, "counts": (series x days) int array,
+    "start": first day}.
+    """
+    empty = {"keys": pd.DataFrame(columns=dims), "counts": np.zeros((0, 0), dtype=np.int64), "start": None}
+    if df.empty or any(d not in df.columns for d in dims + [date_col]):
+        return empty
+    days = df[date_col].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    valid = ~np.isnat(days)
+    codes, categories = [], []
+    for dim in dims:
+        values = df[dim] if isinstance(df[dim].dtype, pd.CategoricalDtype) else df[dim].astype("category")
+        codes.append(values.cat.codes.to_numpy().astype(np.int64))
+        categories.append(values.cat.categories)
+        valid &= codes[-1] >= 0
+    if not valid.any():
+        return empty
+
+    start = days[valid].min()
+    offset = (days[valid] - start).astype(np.int64)
+    n_days = int(offset.max()) + 1
+    key = np.ravel_multi_index([c[valid] for c in codes], [len(c) for c in categories])
+    n_keys = int(np.prod([len(c) for c in categories]))
+    counts = np.bincount(key * n_days + offset, minlength=n_keys * n_days).reshape(n_keys, n_days)
+
+    observed = counts.any(axis=1)
+    keys = pd.MultiIndex.from_product(categories, names=dims)[observed].to_frame(index=False)
+    return {"keys": keys, "counts": counts[observed], "start": pd.Timestamp(start)}
+
+
+def resample(counts, step):
+    """Sum consecutive blocks of step periods (the last block may be partial)."""
+    if step == 1 or counts.size == 0:
+        return counts
+    pad = -counts.shape[1] % step
+    counts = np.pad(counts, ((0, 0), (0, pad)))
+    return counts.reshape(counts.shape[0], -1, step).sum(axis=2)
+
+
+def rolling_baseline(counts, window=DEFAULT_WINDOW):
+    """Median and MAD of the window periods before each period, for every series.
+
+    Periods without a full trailing window get NaN.
+    """
+    n, p = counts.shape
+    median = np.full((n, p), np.nan)
+    mad = np.full((n, p), np.nan)
+    if p <= window:
+        return median, mad
+    lo, hi = (window - 1) // 2, window // 2
+    # Sorting is the hot path and runs fastest on the narrowest integer type;
+    # intermediates reach four times the largest count
+    dtype = np.int16 if 4 * counts.max() <= np.iinfo(np.int16).max else np.int64
+    for first in range(0, n, _BLOCK_SERIES):
+        block = counts[first:first + _BLOCK_SERIES].astype(dtype)
+        # windows[:, j] covers periods j .. j+window-1, the baseline for period j+window
+        windows = np.sort(sliding_window_view(block[:, :-1], window, axis=1), axis=2)
+        mid2 = windows[..., lo] + windows[..., hi]  # twice the median, kept integral
+        deviations = np.abs(2 * windows - mid2[..., None])
+        deviations.sort(axis=2)
+        median[first:first + _BLOCK_SERIES, window:] = mid2 / 2
+        mad[first:first + _BLOCK_SERIES, window:] = (deviations[..., lo].astype(np.int64) + deviations[..., hi]) / 4
+    return median, mad
+
+
+def robust_zscores(counts, window=DEFAULT_WINDOW):
+    """(z, baseline) arrays: distance from the rolling median in robust standard deviations."""
+    median, mad = rolling_baseline(counts, window)
+    scale = np.maximum(MAD_TO_SIGMA * mad, MIN_SCALE)
+    return (counts - median) / scale, median
+
+
+def _spikes(z, counts, threshold, min_count):
+    with np.errstate(invalid="ignore"):
+        return (z >= threshold) & (counts >= min_count)
+
+
+def flag_spikes(series, freq="Daily", window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                min_count=DEFAULT_MIN_COUNT):
+    """Periods whose count sits threshold or more robust z-scores above baseline.
+
+    Returns one row per flagged (series, period), highest z first.
+    """
+    step = FREQUENCIES[freq]
+    counts = resample(series["counts"], step)
+    columns = list(series["keys"].columns) + ["Period", "Count", "Baseline", "Robust_Z"]
+    if counts.size == 0:
+        return pd.DataFrame(columns=columns)
+    z, baseline = robust_zscores(counts, window)
+    hits = np.flatnonzero(_spikes(z, counts, threshold, min_count).ravel())
+    rows, periods = np.divmod(hits, counts.shape[1])
+    flagged = series["keys"].iloc[rows].reset_index(drop=True)
+    flagged["Period"] = series["start"] + pd.to_timedelta(periods * step, unit="D")
+    flagged["Count"] = counts.ravel()[hits]
+    flagged["Baseline"] = baseline.ravel()[hits]
+    flagged["Robust_Z"] = z.ravel()[hits].round(2)
+    return flagged.sort_values("Robust_Z", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def series_frame(series, index, freq="Daily", window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                 min_count=DEFAULT_MIN_COUNT):
+    """Counts, baseline, z and spike flags for one series (by position), indexed by period."""
+    step = FREQUENCIES[freq]
+    counts = resample(series["counts"][index:index + 1], step)
+    z, baseline = robust_zscores(counts, window)
+    periods = series["start"] + pd.to_timedelta(np.arange(counts.shape[1]) * step, unit="D")
+    return pd.DataFrame({
+        "Count": counts[0],
+        "Baseline": baseline[0],
+        "Robust_Z": z[0],
+        "Flagged": _spikes(z, counts, threshold, min_count)[0],
+    }, index=periods)
@@ -0,0 +1,392 @@
+"""Local JSON API over the dashboard's aggregates.
+
+Usage:
+    python api.py --source traffic_data.csv --port 8600
+    python api.py --source year.csv --ingest stream --dedup first
+    curl 'http://127.0.0.1:8600/api/overview-dashboard?state=Goa&state=Kerala&start=2024-01-01'
+
+    GET /api            pages, filter options, date bounds and dataset version
+    GET /api/<page>     one dashboard page's KPIs, counts and breakdowns
+    GET /api/rows       one page of matching rows, as the Data Explorer shows them
+
+Filters: state, violation_type and weather (repeat for several values;
+every value when left out) and inclusive start/end dates. Some pages take
+their controls too, e.g. /api/anomaly-detection?freq=Weekly&threshold=4.
+
+One Dataset is loaded at start-up and shared read-only by every request
+thread. Responses are cached by (dataset version, path, query) and carry an
+ETag derived from that key, so a matching If-None-Match gets a 304 before
+any aggregation runs (once the path and parameters are known to be valid).
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import anomalies
+import associations
+import engine
+import tracing
+from dedup import DEFAULT_POLICY, POLICIES
+from figure_cache import FigureCache
+from sqlbackend import BACKENDS, DEFAULT_BACKEND
+from streaming import STREAM_POLICY
+
+# Bump when response bodies change shape, so clients' ETags stop matching
+API_VERSION = 5
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+FILTER_PARAMS = {"state": "State", "violation_type": "Violation_Type", "weather": "Weather_Condition"}
+DATE_PARAMS = ["start", "end"]
+# Per-endpoint controls: name -> parser
+PAGE_PARAMS = {
+    "Anomaly Detection": {"freq": str, "window": int, "threshold": float, "min_count": int},
+    "Pattern Mining": {"min_support": float, "min_confidence": float, "max_length": int,
+                       "consequent": str, "limit": int},
+}
+ROWS_PARAMS = {"page": int, "page_size": int, "sort": str, "order": str, "search": str, "columns": list}
+# Weekly series are ~7x shorter, so the app defaults to a shorter baseline for them
+WEEKLY_WINDOW = 8
+RULE_LIMIT = 500
+MAX_PAGE_SIZE = max(engine.PAGE_SIZES)
+ROWS_NOT_KEPT = "the dataset was streamed: this needs individual rows, which it does not keep"
+
+
+def slug(feature):
+    return re.sub(r"[^a-z0-9]+", "-", feature.lower()).strip("-")
+
+
+PAGES = {slug(feature): feature for feature in engine.PAGE_AGGREGATIONS}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def jsonable(value):
+    """Plain JSON types for the pandas/numpy values the page functions return.
+
+    Frames become lists of records (a non-default index becomes columns),
+    Series become {label: value}; NaN and missing values become null.
+    """
+    if isinstance(value, pd.DataFrame):
+        frame = value if isinstance(value.index, pd.RangeIndex) else value.reset_index()
+        frame = frame.astype(object).where(frame.notna(), None)
+        return [{str(k): jsonable(v) for k, v in record.items()} for record in frame.to_dict("records")]
+    if isinstance(value, pd.Series):
+        values = value.astype(object).where(value.notna(), None)
+        return {str(k): jsonable(v) for k, v in values.items()}
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+
+def _parse(params, specs):
+    """{name: parsed value} of the query params in specs; 400 on bad values."""
+    parsed = {}
+    for name, values in params.items():
+        kind = specs[name]
+        if kind is list:
+            parsed[name] = values
+            continue
+        try:
+            parsed[name] = kind(values[-1])
+        except ValueError:
+            raise ApiError(400, f"{name}: expected {kind.__name__}, got {values[-1]!r}")
+    return parsed
+
+
+def build_filters(dataset, params):
+    """Sidebar-style filters from query params: every value unless narrowed."""
+    filters = {col: list(dataset.filter_options.get(col, [])) for col in FILTER_PARAMS.values()}
+    for name, col in FILTER_PARAMS.items():
+        if name in params:
+            filters[col] = params[name]
+    if any(name in params for name in DATE_PARAMS):
+        bounds = dataset.date_bounds
+        if bounds is None:
+            raise ApiError(400, "the dataset has no dates to filter on")
+        dates = []
+        for name, default in zip(DATE_PARAMS, bounds):
+            try:
+                dates.append(pd.Timestamp(params[name][-1]).date() if name in params else default)
+            except ValueError:
+                raise ApiError(400, f"{name}: expected a date, got {params[name][-1]!r}")
+        filters[engine.DATE_RANGE] = tuple(dates)
+    return filters
+
+
+def page_payload(sel, feature, options):
+    """JSON-ready aggregates of one page, with its controls applied like the app does."""
+    page = engine.PAGE_AGGREGATIONS[feature](sel)
+    if feature == "Speed Analysis":
+        # The scatter's points are for drawing; /api/rows serves the rows
+        scatter = page.pop("speed_scatter")
+        page["scatter_points"] = scatter["records"] if scatter is not None else None
+        if scatter is not None:
+            page["over_limit_pct"], page["avg_excess"] = scatter["pct_over"], scatter["avg_excess"]
+    elif feature == "Anomaly Detection":
+        series = page.pop("series")
+        if series is None:
+            raise ApiError(400, ROWS_NOT_KEPT)
+        freq = options.get("freq", "Daily").capitalize()
+        if freq not in anomalies.FREQUENCIES:
+            raise ApiError(400, f"freq: expected one of {list(anomalies.FREQUENCIES)}")
+        window = options.get("window", anomalies.DEFAULT_WINDOW if freq == "Daily" else WEEKLY_WINDOW)
+        if window < 3:
+            raise ApiError(400, "window: expected at least 3 periods")
+        page["series_scored"] = len(series["keys"])
+        page["flagged"] = anomalies.flag_spikes(series, freq, window,
+                                                options.get("threshold", anomalies.DEFAULT_THRESHOLD),
+                                                options.get("min_count", anomalies.DEFAULT_MIN_COUNT))
+    elif feature == "Pattern Mining":
+        encoded = page.pop("encoded")
+        if encoded is None:
+            raise ApiError(400, ROWS_NOT_KEPT)
+        consequent = options.get("consequent")
+        if consequent is not None and consequent not in encoded[0]:
+            raise ApiError(400, f"consequent: expected one of {encoded[0]}")
+        rules = associations.mine_rules(
+            encoded,
+            options.get("min_support", associations.DEFAULT_MIN_SUPPORT),
+            options.get("min_confidence", associations.DEFAULT_MIN_CONFIDENCE),
+            options.get("max_length", associations.DEFAULT_MAX_LENGTH),
+            consequent_column=consequent,
+        )
+        page["rules_found"] = len(rules)
+        page["rules"] = rules.head(options.get("limit", RULE_LIMIT))
+    elif feature == "Top Entities":
+        if not page:
+            raise ApiError(400, ROWS_NOT_KEPT + " (select every violation type and weather, or narrow by state only)")
+        top = {}
+        for (col, measure), frame in page["top"].items():
+            top.setdefault(col, {})[measure] = frame
+        page["top"] = top
+    return page
+
+
+def rows_payload(sel, options):
+    if sel.dataset.streamed:
+        raise ApiError(400, ROWS_NOT_KEPT)
+    columns = options.get("columns")
+    unknown = sorted(set(columns or []) - set(sel.dataset.columns))
+    sort_by = options.get("sort")
+    if sort_by is not None and sort_by not in sel.dataset.columns:
+        unknown.append(sort_by)
+    if unknown:
+        raise ApiError(400, f"unknown columns: {unknown}")
+    page_size = options.get("page_size", 50)
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ApiError(400, f"page_size: expected 1 to {MAX_PAGE_SIZE}")
+    result = engine.explorer_page(sel, page=options.get("page", 1) - 1, page_size=page_size, sort_by=sort_by,
+                                  ascending=options.get("order", "asc").lower() != "desc",
+                                  search=options.get("search", ""), columns=columns)
+    result["page"] += 1
+    result["rows"] = result.pop("frame").reset_index(drop=True)
+    return result
+
+
+class AggregateService:
+    """The shared dataset, the response cache and request handling, apart from HTTP.
+
+    With a LiveDataset the dataset (and its version) moves on as the feed
+    grows; cached responses for older versions simply stop being asked for.
+    """
+
+    def __init__(self, dataset=None, live=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        self._dataset = dataset
+        self.live = live
+        self.cache = FigureCache(max_bytes=cache_bytes)
+
+    @property
+    def dataset(self):
+        return self.live.dataset if self.live is not None else self._dataset
+
+    @staticmethod
+    def normalize(query):
+        """Query params in a canonical order; filter values are a set, so they are sorted too."""
+        return tuple(sorted((name, tuple(sorted(values)) if name in FILTER_PARAMS else tuple(values))
+                            for name, values in query.items()))
+
+    @staticmethod
+    def etag(key):
+        return '"' + hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest() + '"'
+
+    def handle(self, path, query, if_none_match=None):
+        """(status, headers, body bytes) for one GET."""
+        dataset = self.dataset
+        path = path.rstrip("/")
+        try:
+            route = self.route(path, query)
+        except ApiError as e:
+            return e.status, {}, json.dumps({"error": str(e)}).encode()
+        key = (API_VERSION, dataset.version, path, self.normalize(query))
+        etag = self.etag(key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                return 304, headers, b""
+        trace = tracing.Trace(tracing.enabled_by_env(), endpoint=path)
+        try:
+            body = self.cache.get(key)
+            headers["X-Cache"] = "HIT" if body is not None else "MISS"
+            if body is None:
+                body = self.cache.get_or_build(key, lambda: self._build(dataset, route, query, trace))
+        except ApiError as e:
+            return e.status, {}, json.dumps({"error": str(e)}).encode()
+        finally:
+            trace.write_jsonl()
+        return 200, headers, body
+
+    @staticmethod
+    def route(path, query):
+        """(endpoint name, page feature, parsed controls) for a GET; 404/400 on an unknown path or parameter.
+
+        The endpoint name is None for the /api index.
+        """
+        if path == "/api":
+            return None, None, {}
+        name = path.removeprefix("/api/")
+        if name != "rows" and name not in PAGES:
+            raise ApiError(404, f"no endpoint {path}; GET /api lists them")
+        feature = PAGES.get(name)
+        specs = ROWS_PARAMS if name == "rows" else PAGE_PARAMS.get(feature, {})
+        unknown = sorted(set(query) - set(FILTER_PARAMS) - set(DATE_PARAMS) - set(specs))
+        if unknown:
+            raise ApiError(400, f"unknown parameters: {unknown}")
+        return name, feature, _parse({k: v for k, v in query.items() if k in specs}, specs)
+
+    def _build(self, dataset, route, query, trace):
+        name, feature, options = route
+        if name is None:
+            payload = {
+                "version": dataset.version,
+                "rows": dataset.n_rows,
+                "streamed": dataset.streamed,
+                "pages": {f"/api/{name}": feature for name, feature in PAGES.items()},
+                "filters": {name: dataset.filter_options.get(col, []) for name, col in FILTER_PARAMS.items()},
+                "date_bounds": dataset.date_bounds,
+                "conflicts": len(dataset.conflicts),
+            }
+            return json.dumps(jsonable(payload)).encode()
+
+        with trace.span("filter") as span:
+            sel = dataset.select(build_filters(dataset, query))
+            if trace.enabled:
+                span.set(rows=sel.value("total_violations"))
+        with trace.span("aggregate", page=feature or name):
+            payload = rows_payload(sel, options) if name == "rows" else page_payload(sel, feature, options)
+        with trace.span("encode") as span:
+            body = json.dumps(jsonable(payload), separators=(",", ":"), allow_nan=False).encode()
+            span.set(bytes=len(body))
+        return body
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+    verbose = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, headers, body = self.service.handle(url.path, parse_qs(url.query),
+                                                        self.headers.get("If-None-Match"))
+        except Exception as e:
+            status, headers, body = 500, {}, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """A threaded HTTP server for service; port 0 picks a free port."""
+    handler = type("Handler", (ApiHandler,), {"service": service, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _poll_live(live, seconds, stop):
+    while not stop.wait(seconds):
+        live.refresh()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="traffic_data.csv", help="CSV file or partitioned directory")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--live", action="store_true", help="follow an append-only CSV/JSONL feed")
+    parser.add_argument("--refresh", type=float, default=None, help="live poll interval in seconds")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // 1024**2)
+    parser.add_argument("--dedup", default=DEFAULT_POLICY, choices=POLICIES,
+                        help="copy kept for a repeated Violation_ID: last write wins or first seen")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS,
+                        help="engine for the count and sum aggregates; duckdb needs a CSV file source")
+    parser.add_argument("--ingest", default=engine.DEFAULT_INGEST, choices=engine.INGEST_MODES,
+                        help="keep the cleaned rows in memory, or stream a CSV file into the aggregates alone "
+                             "(needs --dedup first and the pandas backend)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.live and args.backend != "pandas":
+        parser.error("--live works with the pandas backend only")
+    if args.ingest == "stream" and (args.live or args.backend != "pandas" or args.dedup != STREAM_POLICY):
+        parser.error(f"--ingest stream works with the pandas backend and --dedup {STREAM_POLICY} only, not --live")
+
+    stop = threading.Event()
+    if args.live:
+        from live import DEFAULT_REFRESH_SECONDS, LiveDataset
+        service = AggregateService(live=LiveDataset(args.source, args.dedup), cache_bytes=args.cache_mb * 1024**2)
+        threading.Thread(target=_poll_live, daemon=True,
+                         args=(service.live, args.refresh or DEFAULT_REFRESH_SECONDS, stop)).start()
+    else:
+        dataset = engine.Dataset.from_source(args.source, args.dedup, args.backend, args.ingest)
+        service = AggregateService(dataset, cache_bytes=args.cache_mb * 1024**2)
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"serving {service.dataset.n_rows:,} rows on http://{args.host}:{server.server_port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,124 +1,22 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import folium
-from streamlit_folium import st_folium
-import datetime
-import seaborn as sns
-
-# --- Plotting Theme & Helper Functions (Light Background, Dark Bars) ---
-sns.set_theme(style='whitegrid', palette='Set2')
-plt.rcParams.update({
-    'figure.facecolor': '#ffffff',
-    'axes.facecolor': '#ffffff',
-    'axes.edgecolor': '#cccccc',
-    'xtick.color': '#333333',
-    'ytick.color': '#333333',
-    'text.color': '#333333',
-    'font.size': 11,
-    'grid.color': '#e0e0e0',
-    'grid.alpha': 0.5
-})
-
-ACCENT = '#2563eb'  # blue for light theme headings
-
-def plot_count(ax, series, title):
-    """Count plot using bar chart."""
-    vals = series.value_counts()
-    sns.barplot(x=vals.index, y=vals.values, palette='Set2', ax=ax)
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xlabel('')
-    ax.set_ylabel('Count', color='#333333')
-    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', color='#333333')
-    ax.grid(axis='y', alpha=0.3)
-
-def plot_hist(ax, series, title, bins=30, color='#1e40af'):
-    """Histogram plot."""
-    ax.hist(series.dropna(), bins=bins, color=color, alpha=0.8, edgecolor='white')
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xlabel(series.name or '', color='#333333')
-    ax.set_ylabel('Frequency', color='#333333')
-    ax.grid(axis='y', alpha=0.3)
-
-def plot_line(ax, x_idx, y_vals, title):
-    """Line chart."""
-    # Accept pandas Series or numpy arrays
-    y = y_vals.values if hasattr(y_vals, 'values') else np.asarray(y_vals)
-    y = np.asarray(y).flatten()
-    ax.plot(range(len(x_idx)), y, color='#1e40af', marker='o', linewidth=2)
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xticks(range(len(x_idx)))
-    ax.set_xticklabels(list(x_idx), rotation=45, ha='right', color='#333333')
-    ax.set_ylabel('Count', color='#333333')
-    ax.grid(axis='y', alpha=0.3)
-
-def plot_bar(ax, labels, values, title):
-    """Vertical bar chart."""
-    sns.barplot(x=list(labels), y=list(values), palette='Set2', ax=ax)
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xlabel('')
-    ax.set_ylabel('Count', color='#333333')
-    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', color='#333333')
-    ax.grid(axis='y', alpha=0.3)
-
-def plot_barh(ax, labels, values, title):
-    """Horizontal bar chart."""
-    idx = np.arange(len(labels))
-    ax.barh(idx, values, color=sns.color_palette('Set2', len(labels)))
-    ax.set_yticks(idx)
-    ax.set_yticklabels(labels, color='#333333')
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xlabel('Count', color='#333333')
-    ax.grid(axis='x', alpha=0.3)
-
-def plot_scatter_with_ref(ax, x, y, title):
-    """Scatter plot with y=x reference line."""
-    sns.scatterplot(x=x, y=y, color='#1e40af', s=36, alpha=0.75, ax=ax)
-    # safe min/max
-    try:
-        minv = int(min(x.min(), y.min()))
-        maxv = int(max(x.max(), y.max()))
-    except Exception:
-        minv, maxv = 0, max(int(x.max()) if hasattr(x, 'max') else 0, int(y.max()) if hasattr(y, 'max') else 0)
-    ax.plot([minv, maxv], [minv, maxv], ls='--', color='#666666', linewidth=1.5)
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-    ax.set_xlabel('Speed Limit (km/h)', color='#333333')
-    ax.set_ylabel('Recorded Speed (km/h)', color='#333333')
-    # compute excess safely
-    xv = np.asarray(x)
-    yv = np.asarray(y)
-    if xv.size == yv.size:
-        tmp = yv - xv
-        pct_over = (tmp > 0).mean() * 100 if xv.size else 0
-        avg_excess = tmp[tmp > 0].mean() if (tmp > 0).any() else 0
-    else:
-        pct_over = 0
-        avg_excess = 0
-    ax.text(0.02, 0.98, f"{len(xv):,} records\n% Over Limit: {pct_over:.1f}%\nAvg Excess: {avg_excess:.1f} km/h",
-            transform=ax.transAxes, va='top', color='#333333', fontsize=9, bbox=dict(facecolor='#f5f5f5', alpha=0.9))
-    ax.grid(alpha=0.3)
-
-def plot_heatmap(ax, df_numeric, title):
-    """Heatmap of numeric correlations."""
-    corr = df_numeric.corr()
-    sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1, ax=ax, cbar_kws={'shrink':0.8})
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
-
-def plot_pie(ax, series, title, donut=False):
-    """Pie or donut chart."""
-    counts = series.value_counts()
-    colors = sns.color_palette('Set2', len(counts))
-    wedges, texts, autotexts = ax.pie(counts, labels=counts.index, autopct='%1.1f%%', colors=colors, startangle=90)
-    for text in texts:
-        text.set_color('#333333')
-    for autotext in autotexts:
-        autotext.set_color('#ffffff')
-        autotext.set_fontweight('bold')
-    if donut:
-        centre = plt.Circle((0,0),0.70,fc='#ffffff')
-        ax.add_artist(centre)
-    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+
+import anomalies
+import associations
+import engine
+import geo
+import tracing
+from figure_cache import FigureCache
+from ingest import conflict_report, file_fingerprint, load_compact
+from live import DEFAULT_REFRESH_SECONDS, LiveDataset
+from partitions import listing_key, load_partitioned, partition_dates, partition_states
+from sqlbackend import open_backend
+from uploads import UploadJob
+
+# Plotting (matplotlib/seaborn via charts.py) and mapping (folium) are imported
+# lazily when a page draws them, keeping script start-up light.
 
 # --- Page Config ---
 st.set_page_config(page_title="Smart Traffic AI Dashboard", layout="wide", page_icon="🚦")
@@ -328,53 +226,124 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# --- Data Loading ---
-@st.cache_data
-def load_data(file_path):
-    try:
-        df = pd.read_csv(file_path)
-        
-        # Basic Cleaning
-        df.drop_duplicates(inplace=True)
-        df.dropna(subset=["Date", "Time", "Location", "Violation_Type"], inplace=True)
-        
-        # Convert Date & Time
-        df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-        df["Time_Parsed"] = pd.to_datetime(df["Time"], format="%H:%M", errors='coerce')
-        mask_missing = df["Time_Parsed"].isna()
-        if mask_missing.any():
-            df.loc[mask_missing, "Time_Parsed"] = pd.to_datetime(df.loc[mask_missing, "Time"], format="%H:%M:%S", errors='coerce')
-        
-        df["Hour"] = df["Time_Parsed"].dt.hour
-        df["Day"] = df["Date"].dt.day_name()
-        df["Month"] = df["Date"].dt.month_name()
-        df["Year"] = df["Date"].dt.year
-        
-        # Rename 'Location' to 'State'
-        df.rename(columns={'Location': 'State'}, inplace=True)
-        
-        # Numeric parsing
-        df["Fine_Amount"] = pd.to_numeric(df["Fine_Amount"], errors='coerce').fillna(0)
-        df["Driver_Age"] = pd.to_numeric(df["Driver_Age"], errors='coerce')
-        df["Recorded_Speed"] = pd.to_numeric(df["Recorded_Speed"], errors='coerce')
-        df["Speed_Limit"] = pd.to_numeric(df["Speed_Limit"], errors='coerce')
-        
-        if 'Fine_Paid' in df.columns:
-            df['Status'] = df['Fine_Paid'].map({'Yes': 'Paid', 'No': 'Unpaid'})
-        
-        return df
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return pd.DataFrame()
+# --- Diagnostics ---
+# Timing spans for this rerun. The sidebar toggle is drawn further down, but
+# its session value is already updated when the rerun starts.
+trace = tracing.Trace(tracing.enabled_by_env() or st.session_state.get("diagnostics", False))
 
+# --- Data Loading ---
+# A CSV file, or a directory of Date=.../State=... partition files
 DEFAULT_DATASET = "traffic_data.csv"
+# A CSV uploaded in this session replaces the default source until dismissed
+uploaded = st.session_state.get("uploaded_dataset")
+PARTITIONED = uploaded is None and os.path.isdir(DEFAULT_DATASET)
+# Which copy of a repeated Violation_ID is kept: "last" (last write wins) or
+# "first" (first seen); conflicting copies are listed in the Data Explorer
+DEDUP_POLICY = "last"
+# Engine for the count and sum aggregates of a CSV source: "pandas" or
+# "duckdb" (SQL over an embedded database; needs the duckdb package).
+# Partitioned, live and uploaded data always use pandas.
+QUERY_BACKEND = "pandas"
+# How a CSV source is loaded: "memory" keeps the cleaned rows; "stream" reads
+# it in bounded chunks into the page aggregates alone, for files larger than
+# RAM. Streaming keeps the first copy of a repeated ID (DEDUP_POLICY must be
+# "first") and the pandas backend, and has no row views or date filter.
+INGEST_MODE = "memory"
+# Shown where a view needs rows a streamed dataset did not keep
+ROWS_NOT_KEPT = "This view needs individual rows, which streaming ingest does not keep."
+
+# Datasets are st.cache_resource objects: every session gets the same
+# read-only instance (st.cache_data would hand each caller its own copy),
+# and per-session state is only the filter selections built on top of it.
+@st.cache_resource(max_entries=1)
+def get_shared_dataset(source, version):
+    if INGEST_MODE == "stream":
+        return engine.Dataset.from_source(source, DEDUP_POLICY, QUERY_BACKEND, ingest=INGEST_MODE)
+    # Typed read + cleaning, served from the columnar sidecar on repeat loads;
+    # keyed by fingerprint so an edited file is reloaded and the old copy dropped.
+    # Columns only the Data Explorer shows stay in the sidecar until asked for.
+    df, lazy = load_compact(source, policy=DEDUP_POLICY)
+    return engine.Dataset(df, version, lazy, conflict_report(source, DEDUP_POLICY),
+                          open_backend(QUERY_BACKEND, source, DEDUP_POLICY))
 
-# --- Initialize Session State ---
-if 'df' not in st.session_state:
-    try:
-        st.session_state.df = load_data(DEFAULT_DATASET)
-    except:
-        st.session_state.df = pd.DataFrame()
+@st.cache_resource(max_entries=8)
+def get_partitioned_dataset(root, states, date_range, listing):
+    # Only the selected states' and dates' partition files are read, in
+    # parallel; listing (see partitions.listing_key) is only part of the
+    # cache key, so an added or rewritten partition is loaded
+    df, version, conflicts = load_partitioned(root, states=states, date_range=date_range, policy=DEDUP_POLICY)
+    return engine.Dataset(df, version, conflicts=conflicts)
+
+@st.cache_resource
+def get_live_dataset(source):
+    return LiveDataset(source, DEDUP_POLICY)
+
+def get_dataset(states=None, date_range=None, live=False):
+    """The shared engine.Dataset for the current source, loaded on first use.
+    
+    For a partitioned source the dataset holds the given states' partitions
+    (and date range's, when the directories carry dates).
+    In live mode it is the latest snapshot of the shared LiveDataset. A
+    finished upload takes precedence over both.
+    """
+    with trace.span("load_data", live=live) as span:
+        try:
+            if uploaded is not None:
+                dataset = uploaded
+            elif PARTITIONED:
+                dataset = get_partitioned_dataset(DEFAULT_DATASET, states, date_range, listing_key(DEFAULT_DATASET))
+            elif live:
+                dataset = get_live_dataset(DEFAULT_DATASET).dataset
+            else:
+                dataset = get_shared_dataset(DEFAULT_DATASET, file_fingerprint(DEFAULT_DATASET))
+        except Exception as e:
+            st.error(f"Error loading data: {e}")
+            dataset = engine.empty_dataset()
+        span.set(rows=dataset.n_rows)
+    # A reference to the shared object, not a copy
+    st.session_state.dataset = dataset
+    return dataset
+
+def refresh_live_dataset():
+    """Merge rows appended to the live feed since the last poll; True if any arrived."""
+    return get_live_dataset(DEFAULT_DATASET).refresh()
+
+# Uploads are parsed on a background worker; only this fragment polls them
+UPLOAD_POLL_SECONDS = 1
+
+def upload_panel():
+    """Sidebar uploader; a finished upload becomes this session's dataset."""
+    job = st.session_state.get("upload_job")
+    running = job is not None and not job.finished
+    upload = st.file_uploader("Violations CSV", type=["csv"], disabled=running)
+    if upload is not None and st.button("Load upload", disabled=running, width="stretch"):
+        job = st.session_state.upload_job = UploadJob(upload.name, upload, upload.size, policy=DEDUP_POLICY).start()
+        running = True
+    
+    @st.fragment(run_every=UPLOAD_POLL_SECONDS if running else None)
+    def upload_progress():
+        job = st.session_state.get("upload_job")
+        if job is None:
+            return
+        if job.phase == "failed":
+            st.error(f"Could not load {job.name}: {job.error}")
+        elif job.phase == "ready":
+            # Swap the new dataset in with one assignment, then redraw every page
+            st.session_state.uploaded_dataset = job.dataset
+            st.session_state.uploaded_name = job.name
+            del st.session_state["upload_job"]
+            st.rerun()
+        else:
+            fraction, text = job.progress()
+            st.progress(fraction, text=text)
+    upload_progress()
+    
+    if uploaded is not None:
+        st.caption(f"Showing {st.session_state.get('uploaded_name', 'an upload')} ({uploaded.n_rows:,} rows)")
+        if st.button("Back to default dataset", width="stretch"):
+            del st.session_state["uploaded_dataset"]
+            st.session_state.pop("dataset", None)
+            st.rerun()
 
 # --- Sidebar Navigation & Global Filters ---
 with st.sidebar:
@@ -384,61 +353,149 @@ with st.sidebar:
     # Feature Selection
     feature = st.radio(
         "📌 Select Feature",
-        options=[
-            "Overview Dashboard",
-            "Violation Distribution",
-            "Speed Analysis",
-            "Trend Analysis",
-            "Weather Risk Analysis",
-            "Location & Map",
-            "Data Explorer",
-            "About"
-        ],
+        options=engine.FEATURES,
         index=0
     )
+    trace.context["page"] = feature
+    
+    with st.expander("📤 Upload CSV", expanded=uploaded is not None or "upload_job" in st.session_state):
+        upload_panel()
+    
+    # Live mode follows an append-only CSV/JSONL source instead of loading it once
+    live_mode = False
+    if not PARTITIONED and uploaded is None and INGEST_MODE == "memory":
+        live_mode = st.toggle("📡 Live feed", value=False)
+        if live_mode:
+            refresh_seconds = st.number_input("Refresh every (seconds)", min_value=1, value=DEFAULT_REFRESH_SECONDS, step=1)
+    
+    # The About page needs no data, so don't load it just to draw the filters
+    dataset = st.session_state.get('dataset')
+    if (dataset is not None or feature != "About") and not PARTITIONED:
+        dataset = get_dataset(live=live_mode)
+    if live_mode and dataset is not None:
+        st.caption(f"{dataset.n_rows:,} rows loaded · checks for new rows every {refresh_seconds}s")
+    
+    sel = None
+    if dataset is not None or (PARTITIONED and feature != "About"):
+        st.markdown("---")
+        st.subheader("🔧 Filters")
+        
+        # Global filters (applied across all pages)
+        if PARTITIONED:
+            # States come from the partition names, so unselected states are never read
+            state_options = partition_states(DEFAULT_DATASET)
+            selected_states = st.multiselect("States", options=state_options, default=state_options[:5])
+            # Likewise dates, when the directories carry them
+            partition_range = None
+            date_bounds = partition_dates(DEFAULT_DATASET)
+            if date_bounds is not None:
+                picked = st.date_input("Date Range", value=date_bounds, min_value=date_bounds[0],
+                                       max_value=date_bounds[1])
+                if isinstance(picked, (list, tuple)) and len(picked) == 2:
+                    partition_range = tuple(picked)
+            dataset = get_dataset(tuple(selected_states), partition_range)
+        options = dataset.filter_options
+        defaults = dataset.default_filters()
+        if not PARTITIONED:
+            selected_states = st.multiselect(
+                "States",
+                options=options.get("State", []),
+                default=defaults["State"]
+            )
+        
+        selected_violations = st.multiselect(
+            "Violation Types",
+            options=options.get("Violation_Type", []),
+            default=defaults["Violation_Type"]
+        )
+        
+        selected_weather = st.multiselect(
+            "Weather Conditions",
+            options=options.get("Weather_Condition", []),
+            default=defaults["Weather_Condition"]
+        )
+        
+        filters = {
+            "State": selected_states,
+            "Violation_Type": selected_violations,
+            "Weather_Condition": selected_weather,
+        }
+        
+        if PARTITIONED and partition_range is not None:
+            # Files without a Date directory are still filtered row by row
+            filters[engine.DATE_RANGE] = partition_range
+        bounds = None if PARTITIONED and date_bounds is not None else dataset.date_bounds
+        if bounds is not None:
+            date_range = st.date_input("Date Range", value=bounds, min_value=bounds[0], max_value=bounds[1])
+            # The picker returns a single date while a range is half chosen
+            if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+                filters[engine.DATE_RANGE] = tuple(date_range)
+        
+        # Count-based pages slice the cubes, row-level pages get a lazy row
+        # selection from the bitmap index; both resolve only when used
+        with trace.span("filter") as span:
+            sel = dataset.select(filters)
+            if trace.enabled:
+                # Slice the cube here so its cost is counted as filtering
+                span.set(rows=sel.value("total_violations"))
     
     st.markdown("---")
-    st.subheader("🔧 Filters")
-    
-    # Global filters (applied across all pages)
-    selected_states = st.multiselect(
-        "States",
-        options=st.session_state.df["State"].unique() if not st.session_state.df.empty else [],
-        default=st.session_state.df["State"].unique()[:5] if not st.session_state.df.empty else []
-    )
-    
-    selected_violations = st.multiselect(
-        "Violation Types",
-        options=st.session_state.df["Violation_Type"].unique() if not st.session_state.df.empty else [],
-        default=st.session_state.df["Violation_Type"].unique() if not st.session_state.df.empty else []
-    )
-    
-    selected_weather = st.multiselect(
-        "Weather Conditions",
-        options=st.session_state.df["Weather_Condition"].unique() if not st.session_state.df.empty else [],
-        default=st.session_state.df["Weather_Condition"].unique() if not st.session_state.df.empty else []
-    )
-    
-    # Apply filters
-    if not st.session_state.df.empty:
-        filtered_df = st.session_state.df[
-            (st.session_state.df["State"].isin(selected_states)) &
-            (st.session_state.df["Violation_Type"].isin(selected_violations)) &
-            (st.session_state.df["Weather_Condition"].isin(selected_weather))
-        ].copy()
-    else:
-        filtered_df = st.session_state.df.copy()
+    st.toggle("🩺 Diagnostics", key="diagnostics", help="Time each stage and chart of this rerun")
+    diagnostics_panel = st.empty()
+
+# New feed rows rerun the app; quiet polls only rerun this fragment
+if live_mode:
+    @st.fragment(run_every=refresh_seconds)
+    def poll_live_feed():
+        if refresh_live_dataset():
+            st.rerun()
+    poll_live_feed()
 
 # Main page title
 st.title("🚦 Traffic Violation Analysis Platform")
 st.markdown(f"**Currently Viewing:** {feature}")
 
 # --- Data Check ---
-if st.session_state.df.empty and feature not in ["About", "Data Explorer"]:
-    st.warning("⚠️ No dataset loaded. Please upload a CSV file to proceed.")
+if (dataset is None or dataset.empty) and feature not in ["About", "Data Explorer"]:
+    st.warning("⚠️ No dataset loaded. Please upload a CSV file from the sidebar to proceed.")
     st.stop()
 
-df = st.session_state.df
+# --- Chart Rendering ---
+@st.cache_resource
+def get_figure_cache():
+    # Shared by all sessions; images are keyed by dataset version and filters
+    return FigureCache()
+
+@st.cache_resource
+def get_map_cache():
+    return FigureCache(max_bytes=32 * 1024 * 1024)
+
+def show_chart(chart_id, figsize, plot_name, *args, **kwargs):
+    """Draw a chart with a charts.plot_* helper, reusing the cached image when nothing changed."""
+    def render():
+        # matplotlib/seaborn load on the first cache miss, not at script start
+        import matplotlib.pyplot as plt
+        import charts
+        fig, ax = plt.subplots(figsize=figsize)
+        getattr(charts, plot_name)(ax, *args, **kwargs)
+        return fig
+    key = (dataset.version, feature, chart_id, sel.key)
+    with trace.span("chart", chart=str(chart_id), plot=plot_name) as span:
+        def render_traced():
+            span.set(rendered=True)
+            return render()
+        png = get_figure_cache().get_or_render(key, render_traced)
+        st.image(png, width="stretch")
+        span.set(bytes=len(png))
+
+page = {}
+if feature in engine.PAGE_AGGREGATIONS and sel is not None:
+    with trace.span("aggregate") as span:
+        memo = dataset.memo
+        hits, misses = memo.hits, memo.misses
+        page = engine.PAGE_AGGREGATIONS[feature](sel)
+        # Nodes served from the shared memo vs recomputed for this rerun
+        span.set(memo_hits=memo.hits - hits, memo_misses=memo.misses - misses)
 
 # ============================================================================
 # PAGE: Overview Dashboard
@@ -446,17 +503,21 @@ df = st.session_state.df
 if feature == "Overview Dashboard":
     st.markdown("### 📊 Executive Summary & KPIs")
     
-    if not filtered_df.empty:
+    if not sel.empty:
         # KPI Row
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4, col5 = st.columns(5)
         with col1:
-            st.metric("📋 Total Violations", f"{len(filtered_df):,}")
+            st.metric("📋 Total Violations", f"{page['total_violations']:,}")
         with col2:
-            st.metric("💰 Total Fines", f"₹{filtered_df['Fine_Amount'].sum():,.0f}")
+            st.metric("💰 Total Fines", f"₹{page['total_fines']:,.0f}")
         with col3:
-            st.metric("🎯 Violation Types", filtered_df['Violation_Type'].nunique())
+            st.metric("🎯 Violation Types", page['violation_types'])
         with col4:
-            st.metric("📍 States", filtered_df['State'].nunique())
+            st.metric("📍 States", page['states'])
+        with col5:
+            st.metric("👮 Officers", engine.format_estimate(page['officers'], page['officers_error']),
+                      help="Distinct officers, estimated with HyperLogLog once there are more than a few "
+                           "hundred; the ± range covers about 95% of estimates.")
         
         st.markdown("---")
         
@@ -465,24 +526,19 @@ if feature == "Overview Dashboard":
         
         with col_d1:
             st.markdown("#### Top Violations")
-            fig_v, ax_v = plt.subplots(figsize=(10, 5))
-            plot_count(ax_v, filtered_df['Violation_Type'], "Violation Types")
-            st.pyplot(fig_v, use_container_width=True)
+            violation_counts = page['violation_counts']
+            show_chart("top_violations", (10, 5), "plot_bar", violation_counts.index, violation_counts.values, "Violation Types")
         
         with col_d2:
             st.markdown("#### Violation Status Distribution")
-            fig_s, ax_s = plt.subplots(figsize=(8, 5))
-            plot_pie(ax_s, filtered_df['Status'].fillna('Unknown'), "Payment Status", donut=True)
-            st.pyplot(fig_s, use_container_width=True)
+            show_chart("payment_status", (8, 5), "plot_pie_counts", page['status_counts'], "Payment Status", donut=True)
         
         st.markdown("---")
         
         # Top States
         st.markdown("#### Violations by State (Top 10)")
-        top_states = filtered_df['State'].value_counts().head(10)
-        fig_st, ax_st = plt.subplots(figsize=(12, 5))
-        plot_bar(ax_st, top_states.index, top_states.values, "Top States by Violations")
-        st.pyplot(fig_st, use_container_width=True)
+        top_states = page['top_states']
+        show_chart("top_states", (12, 5), "plot_bar", top_states.index, top_states.values, "Top States by Violations")
 
 # ============================================================================
 # PAGE: Violation Distribution
@@ -490,28 +546,24 @@ if feature == "Overview Dashboard":
 elif feature == "Violation Distribution":
     st.markdown("### 📊 Detailed Violation Analysis")
     
-    if not filtered_df.empty:
+    if not sel.empty:
+        violation_counts = page['violation_counts']
         col_d1, col_d2 = st.columns(2)
         
         with col_d1:
             st.markdown("#### Violation Type Count")
-            fig_c, ax_c = plt.subplots(figsize=(10, 6))
-            plot_count(ax_c, filtered_df['Violation_Type'], "Count by Violation Type")
-            st.pyplot(fig_c, use_container_width=True)
+            show_chart("violation_counts", (10, 6), "plot_bar", violation_counts.index, violation_counts.values, "Count by Violation Type")
         
         with col_d2:
             st.markdown("#### Violation Type Distribution")
-            fig_pie, ax_pie = plt.subplots(figsize=(8, 6))
-            plot_pie(ax_pie, filtered_df['Violation_Type'], "Violation Percentage", donut=True)
-            st.pyplot(fig_pie, use_container_width=True)
+            show_chart("violation_share", (8, 6), "plot_pie_counts", violation_counts, "Violation Percentage", donut=True)
         
         st.markdown("---")
         
         # Payment Method
         st.markdown("#### Payment Method Distribution")
-        fig_p, ax_p = plt.subplots(figsize=(12, 5))
-        plot_count(ax_p, filtered_df['Payment_Method'], "Payment Methods")
-        st.pyplot(fig_p, use_container_width=True)
+        payment_counts = page['payment_counts']
+        show_chart("payment_methods", (12, 5), "plot_bar", payment_counts.index, payment_counts.values, "Payment Methods")
 
 # ============================================================================
 # PAGE: Speed Analysis
@@ -519,30 +571,26 @@ elif feature == "Violation Distribution":
 elif feature == "Speed Analysis":
     st.markdown("### 🏎️ Speed & Safety Analysis")
     
-    if not filtered_df.empty:
+    if not sel.empty:
         col_s1, col_s2 = st.columns(2)
         
         with col_s1:
             st.markdown("#### Recorded Speed Distribution")
-            fig_rs, ax_rs = plt.subplots(figsize=(10, 5))
-            plot_hist(ax_rs, filtered_df['Recorded_Speed'].dropna(), "Recorded Speed (km/h)", bins=30, color='#4f83cc')
-            st.pyplot(fig_rs, use_container_width=True)
+            show_chart("recorded_speed_hist", (10, 5), "plot_hist_counts", *page['speed_hist'], "Recorded Speed (km/h)", xlabel='Recorded_Speed', color='#4f83cc')
         
         with col_s2:
             st.markdown("#### Fine Amount Distribution")
-            fig_f, ax_f = plt.subplots(figsize=(10, 5))
-            plot_hist(ax_f, filtered_df['Fine_Amount'].dropna(), "Fine Amount (₹)", bins=30, color='#60a5fa')
-            st.pyplot(fig_f, use_container_width=True)
+            show_chart("fine_hist", (10, 5), "plot_hist_counts", *page['fine_hist'], "Fine Amount (₹)", xlabel='Fine_Amount', color='#60a5fa')
         
         st.markdown("---")
         
         # Scatter: Speed Limit vs Recorded Speed
         st.markdown("#### Speed Limit vs Recorded Speed (Scatter)")
-        clean_speed = filtered_df.dropna(subset=['Speed_Limit', 'Recorded_Speed']).copy()
-        if not clean_speed.empty:
-            fig_sc, ax_sc = plt.subplots(figsize=(12, 6))
-            plot_scatter_with_ref(ax_sc, clean_speed['Speed_Limit'], clean_speed['Recorded_Speed'], "Speed Analysis")
-            st.pyplot(fig_sc, use_container_width=True)
+        scatter = page['speed_scatter']
+        if scatter is None:
+            st.info(ROWS_NOT_KEPT)
+        elif scatter['records']:
+            show_chart("speed_scatter", (12, 6), "plot_scatter_counts", scatter, "Speed Analysis")
         else:
             st.info("No speed data available for this filter.")
         
@@ -550,12 +598,8 @@ elif feature == "Speed Analysis":
         
         # Correlation Heatmap
         st.markdown("#### Feature Correlations")
-        num_cols = ['Recorded_Speed', 'Speed_Limit', 'Fine_Amount', 'Driver_Age']
-        available_cols = [col for col in num_cols if col in clean_speed.columns]
-        if available_cols:
-            fig_heat, ax_heat = plt.subplots(figsize=(8, 6))
-            plot_heatmap(ax_heat, clean_speed[available_cols].dropna(), "Numeric Correlations")
-            st.pyplot(fig_heat, use_container_width=True)
+        if not page['correlation'].columns.empty:
+            show_chart("correlations", (8, 6), "plot_corr_heatmap", page['correlation'], "Numeric Correlations")
 
 # ============================================================================
 # PAGE: Trend Analysis
@@ -563,36 +607,28 @@ elif feature == "Speed Analysis":
 elif feature == "Trend Analysis":
     st.markdown("### 📈 Temporal Trends & Patterns")
     
-    if not filtered_df.empty:
+    if not sel.empty:
         col_t1, col_t2 = st.columns(2)
         
         with col_t1:
             st.markdown("#### Hourly Violation Trend")
-            hourly = filtered_df['Hour'].value_counts().sort_index()
+            hourly = page['hourly']
             if not hourly.empty:
-                fig_h, ax_h = plt.subplots(figsize=(10, 5))
-                plot_line(ax_h, hourly.index, hourly.values, "Violations by Hour")
-                st.pyplot(fig_h, use_container_width=True)
+                show_chart("hourly", (10, 5), "plot_line", hourly.index, hourly.values, "Violations by Hour")
         
         with col_t2:
             st.markdown("#### Daily Violation Trend")
-            day_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-            daily = filtered_df['Day'].value_counts().reindex(day_order).fillna(0).astype(int)
+            daily = page['daily']
             if not daily.empty:
-                fig_d, ax_d = plt.subplots(figsize=(10, 5))
-                plot_bar(ax_d, day_order, daily.values, "Violations by Day")
-                st.pyplot(fig_d, use_container_width=True)
+                show_chart("daily", (10, 5), "plot_bar", engine.DAY_ORDER, daily.values, "Violations by Day")
         
         st.markdown("---")
         
         # Monthly Trend
         st.markdown("#### Monthly Violation Trend")
-        month_order = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-        monthly = filtered_df['Month'].value_counts().reindex(month_order).fillna(0).astype(int)
+        monthly = page['monthly']
         if not monthly.empty and monthly.sum() > 0:
-            fig_m, ax_m = plt.subplots(figsize=(12, 5))
-            plot_line(ax_m, month_order, monthly.values, "Violations by Month")
-            st.pyplot(fig_m, use_container_width=True)
+            show_chart("monthly", (12, 5), "plot_line", engine.MONTH_ORDER, monthly.values, "Violations by Month")
 
 # ============================================================================
 # PAGE: Weather Risk Analysis
@@ -600,31 +636,25 @@ elif feature == "Trend Analysis":
 elif feature == "Weather Risk Analysis":
     st.markdown("### 🌧️ Environmental Risk Assessment")
     
-    if not filtered_df.empty:
+    if not sel.empty:
         col_w1, col_w2 = st.columns(2)
         
         with col_w1:
             st.markdown("#### Violations by Weather Condition")
-            fig_w, ax_w = plt.subplots(figsize=(10, 5))
-            plot_count(ax_w, filtered_df['Weather_Condition'], "Weather Conditions")
-            st.pyplot(fig_w, use_container_width=True)
+            weather_counts = page['weather_counts']
+            show_chart("weather_counts", (10, 5), "plot_bar", weather_counts.index, weather_counts.values, "Weather Conditions")
         
         with col_w2:
             st.markdown("#### Road Condition Impact")
-            fig_r, ax_r = plt.subplots(figsize=(10, 5))
-            plot_count(ax_r, filtered_df['Road_Condition'], "Road Conditions")
-            st.pyplot(fig_r, use_container_width=True)
+            road_counts = page['road_counts']
+            show_chart("road_counts", (10, 5), "plot_bar", road_counts.index, road_counts.values, "Road Conditions")
         
         st.markdown("---")
         
         # Weather vs Fine Heatmap
         st.markdown("#### Weather & Road Condition Interaction")
-        if 'Weather_Condition' in filtered_df.columns and 'Road_Condition' in filtered_df.columns:
-            weather_road = filtered_df.groupby(['Weather_Condition', 'Road_Condition']).size().unstack(fill_value=0)
-            fig_wr, ax_wr = plt.subplots(figsize=(10, 5))
-            sns.heatmap(weather_road, annot=True, fmt='d', cmap='coolwarm', ax=ax_wr, cbar_kws={'label': 'Count'})
-            ax_wr.set_title("Weather × Road Condition", color='#333333', fontsize=13, fontweight='bold')
-            st.pyplot(fig_wr, use_container_width=True)
+        if page['weather_road'] is not None:
+            show_chart("weather_road", (10, 5), "plot_count_heatmap", page['weather_road'], "Weather × Road Condition")
 
 # ============================================================================
 # PAGE: Location & Map Analysis
@@ -632,64 +662,222 @@ elif feature == "Weather Risk Analysis":
 elif feature == "Location & Map":
     st.markdown("### 🗺️ Geographic Hotspot Analysis")
     
-    if not filtered_df.empty:
+    if not sel.empty:
         # Top Violating States (Horizontal Bar)
         st.markdown("#### Top States by Violations")
-        top_states = filtered_df['State'].value_counts().head(10)
-        fig_top, ax_top = plt.subplots(figsize=(10, 6))
-        plot_barh(ax_top, top_states.index, top_states.values, "Violations by State")
-        st.pyplot(fig_top, use_container_width=True)
+        top_states = page['top_states']
+        show_chart("top_states", (10, 6), "plot_barh", top_states.index, top_states.values, "Violations by State")
         
         st.markdown("---")
         
         # Folium Map
         st.markdown("#### Violation Hotspot Map")
-        state_coords = {
-            "Maharashtra": [19.7515, 75.7139],
-            "Delhi": [28.7041, 77.1025],
-            "Karnataka": [15.3173, 75.7139],
-            "Tamil Nadu": [11.1271, 78.6569],
-            "Uttar Pradesh": [26.8467, 80.9462],
-            "Gujarat": [22.2587, 71.1924],
-            "Rajasthan": [27.0238, 74.2179],
-            "West Bengal": [22.9868, 87.8550],
-            "Kerala": [10.8505, 76.2711],
-            "Telangana": [18.1124, 79.0193],
-            "Punjab": [31.1471, 75.3412]
-        }
-        
-        state_counts = filtered_df['State'].value_counts()
-        m = folium.Map(location=[20.5937, 78.9629], zoom_start=5, tiles="CartoDB positron")
-        
-        for state, count in state_counts.items():
-            if state in state_coords:
-                popup_text = f"<b>{state}</b><br>Violations: {count:,}<br>Fines: ₹{filtered_df[filtered_df['State']==state]['Fine_Amount'].sum():,.0f}"
-                folium.CircleMarker(
-                    location=state_coords[state],
-                    radius=max(5, count / 50),
-                    popup=folium.Popup(popup_text, max_width=250),
-                    color='#2563eb',
-                    fill=True,
-                    fill_color='#60a5fa',
-                    fill_opacity=0.7,
-                    weight=2,
-                    tooltip=f"{state}: {count:,}"
-                ).add_to(m)
-        
-        st_folium(m, width="100%", height=600)
+        map_levels = ["States"]
+        if page['grid_points'] is not None:
+            map_levels.append("Grid hotspots")
+        map_level = st.radio("Map level", map_levels, horizontal=True)
+        points = page['grid_points'] if map_level == "Grid hotspots" else page['state_points']
+        
+        # The map HTML is built once per dataset/filter/level and reused across reruns
+        key = (dataset.version, map_level, sel.key)
+        with trace.span("map", level=map_level, rows=len(points)) as span:
+            map_html = get_map_cache().get_or_build(key, lambda: geo.build_map_html(points).encode())
+            # Our own folium document, so embedding it as-is is safe
+            st.iframe(map_html.decode(), height=600)
+            span.set(bytes=len(map_html))
 
 # ============================================================================
 # PAGE: Data Explorer
 # ============================================================================
 elif feature == "Data Explorer":
     st.markdown("### 📂 Raw Data View")
-    st.dataframe(filtered_df, use_container_width=True)
     
-    with st.expander("📊 Dataset Info"):
-        st.write(f"**Shape:** {filtered_df.shape[0]} rows × {filtered_df.shape[1]} columns")
-        st.write(f"**Memory Usage:** {filtered_df.memory_usage().sum() / 1024**2:.2f} MB")
-        st.write("**Missing Values:**")
-        st.dataframe(filtered_df.isnull().sum())
+    if sel is not None and dataset.streamed:
+        st.info(ROWS_NOT_KEPT)
+    elif sel is not None:
+        # Only the requested page of rows is materialized and sent to the browser
+        col_q, col_sort, col_dir = st.columns([2, 2, 1])
+        with col_q:
+            search = st.text_input("🔎 Search Violation / Officer ID", "")
+        with col_sort:
+            sort_by = st.selectbox("Sort by", ["(none)"] + page['columns'])
+        with col_dir:
+            ascending = st.radio("Order", ["Asc", "Desc"], horizontal=True) == "Asc"
+        columns = st.multiselect("Columns", page['columns'], default=page['columns'])
+        
+        col_size, col_page = st.columns(2)
+        with col_size:
+            page_size = st.selectbox("Rows per page", engine.PAGE_SIZES, index=1)
+        with col_page:
+            page_number = st.number_input("Page", min_value=1, value=1, step=1)
+        
+        with trace.span("explorer_page") as span:
+            result = engine.explorer_page(
+                sel,
+                page=int(page_number) - 1,
+                page_size=page_size,
+                sort_by=None if sort_by == "(none)" else sort_by,
+                ascending=ascending,
+                search=search,
+                columns=columns,
+            )
+            st.caption(f"Page {result['page'] + 1} of {result['pages']:,} · {result['total']:,} matching rows")
+            st.dataframe(result['frame'], width="stretch")
+            if trace.enabled:
+                span.set(rows=len(result['frame']), bytes=int(result['frame'].memory_usage(deep=True).sum()))
+    
+    if sel is not None:
+        with st.expander("📊 Dataset Info"):
+            stats = page['stats']
+            matched = f" ({page['matched_rows']:,} match the filters)" if page['matched_rows'] is not None else ""
+            st.write(f"**Shape:** {stats['shape'][0]} rows × {stats['shape'][1]} columns{matched}")
+            st.write(f"**Memory Usage:** {stats['memory_mb']:.2f} MB in memory"
+                     + (f", plus {len(stats['lazy_columns'])} columns read from disk when shown" if stats['lazy_columns'] else ""))
+            st.write("**Missing Values:**")
+            st.dataframe(stats['missing'])
+        
+        conflicts = page['conflicts']
+        if len(conflicts):
+            with st.expander(f"⚠️ Conflicting Duplicates ({len(conflicts):,})"):
+                st.caption(f"Rows sharing a Violation_ID with another row but differing in other fields. "
+                           f"Policy: {DEDUP_POLICY!r}; these are the versions that were not kept.")
+                st.dataframe(conflicts, width="stretch")
+
+# ============================================================================
+# PAGE: Anomaly Detection
+# ============================================================================
+elif feature == "Anomaly Detection":
+    st.markdown("### 🚨 Violation Spike Detection")
+    
+    series = page['series']
+    if series is None:
+        st.info(ROWS_NOT_KEPT)
+    elif series['counts'].size:
+        col_a1, col_a2, col_a3 = st.columns(3)
+        with col_a1:
+            freq = st.radio("Period", list(anomalies.FREQUENCIES), horizontal=True)
+        with col_a2:
+            window = st.number_input("Baseline window (periods)", min_value=3, value=anomalies.DEFAULT_WINDOW if freq == "Daily" else 8, step=1)
+        with col_a3:
+            threshold = st.slider("Robust z threshold", 2.0, 10.0, anomalies.DEFAULT_THRESHOLD, 0.5)
+        
+        with trace.span("flag_spikes", series=len(series['keys'])) as span:
+            flagged = anomalies.flag_spikes(series, freq, window, threshold)
+            span.set(rows=len(flagged))
+        st.caption(f"{len(series['keys']):,} State × Violation Type series scored · {len(flagged):,} spikes flagged")
+        st.dataframe(flagged, width="stretch", height=350)
+        
+        st.markdown("---")
+        
+        # Drill into one series, defaulting to the strongest spike
+        st.markdown("#### Series Detail")
+        labels = series['keys']['State'].astype(str) + " · " + series['keys']['Violation_Type'].astype(str)
+        default = 0
+        if not flagged.empty:
+            top = flagged.iloc[0]
+            default = int(labels.tolist().index(f"{top['State']} · {top['Violation_Type']}"))
+        choice = st.selectbox("Series", range(len(labels)), index=default, format_func=lambda i: labels.iloc[i])
+        frame = anomalies.series_frame(series, choice, freq, window, threshold)
+        show_chart(("anomaly", choice, freq, window, threshold), (12, 5), "plot_anomaly_series", frame, f"{labels.iloc[choice]} ({freq.lower()})")
+    else:
+        st.info("No dated violations in the current selection.")
+
+# ============================================================================
+# PAGE: Pattern Mining
+# ============================================================================
+elif feature == "Pattern Mining":
+    st.markdown("### 🧩 Multi-Attribute Violation Patterns")
+    
+    if page['encoded'] is None:
+        st.info(ROWS_NOT_KEPT)
+    elif not sel.empty:
+        col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+        with col_p1:
+            min_support = st.slider("Min support (%)", 0.1, 20.0, associations.DEFAULT_MIN_SUPPORT * 100, 0.1) / 100
+        with col_p2:
+            min_confidence = st.slider("Min confidence", 0.05, 1.0, associations.DEFAULT_MIN_CONFIDENCE, 0.05)
+        with col_p3:
+            max_length = st.selectbox("Max items per rule", [2, 3, 4], index=[2, 3, 4].index(associations.DEFAULT_MAX_LENGTH))
+        with col_p4:
+            target = st.selectbox("Consequent", ["Any"] + page['encoded'][0])
+        
+        with trace.span("mine_rules") as span:
+            rules = associations.mine_rules(
+                page['encoded'], min_support, min_confidence, max_length,
+                consequent_column=None if target == "Any" else target,
+            )
+            span.set(rows=len(rules))
+        st.caption(f"{len(rules):,} rules over {len(sel.rows):,} violations · ranked by lift")
+        st.dataframe(
+            rules.head(500),
+            width="stretch",
+            height=450,
+            column_config={
+                "Support": st.column_config.NumberColumn(format="%.3f"),
+                "Confidence": st.column_config.NumberColumn(format="%.2f"),
+                "Lift": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+
+# ============================================================================
+# PAGE: Top Entities
+# ============================================================================
+elif feature == "Top Entities":
+    st.markdown("### 🏅 Heavy Hitters & Repeat Offenders")
+    
+    if not page:
+        # A streamed dataset has sketches for whole states only
+        st.info(ROWS_NOT_KEPT + " Select every violation type and weather condition to rank entities.")
+    elif not sel.empty:
+        entity_labels = {
+            "Officer_ID": "Officers",
+            "Registration_State": "Registration states",
+            "Vehicle_Model_Year": "Vehicle model years",
+            "Previous_Violations": "Prior violation counts",
+        }
+        col_e1, col_e2, col_e3 = st.columns(3)
+        with col_e1:
+            entity = st.selectbox("Entity", list(entity_labels), format_func=entity_labels.get)
+        with col_e2:
+            measure = st.radio("Rank by", ["count", "fines"], horizontal=True,
+                               format_func={"count": "Violations", "fines": "Fines issued"}.get)
+        with col_e3:
+            top_n = st.slider("Show top", 5, engine.TOP_ENTITIES, 10)
+        
+        total = page['rows'] if measure == "count" else page['fines']
+        top = page['top'][(entity, measure)].head(top_n)
+        table = pd.DataFrame({
+            entity_labels[entity]: top[entity].astype(str),
+            "Estimate": top['estimate'],
+            "At least": top['estimate'] - top['error'],
+            "Share (%)": (100 * top['estimate'] / total).round(2) if total else 0.0,
+        })
+        
+        col_m1, col_m2 = st.columns(2)
+        with col_m1:
+            st.metric(f"Distinct {entity_labels[entity].lower()} (≈)", f"{page['distinct'][entity]:,}")
+        with col_m2:
+            st.metric(f"Top {len(top)} share", f"{table['Share (%)'].sum():.1f}%")
+        st.caption("Counts come from bounded-memory sketches: each estimate is an upper bound and "
+                   "\"At least\" a guaranteed lower bound.")
+        
+        col_t1, col_t2 = st.columns([3, 2])
+        with col_t1:
+            ranked = table.head(10).iloc[::-1]
+            show_chart(("top_entities", entity, measure, top_n), (10, 6), "plot_barh",
+                       ranked[entity_labels[entity]], ranked['Estimate'], f"Top {entity_labels[entity]}")
+        with col_t2:
+            st.dataframe(table, width="stretch", hide_index=True, height=420)
+        
+        st.markdown("---")
+        
+        # Repeat offenders: violations by how many the driver already had
+        st.markdown("#### Repeat Offender Concentration")
+        prior = page['prior_violations']
+        if not prior.empty:
+            repeat_share = prior[prior.index > 0].sum() / prior.sum() * 100
+            st.metric("Violations by drivers with prior violations", f"{repeat_share:.1f}%")
+            show_chart("prior_violations", (10, 4), "plot_bar", prior.index, prior.values, "Violations by Prior Violation Count")
 
 # ============================================================================
 # PAGE: About
@@ -710,6 +898,9 @@ elif feature == "About":
     - **🌧️ Weather Risk:** Environmental factors influencing violations
     - **🗺️ Location Analysis:** Geospatial hotspots with interactive map
     - **📂 Data Explorer:** Raw data viewing and stats
+    - **🚨 Anomaly Detection:** Spikes in per-state violation counts against a rolling baseline
+    - **🧩 Pattern Mining:** Association rules across weather, road, vehicle and violation attributes
+    - **🏅 Top Entities:** Top officers, registrations and repeat offenders from streaming sketches
     
     ## Visualization Types
     - Count Plots (bar charts for categorical data)
@@ -732,3 +923,15 @@ elif feature == "About":
     Built with ❤️ for safer roads.
     """)
 
+# ============================================================================
+# Diagnostics
+# ============================================================================
+if trace.enabled:
+    if st.session_state.get("diagnostics"):
+        with diagnostics_panel.container():
+            st.caption(f"Rerun {trace.run} · {trace.elapsed_ms:,.0f} ms")
+            spans = pd.DataFrame(trace.records)
+            leading = [c for c in ["stage", "ms", "rows", "bytes", "rss_delta_mb"] if c in spans.columns]
+            st.dataframe(spans[leading + [c for c in spans.columns if c not in leading]], hide_index=True)
+            st.caption(f"Appended to {tracing.trace_file()}")
+    trace.write_jsonl()
@@ -0,0 +1,136 @@
+"""Frequent itemsets and association rules over categorical violation context.
+
+An item is one column=value pair (e.g. Weather_Condition=Rainy) and an
+itemset holds at most one item per column. Support is counted on integer
+category codes: for each combination of columns, the codes are folded into
+one mixed-radix key per row and a single bincount yields the support of
+every value combination at once. Combinations grow depth-first, and only
+rows that fall in a frequent cell are carried to the next column, so the
+row sets shrink as itemsets lengthen (Apriori pruning on rows).
+"""
+import numpy as np
+import pandas as pd
+
+MINING_COLUMNS = [
+    "Weather_Condition", "Road_Condition", "Vehicle_Type", "Traffic_Light_Status",
+    "Helmet_Worn", "Seatbelt_Worn", "Violation_Type", "License_Validity",
+    "Breathalyzer_Result", "Driver_Gender",
+]
+
+DEFAULT_MIN_SUPPORT = 0.01
+DEFAULT_MIN_CONFIDENCE = 0.3
+DEFAULT_MAX_LENGTH = 3
+# Itemsets seen in fewer rows are noise however small the selection is
+MIN_ROWS = 5
+RULE_COLUMNS = ["Antecedent", "Consequent", "Support", "Confidence", "Lift", "Count", "Length"]
+
+
+def encode(df, columns=MINING_COLUMNS):
+    """(columns, categories, codes): per present column, its categories and int codes (-1 = missing)."""
+    present, categories, codes = [], [], []
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+        present.append(col)
+        categories.append(values.cat.categories)
+        codes.append(values.cat.codes.to_numpy())
+    return present, categories, codes
+
+
+def frequent_itemsets(codes, cardinalities, min_count, max_length=DEFAULT_MAX_LENGTH):
+    """{itemset: row count} for every itemset seen in at least min_count rows.
+
+    An itemset is a tuple of (column position, code) pairs in column order.
+    """
+    supports = {}
+    has_missing = [bool((c < 0).any()) for c in codes]
+
+    def extend(columns, key, rows, radix):
+        # key: mixed-radix cell of each row over columns; rows: their
+        # positions, or None while every row is still in play
+        counts = np.bincount(key, minlength=radix)
+        frequent = np.flatnonzero(counts >= min_count)
+        if not len(frequent):
+            return
+        cell_codes = np.unravel_index(frequent, [cardinalities[c] for c in columns])
+        for i, cell in enumerate(frequent):
+            supports[tuple((c, int(cell_codes[j][i])) for j, c in enumerate(columns))] = int(counts[cell])
+        if len(columns) == max_length:
+            return
+        # Only rows in a frequent cell can belong to a frequent superset
+        if len(frequent) < np.count_nonzero(counts):
+            keep = counts[key] >= min_count
+            key = key[keep]
+            rows = np.flatnonzero(keep) if rows is None else rows[keep]
+        for c in range(columns[-1] + 1, len(codes)):
+            child = codes[c] if rows is None else codes[c][rows]
+            child_key, child_rows = key, rows
+            if has_missing[c]:
+                valid = child >= 0
+                child, child_key = child[valid], key[valid]
+                child_rows = np.flatnonzero(valid) if rows is None else rows[valid]
+            extend(columns + (c,), child_key * cardinalities[c] + child, child_rows,
+                   radix * cardinalities[c])
+
+    for c in range(len(codes)):
+        key, rows = codes[c].astype(np.int64), None
+        if has_missing[c]:
+            rows = np.flatnonzero(key >= 0)
+            key = key[rows]
+        extend((c,), key, rows, cardinalities[c])
+    return supports
+
+
+def association_rules(df, columns=MINING_COLUMNS, **kwargs):
+    """Rules mined from the columns of df; see mine_rules."""
+    return mine_rules(encode(df, columns), **kwargs)
+
+
+def mine_rules(encoded, min_support=DEFAULT_MIN_SUPPORT, min_confidence=DEFAULT_MIN_CONFIDENCE,
+               max_length=DEFAULT_MAX_LENGTH, consequent_column=None):
+    """Rules antecedent -> one consequent item from encode() output, highest lift first.
+
+    consequent_column restricts consequents to that column's values (e.g.
+    Violation_Type). Support is the fraction of rows matching the whole
+    rule; lift is confidence over the consequent's own support.
+    """
+    names, categories, codes = encoded
+    n_rows = len(codes[0]) if codes else 0
+    if not n_rows:
+        return pd.DataFrame(columns=RULE_COLUMNS)
+    min_count = max(MIN_ROWS, int(np.ceil(min_support * n_rows)))
+    supports = frequent_itemsets(codes, [len(c) for c in categories], min_count, max_length)
+    target = names.index(consequent_column) if consequent_column in names else None
+
+    records = []
+    for itemset, count in supports.items():
+        if len(itemset) < 2:
+            continue
+        for k, consequent in enumerate(itemset):
+            if consequent_column is not None and consequent[0] != target:
+                continue
+            # Every subset of a frequent itemset is frequent, so both are counted
+            antecedent = itemset[:k] + itemset[k + 1:]
+            confidence = count / supports[antecedent]
+            if confidence >= min_confidence:
+                records.append((antecedent, consequent, count, confidence,
+                                confidence * n_rows / supports[(consequent,)]))
+    if not records:
+        return pd.DataFrame(columns=RULE_COLUMNS)
+
+    labels = [[f"{name}={value}" for value in cats] for name, cats in zip(names, categories)]
+
+    def label(item):
+        return labels[item[0]][item[1]]
+
+    rules = pd.DataFrame({
+        "Antecedent": [" + ".join(map(label, r[0])) for r in records],
+        "Consequent": [label(r[1]) for r in records],
+        "Support": [r[2] / n_rows for r in records],
+        "Confidence": [r[3] for r in records],
+        "Lift": [r[4] for r in records],
+        "Count": [r[2] for r in records],
+        "Length": [len(r[0]) + 1 for r in records],
+    })
+    return rules.sort_values(["Lift", "Count"], ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,161 @@
+"""Load test of the JSON aggregate API (api.py) with concurrent clients.
+
+Usage:
+    python -m bench.load_api --source bench_data/violations_1m.csv --requests 2000 --concurrency 16
+    python -m bench.load_api --url http://127.0.0.1:8600 --requests 2000 --out load_results.json
+
+Without --url an in-process server is started on a free port. Clients draw
+from a fixed pool of distinct queries (every page endpoint crossed with
+random state/date filters), so later requests exercise the response cache;
+a share of them revalidate with the ETag of an earlier response and should
+get 304s.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+DEFAULT_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 8
+DEFAULT_DISTINCT = 60
+DEFAULT_REVALIDATE = 0.3
+
+
+def _get(url, etag=None):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def query_pool(base, index, distinct, rng):
+    """distinct request URLs over every endpoint, with random filters."""
+    endpoints = list(index["pages"]) + ["/api/rows"]
+    states = index["filters"]["state"]
+    bounds = index["date_bounds"]
+    urls = []
+    while len(urls) < distinct:
+        params = []
+        if states and rng.random() < 0.7:
+            params += [("state", s) for s in rng.sample(states, rng.randint(1, min(5, len(states))))]
+        if bounds and rng.random() < 0.3:
+            params.append(("start", bounds[0][:8] + "15"))
+        url = f"{base}{rng.choice(endpoints)}" + (f"?{urlencode(params)}" if params else "")
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": pick(1.0)}
+
+
+def run(base, requests, concurrency, distinct, revalidate, seed=0):
+    """Fire requests over the query pool from concurrency threads; returns a summary dict."""
+    rng = random.Random(seed)
+    status, _, body = _get(f"{base}/api")
+    if status != 200:
+        raise RuntimeError(f"GET /api returned {status}")
+    urls = query_pool(base, json.loads(body), distinct, rng)
+    plan = [(rng.choice(urls), rng.random() < revalidate) for _ in range(requests)]
+
+    etags = {}
+    results = []
+    lock = threading.Lock()
+
+    def fire(job):
+        url, conditional = job
+        etag = etags.get(url) if conditional else None
+        start = time.perf_counter()
+        status, headers, body = _get(url, etag)
+        elapsed = time.perf_counter() - start
+        with lock:
+            if status == 200:
+                etags[url] = headers.get("ETag")
+            results.append((url.split("?")[0].removeprefix(base), status, headers.get("X-Cache"), elapsed, len(body)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fire, plan))
+    wall = time.perf_counter() - start
+
+    summary = {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "distinct_queries": len(urls),
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(results) / wall, 1),
+        "status": {},
+        "cache": {},
+        "bytes": sum(r[4] for r in results),
+        "latency": percentiles([r[3] for r in results]),
+        "endpoints": {},
+    }
+    for endpoint, status, cache, _, _ in results:
+        summary["status"][str(status)] = summary["status"].get(str(status), 0) + 1
+        if cache:
+            summary["cache"][cache] = summary["cache"].get(cache, 0) + 1
+    for endpoint in sorted({r[0] for r in results}):
+        latencies = [r[3] for r in results if r[0] == endpoint]
+        summary["endpoints"][endpoint] = {"requests": len(latencies), **percentiles(latencies)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server, e.g. http://127.0.0.1:8600")
+    target.add_argument("--source", default="traffic_data.csv", help="dataset for an in-process server")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--distinct", type=int, default=DEFAULT_DISTINCT, help="distinct queries in the pool")
+    parser.add_argument("--revalidate", type=float, default=DEFAULT_REVALIDATE,
+                        help="share of requests sent with If-None-Match")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the summary as JSON here")
+    args = parser.parse_args(argv)
+
+    server = None
+    base = args.url.rstrip("/") if args.url else None
+    if base is None:
+        import api
+        import engine
+        print(f"loading {args.source} ...")
+        server = api.make_server(api.AggregateService(engine.Dataset.from_source(args.source)), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        summary = run(base, args.requests, args.concurrency, args.distinct, args.revalidate, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    latency = summary["latency"]
+    print(f"{summary['requests']:,} requests in {summary['wall_s']}s "
+          f"({summary['requests_per_s']:,} req/s, {args.concurrency} clients)")
+    print(f"status {summary['status']} · cache {summary['cache']}")
+    print(f"latency p50 {latency['p50_ms']} ms · p95 {latency['p95_ms']} ms · "
+          f"p99 {latency['p99_ms']} ms · max {latency['max_ms']} ms")
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"  {endpoint:<30} {stats['requests']:>6}  p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms")
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(summary, fh, indent=2)
+    return 0 if set(summary["status"]) <= {"200", "304"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Headless benchmark of ingest, filtering and every page's aggregation and plotting.
+
+Usage:
+    python -m bench.run --rows 10000 1000000 --out bench_results.json
+    python -m bench.run --rows 10000 1000000 --compare bench_results.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+DEFAULT_SIZES = [10_000, 1_000_000]
+DEFAULT_DATA_DIR = "bench_data"
+REGRESSION_THRESHOLD = 1.25
+# Sub-millisecond stages are timer noise; don't flag them as regressions
+MIN_REGRESSION_DELTA_S = 0.001
+
+
+def _rss_mb():
+    """Current resident set size in MB (Linux /proc; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """Collects wall time, memory and throughput for named stages."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.stages = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        wall = time.perf_counter() - start
+        self.stages[name] = {
+            "wall_s": round(wall, 6),
+            "rows_per_s": round(self.rows / wall) if wall > 0 else None,
+            "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+        return result
+
+
+def _page_jobs(sel):
+    """Aggregation and plot callables for every dashboard page, as the report renders them."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import engine
+    from report import page_report, render_plot
+
+    def plot_all(plots):
+        return [render_plot(plot) for plot in plots]
+
+    pages = {}
+    for feature, aggregate in engine.PAGE_AGGREGATIONS.items():
+        name = feature.split()[0].lower()
+        # page_report also runs the page-side work (spike scoring, rule mining)
+        pages[name] = (lambda aggregate=aggregate, feature=feature: page_report(feature, aggregate(sel))[1])
+    return pages, plot_all
+
+
+def bench_size(rows, data_dir, skip_plots=False):
+    """Run every stage on a dataset of the given size; returns the stage report."""
+    from bench.synth import write_csv
+    from engine import Dataset
+    from ingest import CACHE_DIR_NAME, load_dataset
+
+    path = os.path.join(data_dir, f"violations_{rows}.csv")
+    if not os.path.exists(path):
+        write_csv(path, rows)
+    shutil.rmtree(os.path.join(data_dir, CACHE_DIR_NAME), ignore_errors=True)
+
+    timer = StageTimer(rows)
+    # First, so its peak RSS is the streaming pass's own and not the full load's
+    streamed = timer.run("ingest_stream", Dataset.from_stream, path)
+    del streamed
+    df = timer.run("ingest_cold", load_dataset, path)
+    del df
+    df = timer.run("ingest_sidecar", load_dataset, path)
+    # Cubes, bitmap index and sidebar options
+    dataset = timer.run("build_dataset", Dataset, df)
+    cubes, index = dataset.cubes, dataset.index
+    filters = dataset.default_filters()
+
+    def isin_copy():
+        return df[df["State"].isin(filters["State"])
+                  & df["Violation_Type"].isin(filters["Violation_Type"])
+                  & df["Weather_Condition"].isin(filters["Weather_Condition"])].copy()
+
+    timer.run("filter_isin_copy", isin_copy)
+    timer.run("filter_bitmap", index.select, filters)
+    timer.run("filter_bitmap_memo", index.select, filters)
+    timer.run("filter_cube_slice", cubes["main"].slice, filters)
+
+    pages, plot_all = _page_jobs(dataset.select(filters))
+    for name, page in pages.items():
+        plots = timer.run(f"page_{name}_aggregate", page)
+        if not skip_plots and plots:
+            timer.run(f"page_{name}_plot", plot_all, plots)
+
+    return {"rows": rows, "dataset_rows": len(df), "stages": timer.stages}
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print per-stage wall-time ratios; returns the list of regressions."""
+    regressions = []
+    base_by_rows = {str(run["rows"]): run for run in baseline["runs"]}
+    for run in current["runs"]:
+        base = base_by_rows.get(str(run["rows"]))
+        if base is None:
+            continue
+        print(f"\n== {run['rows']:,} rows: current vs baseline ==")
+        for stage, stats in run["stages"].items():
+            old = base["stages"].get(stage)
+            if not old or not old["wall_s"]:
+                continue
+            ratio = stats["wall_s"] / old["wall_s"]
+            slower = stats["wall_s"] - old["wall_s"] > MIN_REGRESSION_DELTA_S
+            flag = "  REGRESSION" if ratio > threshold and slower else ""
+            print(f"{stage:32s} {old['wall_s']:10.4f}s -> {stats['wall_s']:10.4f}s  x{ratio:5.2f}{flag}")
+            if flag:
+                regressions.append((run["rows"], stage, ratio))
+    return regressions
+
+
+def print_report(report):
+    for run in report["runs"]:
+        print(f"\n== {run['rows']:,} rows ({run['dataset_rows']:,} after cleaning) ==")
+        print(f"{'stage':32s} {'wall s':>10s} {'rows/s':>14s} {'rss Δ MB':>10s} {'peak MB':>10s}")
+        for stage, s in run["stages"].items():
+            rate = f"{s['rows_per_s']:,}" if s["rows_per_s"] else "-"
+            print(f"{stage:32s} {s['wall_s']:10.4f} {rate:>14s} {s['rss_delta_mb']:10.1f} {s['peak_rss_mb']:10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="dataset sizes to run (e.g. 10000 1000000 10000000)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--skip-plots", action="store_true", help="time aggregations only")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    runs = []
+    for rows in args.rows:
+        # Fresh process per size so peak RSS is not carried over between sizes
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            runs.append(pool.submit(bench_size, rows, args.data_dir, args.skip_plots).result())
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], "runs": runs}
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(report, json.load(fh), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than x{args.threshold} of baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
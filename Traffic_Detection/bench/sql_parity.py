@@ -0,0 +1,157 @@
+"""Check that the DuckDB query backend gives the same aggregates as pandas.
+
+Usage:
+    python -m bench.sql_parity --source traffic_data.csv
+    python -m bench.sql_parity --source bench_data/violations_1m.csv --policy first --selections 200 --threads 8
+
+Loads the source both ways: the pandas reference (engine.Dataset.from_csv)
+and a SqlBackend built from the raw CSV. Then, for the unfiltered view plus
+random sidebar selections (states, violation types, weather and date
+windows, including empty ones), it compares every aggregate in
+sqlbackend.QUERIES node by node, and every page payload of a
+Dataset using the backend against the reference. Counts must match exactly,
+with labels in the same order; fine sums to 1e-9 (summation order differs).
+Index dtypes are not compared: pandas labels are categoricals, SQL labels
+plain values. Exits 1 on any mismatch.
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import engine
+import sqlbackend
+from dedup import DEFAULT_POLICY, POLICIES
+
+DEFAULT_SELECTIONS = 50
+# Examples printed per failing check
+SHOW_MISMATCHES = 5
+
+
+def random_filters(dataset, rng):
+    """Sidebar-style filters: each dimension all, some or none of its values, sometimes a date window."""
+    filters = {}
+    for dim, options in dataset.filter_options.items():
+        r = rng.random()
+        if r < 0.4:
+            filters[dim] = list(options)
+        elif r < 0.95:
+            filters[dim] = rng.sample(options, rng.randint(1, max(1, len(options) // 2)))
+        else:
+            filters[dim] = []
+    bounds = dataset.date_bounds
+    if bounds is not None and rng.random() < 0.4:
+        days = (bounds[1] - bounds[0]).days
+        start = bounds[0] + datetime.timedelta(days=rng.randint(0, max(0, days)))
+        filters[engine.DATE_RANGE] = (start, start + datetime.timedelta(days=rng.randint(0, 120)))
+    return filters
+
+
+def differences(expected, actual, path=""):
+    """Descriptions of where actual differs from expected (empty if they agree)."""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict) or expected.keys() != actual.keys():
+            return [f"{path}: keys differ"]
+        return [d for key in expected for d in differences(expected[key], actual[key], f"{path}.{key}")]
+    if isinstance(expected, (pd.Series, pd.DataFrame)):
+        if type(actual) is not type(expected):
+            return [f"{path}: {type(expected).__name__} vs {type(actual).__name__}"]
+        if expected.empty and actual.empty:
+            return []
+        try:
+            check = pd.testing.assert_series_equal if isinstance(expected, pd.Series) else pd.testing.assert_frame_equal
+            extra = {} if isinstance(expected, pd.Series) else {"check_column_type": False}
+            check(actual, expected, check_index_type=False, check_categorical=False,
+                  check_exact=False, rtol=1e-9, obj=path, **extra)
+        except AssertionError as e:
+            return [str(e).strip().splitlines()[0] + f" ({path})"]
+        # The labels again as plain values: assert_*_equal ignores categorical-ness above
+        if list(map(str, expected.index)) != list(map(str, actual.index)):
+            return [f"{path}: labels or their order differ"]
+        return []
+    if isinstance(expected, (list, tuple)):
+        if not isinstance(actual, (list, tuple)) or len(expected) != len(actual):
+            return [f"{path}: lengths differ"]
+        return [d for i, (e, a) in enumerate(zip(expected, actual)) for d in differences(e, a, f"{path}[{i}]")]
+    if isinstance(expected, np.ndarray):
+        same = (expected.shape == np.shape(actual)
+                and np.allclose(expected, actual, rtol=1e-9, equal_nan=True))
+        return [] if same else [f"{path}: arrays differ"]
+    if isinstance(expected, float) or isinstance(actual, float):
+        return [] if np.isclose(expected, actual, rtol=1e-9) else [f"{path}: {expected!r} vs {actual!r}"]
+    if expected is None or actual is None:
+        return [] if expected is actual else [f"{path}: {expected!r} vs {actual!r}"]
+    try:
+        equal = expected == actual
+        equal = bool(np.all(equal))
+    except (TypeError, ValueError):
+        equal = False
+    return [] if equal else [f"{path}: values differ"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="traffic_data.csv", help="violations CSV file")
+    parser.add_argument("--policy", choices=POLICIES, default=DEFAULT_POLICY, help="de-duplication policy")
+    parser.add_argument("--selections", type=int, default=DEFAULT_SELECTIONS,
+                        help="random filter selections checked besides the unfiltered view")
+    parser.add_argument("--threads", type=int, help="cores DuckDB may use (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if sqlbackend.duckdb is None:
+        sys.exit("duckdb is not installed: pip install duckdb")
+
+    t0 = time.perf_counter()
+    reference = engine.Dataset.from_csv(args.source, args.policy)
+    print(f"pandas: {len(reference.df):,} rows loaded in {time.perf_counter() - t0:.2f}s")
+    t0 = time.perf_counter()
+    # Built from the raw CSV, not reused from the cache, so the SQL cleaning is checked too
+    backend = sqlbackend.SqlBackend.from_csv(args.source, args.policy, use_cache=False, threads=args.threads)
+    print(f"duckdb: {backend.total({}):,} rows cleaned and loaded in {time.perf_counter() - t0:.2f}s")
+    with_sql = engine.Dataset(reference.df, reference.version, reference.lazy, reference.conflicts, sql=backend)
+
+    rng = random.Random(args.seed)
+    selections = [{}] + [random_filters(reference, rng) for _ in range(args.selections)]
+    failures = {}
+    seconds = {"pandas": 0.0, "duckdb": 0.0}
+    for filters in selections:
+        sel = engine.Selection(reference, filters)
+        for name in sqlbackend.QUERIES:
+            node = engine.NODES[name]
+            t0 = time.perf_counter()
+            expected = node.compute(sel)
+            seconds["pandas"] += time.perf_counter() - t0
+            if expected is None:
+                continue
+            t0 = time.perf_counter()
+            actual = backend.value(name, filters)
+            seconds["duckdb"] += time.perf_counter() - t0
+            for problem in differences(expected, actual, name):
+                failures.setdefault(name, []).append((filters, problem))
+        # Whole pages, through the memo and each node's filter narrowing
+        for feature, aggregate in engine.PAGE_AGGREGATIONS.items():
+            if feature in ("Data Explorer", "Pattern Mining"):
+                continue
+            problems = differences(aggregate(reference.select(filters)), aggregate(with_sql.select(filters)), feature)
+            for problem in problems:
+                failures.setdefault(feature, []).append((filters, problem))
+
+    checks = len(selections) * len(sqlbackend.QUERIES)
+    print(f"{len(selections)} selections x {len(sqlbackend.QUERIES)} aggregates: "
+          f"pandas {seconds['pandas']:.2f}s, duckdb {seconds['duckdb']:.2f}s")
+    if not failures:
+        print(f"ok: {checks} aggregate checks and every page payload agree")
+        return 0
+    for name, found in failures.items():
+        print(f"MISMATCH {name}: {len(found)} selection(s)")
+        for filters, problem in found[:SHOW_MISMATCHES]:
+            print(f"  {problem}\n    filters: {filters}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Synthetic violation data matching the 33-column dashboard schema.
+
+Usage:
+    python -m bench.synth --rows 1000000 --out bench_data/violations_1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from geo import STATE_COORDS
+from ingest import OPTIONAL_COLUMNS, SOURCE_COLUMNS
+
+STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa",
+    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala",
+    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland",
+    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura",
+    "Uttar Pradesh", "Uttarakhand", "West Bengal", "Delhi", "Jammu and Kashmir",
+    "Ladakh", "Puducherry", "Chandigarh", "Andaman and Nicobar Islands",
+    "Dadra and Nagar Haveli and Daman and Diu", "Lakshadweep",
+]
+# Rough population weighting so a few large states dominate, as in real feeds
+STATE_WEIGHTS = np.array([
+    5, 1, 3, 8, 2, 1, 6, 3, 1, 3, 6, 3, 6, 10, 1, 1, 1, 1, 4, 3, 6, 1, 7, 4, 1,
+    14, 1, 7, 5, 1, 1, 1, 1, 1, 1, 1,
+], dtype=float)
+
+CATEGORIES = {
+    "Violation_Type": ["Driving Without License", "Drunk Driving", "No Helmet", "No Seatbelt",
+                       "Over-speeding", "Overloading", "Signal Jumping", "Using Mobile Phone",
+                       "Wrong Parking"],
+    "Vehicle_Type": ["Auto Rickshaw", "Bike", "Bus", "Car", "Scooter", "Truck"],
+    "Vehicle_Color": ["Black", "Blue", "Green", "Grey", "Red", "Silver", "White", "Yellow"],
+    "Driver_Gender": ["Female", "Male", "Other"],
+    "License_Type": ["Commercial", "Four-Wheeler", "Heavy Vehicle", "Learner", "Two-Wheeler"],
+    "Weather_Condition": ["Clear", "Cloudy", "Dust Storm", "Foggy", "Rainy"],
+    "Road_Condition": ["Dry", "Potholes", "Slippery", "Under Construction", "Wet"],
+    "Issuing_Agency": ["Highway Patrol", "Local Police", "RTO", "Traffic Police"],
+    "License_Validity": ["Expired", "Suspended", "Valid"],
+    "Helmet_Worn": ["N/A", "No", "Yes"],
+    "Seatbelt_Worn": ["N/A", "No", "Yes"],
+    "Traffic_Light_Status": ["Green", "Red", "Yellow"],
+    "Breathalyzer_Result": ["Negative", "Not Conducted", "Positive"],
+    "Towed": ["No", "Yes"],
+    "Fine_Paid": ["No", "Yes"],
+    "Payment_Method": ["Card", "Cash", "Not Paid", "Online"],
+    "Court_Appearance_Required": ["No", "Yes"],
+    "Comments": ["", "Fine Paid On Spot", "First Violation", "Repeat Offender"],
+}
+SPEED_LIMITS = np.array([30, 40, 50, 60, 80, 100])
+
+DEFAULT_CHUNK_ROWS = 500_000
+
+
+def _pick(rng, values, n, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+
+def generate_chunk(n, start_id=0, seed=0, start_date="2023-01-01", days=730, with_coords=False):
+    """One frame of n synthetic rows with realistic value cardinalities."""
+    rng = np.random.default_rng(seed)
+    cols = {}
+    cols["Violation_ID"] = np.char.add("VLT", (100000 + start_id + np.arange(n)).astype(str))
+    cols["Location"] = _pick(rng, STATES, n, STATE_WEIGHTS / STATE_WEIGHTS.sum())
+    cols["Registration_State"] = np.where(rng.random(n) < 0.8, cols["Location"], _pick(rng, STATES, n))
+    for col, values in CATEGORIES.items():
+        cols[col] = _pick(rng, values, n)
+    cols["Fine_Amount"] = rng.integers(100, 5001, n)
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+    cols["Date"] = dates.strftime("%Y-%m-%d")
+    # Violations peak in the morning and evening commutes
+    hour_weights = np.array([1, 1, 1, 1, 1, 2, 4, 7, 9, 8, 6, 5, 5, 5, 5, 6, 7, 9, 9, 7, 5, 3, 2, 1], dtype=float)
+    hours = rng.choice(24, size=n, p=hour_weights / hour_weights.sum())
+    minutes = rng.integers(0, 60, n)
+    cols["Time"] = np.char.add(np.char.add(np.char.zfill(hours.astype(str), 2), ":"), np.char.zfill(minutes.astype(str), 2))
+    cols["Vehicle_Model_Year"] = rng.integers(1995, 2024, n)
+    cols["Driver_Age"] = rng.integers(18, 76, n)
+    cols["Penalty_Points"] = rng.integers(0, 11, n)
+    cols["Officer_ID"] = np.char.add("OFF", rng.integers(1000, 10000, n).astype(str))
+    cols["Number_of_Passengers"] = rng.integers(1, 6, n)
+    limits = SPEED_LIMITS[rng.integers(0, len(SPEED_LIMITS), n)]
+    cols["Speed_Limit"] = limits
+    cols["Recorded_Speed"] = np.clip(np.rint(limits + rng.normal(5, 15, n)), 20, 160).astype(int)
+    cols["Alcohol_Level"] = np.round(rng.uniform(0, 0.5, n), 2)
+    cols["Previous_Violations"] = rng.integers(0, 6, n)
+    columns = SOURCE_COLUMNS
+    if with_coords:
+        # Scatter points around the state centroid, clustered near a few "cities"
+        centroids = np.array([STATE_COORDS[s] for s in cols["Location"]])
+        city = rng.integers(0, 4, n)[:, None] * np.array([0.6, -0.5])
+        coords = centroids + city + rng.normal(0, 0.15, (n, 2))
+        cols["Latitude"], cols["Longitude"] = np.round(coords[:, 0], 5), np.round(coords[:, 1], 5)
+        columns = SOURCE_COLUMNS + OPTIONAL_COLUMNS
+    return pd.DataFrame(cols)[columns]
+
+
+def write_csv(path, rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, with_coords=False):
+    """Write rows synthetic records to path, chunk by chunk to bound memory."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    with open(path, "w", newline="") as fh:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            chunk = generate_chunk(n, start_id=written, seed=seed + written, with_coords=with_coords)
+            chunk.to_csv(fh, index=False, header=(written == 0))
+            written += n
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-coords", action="store_true", help="add Latitude/Longitude columns")
+    args = parser.parse_args(argv)
+    write_csv(args.out, args.rows, seed=args.seed, with_coords=args.with_coords)
+    print(f"wrote {args.rows:,} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
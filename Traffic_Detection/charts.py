@@ -0,0 +1,150 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.colors import LogNorm
+
+from engine import SCATTER_MAX_POINTS, speed_scatter
+
+# --- Plotting Theme & Helper Functions (Light Background, Dark Bars) ---
+sns.set_theme(style='whitegrid', palette='Set2')
+plt.rcParams.update({
+    'figure.facecolor': '#ffffff',
+    'axes.facecolor': '#ffffff',
+    'axes.edgecolor': '#cccccc',
+    'xtick.color': '#333333',
+    'ytick.color': '#333333',
+    'text.color': '#333333',
+    'font.size': 11,
+    'grid.color': '#e0e0e0',
+    'grid.alpha': 0.5
+})
+
+ACCENT = '#2563eb'  # blue for light theme headings
+
+def plot_count(ax, series, title):
+    """Count plot using bar chart."""
+    vals = series.value_counts()
+    vals = vals[vals > 0]  # categoricals report unused categories as zero
+    sns.barplot(x=vals.index, y=vals.values, palette='Set2', ax=ax)
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel('')
+    ax.set_ylabel('Count', color='#333333')
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', color='#333333')
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_hist(ax, series, title, bins=30, color='#1e40af'):
+    """Histogram plot."""
+    ax.hist(series.dropna(), bins=bins, color=color, alpha=0.8, edgecolor='white')
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel(series.name or '', color='#333333')
+    ax.set_ylabel('Frequency', color='#333333')
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_hist_counts(ax, edges, counts, title, xlabel='', color='#1e40af'):
+    """Histogram from precomputed bin edges and counts."""
+    ax.hist(edges[:-1], bins=edges, weights=counts, color=color, alpha=0.8, edgecolor='white')
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel(xlabel, color='#333333')
+    ax.set_ylabel('Frequency', color='#333333')
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_line(ax, x_idx, y_vals, title):
+    """Line chart."""
+    # Accept pandas Series or numpy arrays
+    y = y_vals.values if hasattr(y_vals, 'values') else np.asarray(y_vals)
+    y = np.asarray(y).flatten()
+    ax.plot(range(len(x_idx)), y, color='#1e40af', marker='o', linewidth=2)
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xticks(range(len(x_idx)))
+    ax.set_xticklabels(list(x_idx), rotation=45, ha='right', color='#333333')
+    ax.set_ylabel('Count', color='#333333')
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_anomaly_series(ax, frame, title):
+    """Count series with its rolling baseline, flagged spikes marked in red."""
+    ax.plot(frame.index, frame['Count'], color='#1e40af', linewidth=1.5, label='Count')
+    ax.plot(frame.index, frame['Baseline'], color='#6b7280', linestyle='--', linewidth=1.5, label='Rolling median')
+    spikes = frame[frame['Flagged']]
+    ax.scatter(spikes.index, spikes['Count'], color='#dc2626', s=40, zorder=3, label='Flagged spike')
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_ylabel('Count', color='#333333')
+    ax.legend()
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_bar(ax, labels, values, title):
+    """Vertical bar chart."""
+    sns.barplot(x=list(labels), y=list(values), palette='Set2', ax=ax)
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel('')
+    ax.set_ylabel('Count', color='#333333')
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', color='#333333')
+    ax.grid(axis='y', alpha=0.3)
+
+def plot_barh(ax, labels, values, title):
+    """Horizontal bar chart."""
+    idx = np.arange(len(labels))
+    ax.barh(idx, values, color=sns.color_palette('Set2', len(labels)))
+    ax.set_yticks(idx)
+    ax.set_yticklabels(labels, color='#333333')
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel('Count', color='#333333')
+    ax.grid(axis='x', alpha=0.3)
+
+def plot_scatter_with_ref(ax, x, y, title, max_points=SCATTER_MAX_POINTS):
+    """Scatter plot with y=x reference line; switches to a density above max_points."""
+    plot_scatter_counts(ax, speed_scatter(x, y, max_points), title)
+
+def plot_scatter_counts(ax, scatter, title):
+    """Speed scatter from engine.speed_scatter: its points, or their 2-D histogram, plus y=x."""
+    if scatter["density"] is not None:
+        # One artist for any row count instead of one marker per row
+        counts, xedges, yedges = scatter["density"]
+        mesh = ax.pcolormesh(xedges, yedges, np.ma.masked_equal(counts.T, 0), cmap='Blues', norm=LogNorm())
+        plt.colorbar(mesh, ax=ax, shrink=0.8, label='Records (log)')
+    else:
+        x, y = scatter["points"]
+        ax.scatter(x, y, color='#1e40af', s=36, alpha=0.75, edgecolors='white', linewidths=0.5)
+    if scatter["range"] is not None:
+        minv, maxv = int(scatter["range"][0]), int(scatter["range"][1])
+        ax.plot([minv, maxv], [minv, maxv], ls='--', color='#666666', linewidth=1.5)
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+    ax.set_xlabel('Speed Limit (km/h)', color='#333333')
+    ax.set_ylabel('Recorded Speed (km/h)', color='#333333')
+    # Annotations come from every record of the selection, whichever way the points are drawn
+    ax.text(0.02, 0.98, f"{scatter['records']:,} records\n% Over Limit: {scatter['pct_over']:.1f}%\n"
+            f"Avg Excess: {scatter['avg_excess']:.1f} km/h",
+            transform=ax.transAxes, va='top', color='#333333', fontsize=9, bbox=dict(facecolor='#f5f5f5', alpha=0.9))
+    ax.grid(alpha=0.3)
+
+def plot_heatmap(ax, df_numeric, title):
+    """Heatmap of numeric correlations."""
+    plot_corr_heatmap(ax, df_numeric.corr(), title)
+
+def plot_corr_heatmap(ax, corr, title):
+    """Heatmap of a precomputed correlation matrix."""
+    sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1, ax=ax, cbar_kws={'shrink':0.8})
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
+
+def plot_count_heatmap(ax, table, title):
+    """Heatmap of a two-way count table."""
+    sns.heatmap(table, annot=True, fmt='d', cmap='coolwarm', ax=ax, cbar_kws={'label': 'Count'})
+    ax.set_title(title, color='#333333', fontsize=13, fontweight='bold')
+
+def plot_pie(ax, series, title, donut=False):
+    """Pie or donut chart."""
+    plot_pie_counts(ax, series.value_counts(), title, donut=donut)
+
+def plot_pie_counts(ax, counts, title, donut=False):
+    """Pie or donut chart from precomputed category counts."""
+    counts = counts[counts > 0]
+    colors = sns.color_palette('Set2', len(counts))
+    wedges, texts, autotexts = ax.pie(counts, labels=counts.index, autopct='%1.1f%%', colors=colors, startangle=90)
+    for text in texts:
+        text.set_color('#333333')
+    for autotext in autotexts:
+        autotext.set_color('#ffffff')
+        autotext.set_fontweight('bold')
+    if donut:
+        centre = plt.Circle((0,0),0.70,fc='#ffffff')
+        ax.add_artist(centre)
+    ax.set_title(title, color=ACCENT, fontsize=13, fontweight='bold')
@@ -0,0 +1,107 @@
+import pandas as pd
+
+# Dimensions the pages count violations by
+CUBE_DIMENSIONS = [
+    "State", "Violation_Type", "Weather_Condition", "Road_Condition",
+    "Hour", "Day", "Month", "Status",
+]
+
+# Sidebar filter columns; every cube must carry these so it can be sliced
+FILTER_DIMENSIONS = ["State", "Violation_Type", "Weather_Condition"]
+
+# Dimensions a page breaks the filtered counts down by, each with a page cube of its own
+BREAKDOWN_DIMENSIONS = ["Road_Condition", "Hour", "Day", "Month", "Status", "Payment_Method", "Grid_Cell"]
+
+# Filters key holding an inclusive (start, end) pair of dates
+DATE_RANGE = "Date_Range"
+
+
+class Cube:
+    """Violation counts and fine sums pre-aggregated over a set of dimensions.
+
+    Slicing and roll-ups work on the aggregated cells, so their cost follows
+    the number of distinct dimension combinations, not the number of rows.
+    """
+
+    def __init__(self, cells, dims):
+        self.cells = cells
+        self.dims = list(dims)
+
+    @classmethod
+    def build(cls, df, dims=CUBE_DIMENSIONS):
+        """Aggregate a cleaned frame into a cube over the given dimensions."""
+        dims = [d for d in dims if d in df.columns]
+        if df.empty or not dims:
+            return cls(pd.DataFrame(columns=dims + ["count", "fines"]), dims)
+        cells = (df.groupby(dims, observed=True, dropna=False)["Fine_Amount"]
+                 .agg(count="size", fines="sum")
+                 .reset_index())
+        return cls(cells, dims)
+
+    def merge(self, other):
+        """Cube over the rows of both cubes; they must share dimensions."""
+        cells = pd.concat([self.cells, other.cells], ignore_index=True)
+        cells = (cells.groupby(self.dims, observed=True, dropna=False, sort=False)[["count", "fines"]]
+                 .sum()
+                 .reset_index())
+        return Cube(cells, self.dims)
+
+    def subtract(self, other):
+        """Cube over this cube's rows less other's, which must be among them; cells left empty are dropped."""
+        cells = self.merge(Cube(other.cells.assign(count=-other.cells["count"], fines=-other.cells["fines"]),
+                                other.dims)).cells
+        return Cube(cells[cells["count"] != 0].reset_index(drop=True), self.dims)
+
+    def slice(self, selections):
+        """Sub-cube keeping cells whose values are in each {dim: values} selection."""
+        mask = pd.Series(True, index=self.cells.index)
+        for dim, values in selections.items():
+            if dim in self.dims and values is not None:
+                mask &= self.cells[dim].isin(values)
+        return Cube(self.cells[mask], self.dims)
+
+    @property
+    def empty(self):
+        return self.total() == 0
+
+    def total(self):
+        return int(self.cells["count"].sum())
+
+    def total_fines(self):
+        return float(self.cells["fines"].sum())
+
+    def value_counts(self, dim, dropna=True):
+        """Equivalent of df[dim].value_counts() on the rows the cube covers."""
+        counts = self.cells.groupby(dim, observed=True, dropna=dropna)["count"].sum()
+        counts = counts[counts > 0].astype('int64')
+        return counts.sort_values(ascending=False, kind='stable').rename("count")
+
+    def fine_sums(self, dim):
+        """Equivalent of df.groupby(dim)['Fine_Amount'].sum()."""
+        return self.cells.groupby(dim, observed=True)["fines"].sum()
+
+    def nunique(self, dim):
+        return int(self.value_counts(dim).size)
+
+    def pivot(self, rows, cols):
+        """Count table of rows × cols, like groupby([rows, cols]).size().unstack()."""
+        table = self.cells.groupby([rows, cols], observed=True)["count"].sum()
+        # unstack can leave the columns out of value order when some values only
+        # occur with a missing row value; sort both axes
+        table = table[table > 0].unstack(fill_value=0).astype('int64')
+        return table.sort_index().sort_index(axis=1)
+
+
+def build_page_cubes(df):
+    """Cubes the dashboard pages read from, keyed by name.
+
+    "main" is over the filter dimensions alone, and each breakdown dimension
+    present gets a cube over the filters plus itself, keyed by its name. A
+    single cube over all of them would have close to one cell per row, so
+    its size would follow the data rather than the number of values.
+    """
+    cubes = {"main": Cube.build(df, FILTER_DIMENSIONS)}
+    for dim in BREAKDOWN_DIMENSIONS:
+        if dim in df.columns:
+            cubes[dim] = Cube.build(df, FILTER_DIMENSIONS + [dim])
+    return cubes
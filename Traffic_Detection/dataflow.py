@@ -0,0 +1,134 @@
+"""Page aggregates as memoized nodes, keyed by the filters each one reads.
+
+Every table or number a page shows is a Node: a function of a Selection
+that declares the sidebar filters and the columns it depends on. Results
+are memoized on the Dataset under (node, the values of just those
+filters), so a filter change only recomputes the nodes that read the
+changed filter, and a node several pages show (State counts on the
+Overview and the Location page) is computed once for all of them and for
+every session sharing the dataset.
+
+A count or sum grouped by a filter dimension does not need that filter
+to be applied first: the node is computed over every value of it and the
+result narrowed to the selected values, which gives the same table. So
+changing the Weather filter leaves the Weather Condition counts to a
+lookup.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class Node:
+    """fn(sel) over the filters it depends on.
+
+    filters: filter keys the result depends on; changes to any other key
+        (or to the narrow dimension) reuse the memoized result.
+    narrow: a filter dimension fn groups by; the node is computed without
+        that filter and its result (indexed by the dimension) narrowed to
+        the selected values.
+    columns: columns fn reads; without all of them the node is None.
+    rows: fn reads the selection's rows, not just aggregates; on a streamed
+        Dataset, which keeps none, the node is None.
+    """
+
+    def __init__(self, fn, filters, narrow=None, columns=(), rows=False):
+        self.fn = fn
+        self.filters = tuple(filters)
+        self.narrow = narrow
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def depends_on(self, key):
+        return key != self.narrow and key in self.filters
+
+    def restrict(self, filters):
+        """The part of filters the computation uses."""
+        return {key: values for key, values in filters.items() if self.depends_on(key)}
+
+    def compute(self, sel, fn=None):
+        """fn(sel) for a selection of restrict(filters); the part to memoize.
+
+        fn, if given, stands in for the node's own function (another backend's,
+        which has checked its own columns, so the dataset's rows are not loaded).
+        """
+        if fn is None and not set(self.columns) <= set(sel.dataset.columns):
+            return None
+        if self.rows and sel.dataset.streamed:
+            return None
+        return (fn or self.fn)(sel)
+
+    def narrowed(self, result, filters):
+        """A computed result cut down to the narrow dimension's selected values."""
+        values = filters.get(self.narrow) if self.narrow is not None else None
+        if result is None or values is None:
+            return result
+        return result[result.index.isin(values)]
+
+
+def _value_key(value):
+    """Sortable key of one filter value; missing values (None, NaN, NA) share one that no string has."""
+    if not isinstance(value, (list, tuple)) and pd.isna(value):
+        return (0, "")
+    return (1, str(value))
+
+
+def filters_key(filters):
+    """Hashable form of {key: values}; order of keys and values does not matter."""
+    return tuple(sorted((key, None if values is None else tuple(sorted(map(_value_key, values))))
+                        for key, values in filters.items()))
+
+
+def nbytes(value):
+    """Rough in-memory size of a node result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return 64 + sum(nbytes(k) + nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(nbytes(v) for v in value)
+    return 64
+
+
+class Memo:
+    """Size-bounded LRU of node results for one Dataset.
+
+    Results are shared by every caller and must not be modified in place.
+    A result over a quarter of the budget is returned but not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key][0]
+            self.misses += 1
+        result = compute()
+        size = nbytes(result)
+        if size > self.max_bytes // 4:
+            return result
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = (result, size)
+                self.bytes_used += size
+                while self.bytes_used > self.max_bytes:
+                    _, (_, evicted) = self._results.popitem(last=False)
+                    self.bytes_used -= evicted
+        return result
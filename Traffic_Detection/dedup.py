@@ -0,0 +1,200 @@
+"""De-duplication keyed on Violation_ID, with a persistent hash index.
+
+Rows sharing a Violation_ID are copies of one violation. Identical copies
+are dropped quietly; copies whose other fields differ are conflicts, and
+one version is kept by policy while the others go to a conflict report:
+
+    "last"   last write wins: a later copy replaces the earlier one
+    "first"  first seen: the earliest copy is kept, later ones are dropped
+
+Every row's ID is hashed, but the content hash over the other fields is
+only computed for rows whose ID repeats. A KeyIndex keeps the ID hash and
+content hash of each distinct ID, 16 bytes per row however wide the rows
+are, and saves to .npz, so newly arrived rows are checked against
+everything indexed before without reloading it.
+
+Rows without an ID (and frames without the column) fall back to whole-row
+duplicates.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMN = "Violation_ID"
+POLICIES = ["last", "first"]
+DEFAULT_POLICY = "last"
+
+# Columns the conflict report puts in front of each discarded row's fields
+REPORT_COLUMNS = ["Conflict_Source", "Resolution"]
+RESOLUTIONS = {
+    "last": "superseded by a later copy",
+    "first": "dropped, an earlier copy was kept",
+}
+
+
+def check_policy(policy):
+    if policy not in POLICIES:
+        raise ValueError(f"unknown de-duplication policy {policy!r}; expected one of {POLICIES}")
+
+
+def content_hashes(df):
+    """64-bit hash of each row's fields other than the ID."""
+    # Columns in name order, so files with differently ordered columns agree;
+    # numbers as float, so an int column in one file matches the same column
+    # read as float (because of a missing value) in another
+    frame = df[sorted(c for c in df.columns if c != KEY_COLUMN)]
+    numeric = frame.select_dtypes('number').columns
+    frame = frame.astype({col: 'float64' for col in numeric})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def key_hashes(df):
+    """64-bit hash of each row's ID; rows without one are keyed by their content."""
+    if KEY_COLUMN not in df.columns:
+        return content_hashes(df)
+    ids = df[KEY_COLUMN]
+    # A copy: the array pandas hands back may be read-only
+    hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy(copy=True)
+    missing = ids.isna().to_numpy()
+    if missing.any():
+        hashes[missing] = content_hashes(df[missing])
+    return hashes
+
+
+def empty_report(columns=()):
+    return pd.DataFrame(columns=REPORT_COLUMNS + [c for c in columns if c not in REPORT_COLUMNS])
+
+
+def report(rows, source, policy):
+    """Conflict report rows for the discarded versions in rows.
+
+    source names where they came from: one label, or one per row.
+    """
+    out = rows.reset_index(drop=True)
+    out.insert(0, "Resolution", RESOLUTIONS[policy])
+    out.insert(0, "Conflict_Source", source)
+    return out
+
+
+def concat_reports(reports):
+    reports = [r for r in reports if r is not None and len(r)]
+    if not reports:
+        return empty_report()
+    return pd.concat(reports, ignore_index=True)
+
+
+def deduplicate(df, policy=DEFAULT_POLICY, source="", hashes=None):
+    """(rows, conflicts): df with one row per ID, and a report of the conflicting versions dropped.
+
+    Kept rows stay in their original order. Which row survives depends only
+    on the IDs, so a load projected to fewer columns keeps the same rows.
+    hashes, if given, are df's (key, content) hashes, computed earlier.
+    """
+    check_policy(policy)
+    keys = pd.Series(key_hashes(df) if hashes is None else hashes[0])
+    repeated = keys.duplicated(keep=False).to_numpy()
+    if not repeated.any():
+        return df, empty_report(df.columns)
+    positions = np.flatnonzero(repeated)
+    copies = pd.DataFrame({
+        "key": keys.to_numpy()[positions],
+        "content": content_hashes(df.iloc[positions]) if hashes is None else hashes[1][positions],
+        "winner": ~keys.duplicated(keep=policy).to_numpy()[positions],
+    })
+    kept_content = copies.loc[copies["winner"]].set_index("key")["content"]
+    differs = copies["content"].to_numpy() != kept_content.reindex(copies["key"]).to_numpy()
+    # The first row holding the winning version is kept, so an exact copy
+    # sent again later does not move it
+    keep = ~repeated
+    keep[positions[copies[~differs].drop_duplicates("key").index.to_numpy()]] = True
+    # One report row per distinct discarded version
+    discarded = positions[copies[differs].drop_duplicates(["key", "content"]).index.to_numpy()]
+    if not isinstance(source, str):
+        source = np.asarray(source)[discarded]
+    return df[keep], report(df.iloc[discarded], source, policy)
+
+
+class KeyIndex:
+    """ID hashes of every row indexed so far, with the content hash of each ID's current version.
+
+    Both arrays are sorted by ID hash: 16 bytes per distinct ID.
+    """
+
+    def __init__(self, keys=None, contents=None):
+        self.keys = np.empty(0, dtype=np.uint64) if keys is None else keys
+        self.contents = np.empty(0, dtype=np.uint64) if contents is None else contents
+
+    @classmethod
+    def build(cls, df):
+        """Index of a frame that is already de-duplicated."""
+        index = cls()
+        index._add(key_hashes(df), content_hashes(df))
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.contents.nbytes
+
+    def _positions(self, keys):
+        """(seen, pos): which keys are indexed, and where."""
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.intp)
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+        return self.keys[pos] == keys, pos
+
+    def lookup(self, keys):
+        """Content hash of each key's indexed version (0 where not indexed)."""
+        seen, pos = self._positions(keys)
+        return np.where(seen, self.contents[pos] if len(self.contents) else 0, 0).astype(np.uint64)
+
+    def _add(self, keys, contents):
+        keys = np.concatenate([self.keys, keys])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.contents = np.concatenate([self.contents, contents])[order]
+
+    def filter(self, df, policy=DEFAULT_POLICY, source=""):
+        """(rows, conflicts, replaced) for a de-duplicated frame checked against the index.
+
+        rows are df's rows to ingest: IDs not indexed yet and, under "last",
+        changed versions of indexed ones, whose IDs come back in replaced so
+        the caller can drop (and report) the rows they supersede. Under
+        "first" changed versions are dropped into conflicts instead. Exact
+        copies of indexed rows are dropped either way. The index takes in
+        the rows returned.
+        """
+        check_policy(policy)
+        keys = key_hashes(df)
+        contents = content_hashes(df)
+        seen, pos = self._positions(keys)
+        changed = seen.copy()
+        changed[seen] = self.contents[pos[seen]] != contents[seen]
+        fresh = ~seen
+        if policy == "last":
+            self.contents[pos[changed]] = contents[changed]
+            keep = fresh | changed
+            conflicts = empty_report(df.columns)
+            replaced = df.loc[changed, KEY_COLUMN].to_numpy() if KEY_COLUMN in df.columns else np.empty(0)
+        else:
+            keep = fresh
+            conflicts = report(df[changed], source, policy)
+            replaced = np.empty(0)
+        self._add(keys[fresh], contents[fresh])
+        return df[keep], conflicts, replaced
+
+    def save(self, path):
+        """Write the index to path (.npz), atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, keys=self.keys, contents=self.contents)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["keys"], data["contents"])
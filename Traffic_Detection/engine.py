@@ -0,0 +1,856 @@
+"""Streamlit-free analytics engine behind the dashboard pages.
+
+Each page function takes a Selection and returns plain pandas tables, so the
+same numbers can be produced from batch jobs, benchmarks or other front ends.
+Nothing here imports matplotlib, seaborn or folium.
+"""
+import copy
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import geo
+from anomalies import count_series
+from associations import encode
+from cube import DATE_RANGE, FILTER_DIMENSIONS, Cube, build_page_cubes
+from dataflow import Memo, Node, filters_key
+from dedup import DEFAULT_POLICY, KEY_COLUMN, concat_reports, empty_report, report
+from filter_index import FilteredView, FilterIndex
+from framestore import FrameStore
+from ingest import DAY_ORDER, MONTH_ORDER, conflict_report, file_fingerprint, load_compact
+from moments import MomentCube, bin_edges
+from partitions import combine, load_partitioned
+from sketches import DISTINCT_COLUMNS, SKETCH_DIMENSIONS, TOP_K_COLUMNS, SketchCube
+from sqlbackend import DEFAULT_BACKEND, check_backend, open_backend
+from streaming import DEFAULT_CHUNKSIZE, STREAM_POLICY, clean_chunks, value_ranges
+
+FEATURES = [
+    "Overview Dashboard",
+    "Violation Distribution",
+    "Speed Analysis",
+    "Trend Analysis",
+    "Weather Risk Analysis",
+    "Location & Map",
+    "Data Explorer",
+    "Anomaly Detection",
+    "Pattern Mining",
+    "Top Entities",
+    "About",
+]
+
+
+SPEED_COLUMNS = ['Recorded_Speed', 'Speed_Limit', 'Fine_Amount', 'Driver_Age']
+HIST_COLUMNS = ['Recorded_Speed', 'Fine_Amount']
+
+# Rows per ranking on the Top Entities page
+TOP_ENTITIES = 50
+
+# Above this many records the speed scatter is drawn as a density of
+# SCATTER_BINS x SCATTER_BINS cells instead of one point per record
+SCATTER_MAX_POINTS = 20000
+SCATTER_BINS = 60
+
+# How a CSV source is loaded: "memory" keeps the cleaned rows, "stream"
+# folds bounded chunks into the page aggregates and keeps none (see streaming)
+INGEST_MODES = ["memory", "stream"]
+DEFAULT_INGEST = "memory"
+
+# Data Explorer
+SEARCH_COLUMNS = ["Violation_ID", "Officer_ID"]
+PAGE_SIZES = [25, 50, 100, 500]
+_SEARCH_CACHE_SIZE = 16
+
+
+class Dataset:
+    """A cleaned violations frame plus the indexes the pages query.
+
+    Treated as immutable once built, so one instance can back every session;
+    per-session state is just the filters and the Selection built from them.
+    df holds every row appended, including rows later ones superseded
+    (dropped); frame() and n_rows are the rows the dataset covers.
+    """
+
+    # True for Dataset.from_stream: the aggregates without the rows
+    streamed = False
+
+    # Sorted positions in df of rows superseded by later ones (see appended)
+    dropped = np.empty(0, dtype=np.intp)
+
+    # Built from the frame: up front with pandas alone, on first use when
+    # the SQL backend answers the aggregates
+    STRUCTURES = ("cubes", "index", "moments", "sketches", "filter_options")
+
+    def __init__(self, df, version=None, lazy=None, conflicts=None, sql=None, load=None):
+        """df and lazy are the rows; or df is None and load() returns (df, lazy) when first needed."""
+        if df is not None:
+            self.df = df.reset_index(drop=True)
+            # ingest.LazyColumns: columns no page aggregates, read when shown
+            self.lazy = lazy
+        self._load = load
+        self.version = version
+        # Conflicting duplicates de-duplication dropped (dedup report frame)
+        self.conflicts = conflicts if conflicts is not None else empty_report()
+        # sqlbackend.SqlBackend over the same rows, answering the aggregates
+        # it has queries for; None computes everything with pandas
+        self.sql = sql
+        self._lock = threading.Lock()
+        if sql is None:
+            for name in self.STRUCTURES:
+                getattr(self, name)
+
+    @cached_property
+    def _loaded(self):
+        df, lazy = self._load()
+        return df.reset_index(drop=True), lazy
+
+    @cached_property
+    def df(self):
+        return self._loaded[0]
+
+    @cached_property
+    def lazy(self):
+        return self._loaded[1]
+
+    @cached_property
+    def store(self):
+        """df's columns in storage appended() can add rows to in place."""
+        return FrameStore.from_frame(self.df)
+
+    @cached_property
+    def cubes(self):
+        return build_page_cubes(self.df)
+
+    @cached_property
+    def index(self):
+        return FilterIndex(self.df)
+
+    @cached_property
+    def moments(self):
+        return MomentCube.build(self.df, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS)
+
+    @cached_property
+    def sketches(self):
+        # Officer_ID may be a lazy column; read just the sketched ones
+        columns = list(dict.fromkeys(SKETCH_DIMENSIONS + TOP_K_COLUMNS + DISTINCT_COLUMNS + ["Fine_Amount"]))
+        return SketchCube.build(self.frame([c for c in columns if c in self.columns]))
+
+    @cached_property
+    def filter_options(self):
+        """Sidebar options in order of first appearance, like Series.unique()."""
+        if self.sql is not None:
+            return self.sql.filter_options()
+        return {col: list(self.df[col].unique()) for col in FILTER_DIMENSIONS if col in self.df.columns}
+
+    def appended(self, rows, version=None, replaced=(), conflicts=None):
+        """A new Dataset with newly ingested cleaned rows added; this one is left untouched.
+
+        The rows are written into spare capacity at the end of the frame's
+        columns and bitmaps (see framestore), and cubes, moment partials and
+        sketches built for them are merged in, so an append costs the new
+        rows, not the rows loaded. replaced are Violation_IDs whose loaded
+        rows the new ones supersede (last write wins): finding those rows
+        is one vectorized scan of the IDs, after which they stay in df but
+        are masked out of the index, and partials built for them alone are
+        subtracted from the aggregates. Distinct counts cannot take values
+        back out, so they may still count one only superseded rows had.
+        Rows older than the newest one already loaded (or values outside
+        the histogram range) fall back to a full rebuild, which keeps the
+        frame sorted by Timestamp. The superseded rows and any further
+        conflicts join the conflict report; conflicts alone give a new
+        Dataset over the same rows.
+        """
+        if self.streamed:
+            raise ValueError("a streamed dataset keeps no rows to append to")
+        conflicts = concat_reports([self.conflicts, conflicts])
+        if rows.empty:
+            if len(conflicts) == len(self.conflicts):
+                return self
+            dataset = copy.copy(self)
+            dataset.version = version
+            dataset.conflicts = conflicts
+            dataset._lock = threading.Lock()
+            # Node results may include the conflicts; start a fresh memo
+            dataset.__dict__.pop("memo", None)
+            return dataset
+        superseded = np.empty(0, dtype=np.intp)
+        if len(replaced):
+            superseded = np.setdiff1d(np.flatnonzero(self.df[KEY_COLUMN].isin(replaced).to_numpy()), self.dropped)
+            conflicts = concat_reports([conflicts, report(self.frame(rows=superseded), "loaded rows", "last")])
+        ts = self.timestamps
+        in_order = (not self.df.empty and len(ts) == len(self.df) and "Timestamp" in rows.columns
+                    and rows["Timestamp"].notna().all() and rows["Timestamp"].min() >= ts[-1])
+        if not in_order or not self.moments.covers(rows):
+            dropped = np.union1d(self.dropped, superseded)
+            frame = self.frame(rows=np.delete(np.arange(len(self.df)), dropped)) if len(dropped) else self.frame()
+            return Dataset(combine([frame, rows])[0], version, conflicts=conflicts)
+
+        cubes, index, moments, sketches = self.cubes, self.index, self.moments, self.sketches
+        if len(superseded):
+            gone = self.frame(rows=superseded)
+            gone_cubes = build_page_cubes(gone)
+            cubes = {name: cube.subtract(gone_cubes[name]) for name, cube in cubes.items()}
+            index = index.without(superseded)
+            moments = moments.subtract(MomentCube.build(gone, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS,
+                                                        center=moments.center, hist_edges=moments.hist_edges))
+            sketches = sketches.subtract(SketchCube.build(gone))
+
+        # Derived caches (stats, sort orders, search) start empty on the new instance
+        dataset = Dataset.__new__(Dataset)
+        dataset.store = self.store.appended(rows[list(self.df.columns)])
+        dataset.df = dataset.store.frame()
+        dataset.dropped = np.union1d(self.dropped, superseded).astype(np.intp)
+        dataset.version = version
+        # The SQL backend's database holds only the rows it was built from
+        dataset.sql = None
+        dataset.lazy = self.lazy.extended(rows) if self.lazy is not None else None
+        dataset.conflicts = conflicts
+        # In order, so no missing timestamps to cut off
+        dataset.timestamps = dataset.df["Timestamp"].to_numpy()
+        new_cubes = build_page_cubes(rows)
+        dataset.cubes = {name: cube.merge(new_cubes[name]) for name, cube in cubes.items()}
+        dataset.index = index.extended(rows)
+        dataset.moments = moments.merge(MomentCube.build(
+            rows, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS,
+            center=moments.center, hist_edges=moments.hist_edges))
+        dataset.sketches = sketches.merge(SketchCube.build(rows))
+        dataset.filter_options = {}
+        for col, options in self.filter_options.items():
+            seen = set(options)
+            dataset.filter_options[col] = options + [v for v in rows[col].unique() if v not in seen]
+        dataset._lock = threading.Lock()
+        return dataset
+
+    @classmethod
+    def from_csv(cls, file_path, policy=DEFAULT_POLICY, progress=None, backend=DEFAULT_BACKEND):
+        """Dataset for a CSV file; backend "duckdb" answers the SQL backend's aggregates with SQL.
+
+        With "duckdb" the rows are loaded into pandas only when a page first
+        asks for something SQL does not answer.
+        """
+        check_backend(backend)
+        sql = open_backend(backend, file_path, policy)
+        load = lambda: load_compact(file_path, policy=policy, progress=progress)
+        if sql is not None:
+            # The database build already cleaned the file, which saved the conflicts
+            return cls(None, file_fingerprint(file_path), conflicts=conflict_report(file_path, policy),
+                       sql=sql, load=load)
+        df, lazy = load()
+        return cls(df, file_fingerprint(file_path), lazy, conflict_report(file_path, policy))
+
+    @classmethod
+    def from_stream(cls, file_path, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+        """Dataset of a CSV's page aggregates, built a chunk at a time without keeping its rows.
+
+        Memory follows chunksize and the number of distinct values, not the
+        number of rows; distinct Violation_IDs count too, since the
+        de-duplication index keeps them all. The file is read twice, the
+        first time only to fix the histogram bins (see streaming for both
+        limits). A repeated Violation_ID keeps its first copy. Nodes that
+        read rows (the speed scatter, spike series, matched rows) are None,
+        pages built on rows (Data Explorer rows, Pattern Mining) are
+        unavailable, and there are no dates to filter by. progress, if
+        given, is called with the number of rows ingested so far.
+        """
+        # A first, narrow pass fixes the histogram bins every chunk is binned into
+        edges = {col: bin_edges(lo, hi) for col, (lo, hi) in value_ranges(file_path, HIST_COLUMNS, chunksize).items()}
+        cubes = moments = sketches = columns = missing = None
+        options, reports, ingested = {}, [], 0
+        for rows, conflicts in clean_chunks(file_path, chunksize):
+            reports.append(conflicts)
+            if rows.empty:
+                continue
+            new_cubes = build_page_cubes(rows)
+            new_moments = MomentCube.build(rows, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS,
+                                           center=moments.center if moments is not None else None,
+                                           hist_edges=edges)
+            new_sketches = SketchCube.build(rows)
+            if cubes is None:
+                cubes, moments, sketches = new_cubes, new_moments, new_sketches
+                columns, missing = rows.iloc[:0], rows.isnull().sum()
+            else:
+                cubes = {name: cube.merge(new_cubes[name]) for name, cube in cubes.items()}
+                moments = moments.merge(new_moments)
+                sketches = sketches.merge(new_sketches)
+                missing = missing.add(rows.isnull().sum(), fill_value=0).astype('int64')
+            # Sidebar options in order of first appearance in the file
+            for col in FILTER_DIMENSIONS:
+                if col in rows.columns:
+                    seen = set(options.setdefault(col, []))
+                    options[col] += [v for v in rows[col].unique() if v not in seen]
+            ingested += len(rows)
+            if progress is not None:
+                progress(ingested)
+        conflicts = concat_reports(reports)
+        if cubes is None:
+            return cls(pd.DataFrame(), file_fingerprint(file_path), conflicts=conflicts)
+
+        dataset = cls.__new__(cls)
+        dataset.streamed = True
+        # No rows, but the columns (and dtypes) they had
+        dataset.df = columns
+        dataset.version = file_fingerprint(file_path)
+        dataset.lazy = None
+        dataset.sql = None
+        dataset.conflicts = conflicts
+        dataset.cubes = cubes
+        dataset.index = FilterIndex(columns)
+        dataset.moments = moments
+        dataset.sketches = sketches
+        dataset.filter_options = options
+        dataset.stats = {
+            "shape": (ingested, len(columns.columns)),
+            "memory_mb": 0.0,
+            "lazy_columns": [],
+            "missing": missing,
+        }
+        dataset._lock = threading.Lock()
+        return dataset
+
+    @classmethod
+    def from_source(cls, source, policy=DEFAULT_POLICY, backend=DEFAULT_BACKEND, ingest=DEFAULT_INGEST):
+        """Dataset for a CSV file or a partitioned directory (pandas backend only).
+
+        ingest "stream" reads a CSV file in bounded chunks (see from_stream);
+        it keeps the first copy of a repeated ID, so policy must be "first".
+        """
+        if ingest not in INGEST_MODES:
+            raise ValueError(f"unknown ingest mode {ingest!r}; expected one of {INGEST_MODES}")
+        if ingest == "stream":
+            check_backend(backend)
+            if os.path.isdir(source) or backend != "pandas" or policy != STREAM_POLICY:
+                raise ValueError(f"streaming ingest reads a single CSV file with the pandas backend "
+                                 f"and the {STREAM_POLICY!r} de-duplication policy")
+            return cls.from_stream(source)
+        if os.path.isdir(source):
+            check_backend(backend)
+            if backend != "pandas":
+                raise ValueError(f"the {backend} backend reads a single CSV file, not a partitioned directory")
+            df, version, conflicts = load_partitioned(source, policy=policy)
+            return cls(df, version, conflicts=conflicts)
+        return cls.from_csv(source, policy, backend=backend)
+
+    @property
+    def empty(self):
+        return self.n_rows == 0
+
+    @cached_property
+    def n_rows(self):
+        """Rows the dataset covers; a streamed one has counted them but kept none."""
+        if self.streamed:
+            return self.cubes["main"].total()
+        if self.sql is not None and "df" not in self.__dict__:
+            return self.sql.total({})
+        return len(self.df) - len(self.dropped)
+
+    @property
+    def columns(self):
+        """Every column, in memory or lazy."""
+        return list(self.df.columns) + (self.lazy.columns if self.lazy is not None else [])
+
+    def frame(self, columns=None, rows=None):
+        """columns (default all) at row positions rows (default all but dropped ones); lazy columns are read here."""
+        columns = self.columns if columns is None else list(columns)
+        if rows is None and len(self.dropped):
+            rows = np.delete(np.arange(len(self.df)), self.dropped)
+        lazy = [c for c in columns if c not in self.df.columns]
+        if lazy and (self.lazy is None or not set(lazy) <= set(self.lazy.columns)):
+            raise KeyError(f"no such columns: {[c for c in lazy if self.lazy is None or c not in self.lazy.columns]}")
+        frame = self.df[[c for c in columns if c in self.df.columns]]
+        if rows is not None:
+            rows = np.asarray(rows)
+            frame = frame.iloc[rows]
+        if lazy:
+            frame = pd.concat([frame, self.lazy.read(lazy, rows)], axis=1)[columns]
+        return frame
+
+    def default_filters(self):
+        """The sidebar defaults: first five states, every type and weather."""
+        return {
+            "State": self.filter_options.get("State", [])[:5],
+            "Violation_Type": self.filter_options.get("Violation_Type", []),
+            "Weather_Condition": self.filter_options.get("Weather_Condition", []),
+        }
+
+    def select(self, filters):
+        return Selection(self, filters)
+
+    @cached_property
+    def timestamps(self):
+        """Sorted Timestamp values with missing ones (kept at the end of the frame) cut off."""
+        if "Timestamp" not in self.df.columns:
+            return np.empty(0, dtype="datetime64[ns]")
+        values = self.df["Timestamp"].to_numpy()
+        return values[:len(values) - int(np.isnat(values).sum())]
+
+    @cached_property
+    def date_bounds(self):
+        """(first, last) date in the data, or None without timestamps."""
+        if self.sql is not None and "df" not in self.__dict__:
+            return self.sql.date_bounds()
+        ends = _live_ends(len(self.timestamps), self.dropped)
+        if ends is None:
+            return None
+        first, last = self.timestamps[list(ends)]
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    def row_range(self, start, end):
+        """[lo, hi) row positions dated start..end inclusive, by binary search."""
+        ts = self.timestamps
+        lo = np.searchsorted(ts, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = np.searchsorted(ts, np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1)), side='left')
+        return int(lo), int(max(lo, hi))
+
+    @cached_property
+    def stats(self):
+        """Shape, true in-memory footprint and missing values; computed once per dataset."""
+        # Dropped rows' missing values are counted and taken back off
+        dropped = self.dropped
+        missing = self.df.isnull().sum() - self.df.iloc[dropped].isnull().sum()
+        lazy = self.lazy.columns if self.lazy is not None else []
+        if lazy:
+            # One column at a time, so the lazy columns are never all in memory
+            missing = pd.concat([missing, pd.Series({
+                col: int(self.lazy.read([col])[col].isnull().sum())
+                - int(self.lazy.read([col], dropped)[col].isnull().sum()) for col in lazy})])
+        return {
+            "shape": (self.n_rows, len(self.columns)),
+            "memory_mb": self.df.memory_usage(deep=True).sum() / 1024**2,
+            "lazy_columns": lazy,
+            "missing": missing,
+        }
+
+    @cached_property
+    def mining_codes(self):
+        """encode() of the whole frame: integer codes for the association-rule columns."""
+        return encode(self.df)
+
+    @cached_property
+    def _sort_orders(self):
+        return {}
+
+    def sort_order(self, column, ascending=True):
+        """Row positions of the whole frame sorted by column (missing values last), cached."""
+        key = (column, ascending)
+        if key not in self._sort_orders:
+            ordered = self.frame([column])[column].sort_values(ascending=ascending, kind='stable', na_position='last')
+            self._sort_orders[key] = ordered.index.to_numpy()
+        return self._sort_orders[key]
+
+    @cached_property
+    def memo(self):
+        """Memoized node results (see Selection.value), shared by every session."""
+        return Memo()
+
+    @cached_property
+    def _search_cache(self):
+        return OrderedDict()
+
+    @cached_property
+    def _search_index(self):
+        index = {}
+        for col in SEARCH_COLUMNS:
+            if col in self.columns:
+                values = self.frame([col])[col].astype('category')
+                index[col] = (values.cat.categories.astype(str).str.lower(), values.cat.codes.to_numpy())
+        return index
+
+    def search(self, text):
+        """Sorted row positions whose Violation_ID or Officer_ID contains text (case-insensitive)."""
+        text = text.strip().lower()
+        cache = self._search_cache
+        with self._lock:
+            if text in cache:
+                cache.move_to_end(text)
+                return cache[text]
+        mask = np.zeros(len(self.df), dtype=bool)
+        for values, codes in self._search_index.values():
+            # Match distinct values, then map back to rows through the codes;
+            # the extra False slot absorbs code -1 (missing)
+            hits = np.append(values.str.contains(text, regex=False), False)
+            mask |= hits[codes]
+        rows = np.flatnonzero(mask)
+        with self._lock:
+            cache[text] = rows
+            if len(cache) > _SEARCH_CACHE_SIZE:
+                cache.popitem(last=False)
+        return rows
+
+
+def _live_ends(n, dropped):
+    """(first, last) of the positions below n not in dropped (sorted), or None if there are none."""
+    dropped = dropped[dropped < n]
+    # Lengths of the runs of dropped positions at either end
+    head = int(np.searchsorted(dropped - np.arange(len(dropped)), 1))
+    tail = int(np.searchsorted(n - 1 - dropped[::-1] - np.arange(len(dropped)), 1))
+    if head >= n:
+        return None
+    return head, n - 1 - tail
+
+
+class Selection:
+    """The rows and cube cells matching one set of sidebar filters."""
+
+    def __init__(self, dataset, filters):
+        self.dataset = dataset
+        self.filters = filters
+        self._cubes = {}
+        # Selections of a subset of the filters, for nodes that read only those
+        self._restricted = {}
+
+    def value(self, name):
+        """NODES[name] for this selection, memoized on the dataset by the filters it depends on."""
+        node = NODES[name]
+        filters = node.restrict(self.filters)
+        key = filters_key(filters)
+        if len(filters) == len(self.filters):
+            sel = self
+        else:
+            sel = self._restricted.get(key)
+            if sel is None:
+                sel = self._restricted[key] = Selection(self.dataset, filters)
+        # The SQL backend, where it has a query for the node, answers instead of pandas
+        backend = self.dataset.sql
+        fn = None
+        if backend is not None and backend.answers(name):
+            fn = lambda sel: backend.value(name, sel.filters)
+        result = self.dataset.memo.get_or_compute((name, key), lambda: node.compute(sel, fn))
+        return node.narrowed(result, self.filters)
+
+    @cached_property
+    def window(self):
+        """[lo, hi) row positions of the date range, or None when it covers every row."""
+        date_range = self.filters.get(DATE_RANGE)
+        if date_range is None:
+            return None
+        lo, hi = self.dataset.row_range(*date_range)
+        if lo == 0 and hi == len(self.dataset.df):
+            return None
+        return lo, hi
+
+    def page_cube(self, name="main"):
+        """The named dataset cube restricted to this selection."""
+        if name not in self._cubes:
+            cube = self.dataset.cubes[name]
+            if self.window is None:
+                self._cubes[name] = cube.slice(self.filters)
+            else:
+                # The cubes carry no date dimension; aggregate the window's rows instead
+                self._cubes[name] = Cube.build(self.rows.frame(cube.dims + ["Fine_Amount"]), cube.dims)
+        return self._cubes[name]
+
+    @property
+    def cube(self):
+        return self.page_cube("main")
+
+    @cached_property
+    def moments(self):
+        if self.window is None:
+            return self.dataset.moments
+        return MomentCube.build(self.rows.frame(), FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS)
+
+    @cached_property
+    def sketches(self):
+        """Sketch cube to query with self.filters."""
+        sketches = self.dataset.sketches
+        options = self.dataset.filter_options
+        narrowed = any(dim not in sketches.dims and values is not None and not set(options.get(dim, [])) <= set(values)
+                       for dim, values in self.filters.items() if dim in FILTER_DIMENSIONS)
+        if self.window is None and not narrowed:
+            return sketches
+        if self.dataset.streamed:
+            # No rows to sketch
+            return None
+        # Sketch cells only split by State; sketch the selected rows instead
+        columns = list(dict.fromkeys(sketches.dims + DISTINCT_COLUMNS + ["Fine_Amount"]))
+        return SketchCube.build(self.rows.frame(columns))
+
+    @cached_property
+    def rows(self):
+        index = self.dataset.index
+        if self.window is None:
+            return index.view(self.dataset.df, self.filters, self.dataset.lazy)
+        lo, hi = self.window
+
+        def rows():
+            # Frame is sorted by Timestamp, so the window is a contiguous run of positions
+            matched = index.select(self.filters)
+            return matched[np.searchsorted(matched, lo):np.searchsorted(matched, hi)]
+        return FilteredView(self.dataset.df, rows, self.dataset.lazy)
+
+    @property
+    def key(self):
+        """Hashable form of the filters, for caches keyed by selection."""
+        return filters_key(self.filters)
+
+    @property
+    def empty(self):
+        return self.value("total_violations") == 0
+
+
+# --- Aggregate Nodes ---
+# Everything the pages show, by name. Pages share nodes, so e.g. the State
+# counts are computed once for the Overview and the Location page.
+def _status_counts(sel):
+    counts = sel.page_cube("Status").value_counts('Status', dropna=False)
+    counts.index = counts.index.fillna('Unknown')
+    return counts
+
+
+def _trend(dim, order):
+    return lambda sel: sel.page_cube(dim).value_counts(dim).reindex(order).fillna(0).astype(int)
+
+
+def _sketched(fn):
+    """fn(sel), or None where the selection has no sketches (see Selection.sketches)."""
+    return lambda sel: None if sel.sketches is None else fn(sel)
+
+
+def _top_entities(sel):
+    sketches = sel.sketches
+    rows, fines = sketches.totals(sel.filters)
+    prior = sketches.top("Previous_Violations", "count", sel.filters, n=sketches.capacity)
+    return {
+        "rows": rows,
+        "fines": fines,
+        "distinct": {col: sketches.distinct(col, sel.filters) for col in TOP_K_COLUMNS},
+        "top": {(col, measure): sketches.top(col, measure, sel.filters, TOP_ENTITIES)
+                for col in TOP_K_COLUMNS for measure in ("count", "fines")},
+        # Violations by the driver's prior violation count; few values, so exact
+        "prior_violations": prior.set_index("Previous_Violations")["estimate"].sort_index().astype('int64'),
+    }
+
+
+def speed_scatter(x, y, max_points=SCATTER_MAX_POINTS):
+    """What the speed scatter draws for Speed_Limit x and Recorded_Speed y (no missing values).
+
+    The points themselves up to max_points, else their 2-D histogram; the
+    annotations (records, share over the limit, average excess) are taken
+    from every record either way. Bounded in size, so the memo keeps it.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    excess = y - x
+    over = excess > 0
+    scatter = {
+        "records": len(x),
+        "pct_over": over.mean() * 100 if len(x) else 0.0,
+        "avg_excess": excess[over].mean() if over.any() else 0.0,
+        "range": (min(x.min(), y.min()), max(x.max(), y.max())) if len(x) else None,
+        "points": None,
+        "density": None,
+    }
+    if len(x) > max_points:
+        scatter["density"] = np.histogram2d(x, y, bins=SCATTER_BINS)
+    else:
+        scatter["points"] = (x, y)
+    return scatter
+
+
+def _speed_scatter(sel):
+    frame = sel.rows.frame(['Speed_Limit', 'Recorded_Speed']).dropna()
+    return speed_scatter(frame['Speed_Limit'], frame['Recorded_Speed'])
+
+
+def _grid_points(sel):
+    if "Grid_Cell" not in sel.dataset.cubes:
+        return None
+    cells = sel.page_cube("Grid_Cell")
+    return geo.grid_points(cells.value_counts('Grid_Cell'), cells.fine_sums('Grid_Cell'))
+
+
+# Filters that select rows: every node aggregates the selected rows, so it
+# reads all of them (but the one it narrows by). Other keys, such as page
+# controls, never invalidate a node.
+ROW_FILTERS = FILTER_DIMENSIONS + [DATE_RANGE]
+
+NODES = {
+    "total_violations": Node(lambda sel: sel.cube.total(), ROW_FILTERS),
+    "total_fines": Node(lambda sel: sel.cube.total_fines(), ROW_FILTERS),
+    # Few values: counted exactly from the cube, which every selection has
+    "distinct_types": Node(lambda sel: sel.cube.nunique('Violation_Type'), ROW_FILTERS),
+    "distinct_states": Node(lambda sel: sel.cube.nunique('State'), ROW_FILTERS),
+    "distinct_officers": Node(_sketched(lambda sel: sel.sketches.distinct('Officer_ID', sel.filters)), ROW_FILTERS),
+    "distinct_officers_error": Node(_sketched(lambda sel: sel.sketches.distinct_error('Officer_ID', sel.filters)),
+                                    ROW_FILTERS),
+    # Grouped by a filter dimension: computed over all of its values and
+    # narrowed to the selected ones, so that filter never invalidates them
+    "violation_counts": Node(lambda sel: sel.cube.value_counts('Violation_Type'), ROW_FILTERS,
+                             narrow="Violation_Type"),
+    "state_counts": Node(lambda sel: sel.cube.value_counts('State'), ROW_FILTERS, narrow="State"),
+    "state_fines": Node(lambda sel: sel.cube.fine_sums('State'), ROW_FILTERS, narrow="State"),
+    "weather_counts": Node(lambda sel: sel.cube.value_counts('Weather_Condition'), ROW_FILTERS,
+                           narrow="Weather_Condition"),
+    "status_counts": Node(_status_counts, ROW_FILTERS, columns=["Status"]),
+    "payment_counts": Node(lambda sel: sel.page_cube("Payment_Method").value_counts('Payment_Method'), ROW_FILTERS,
+                           columns=["Payment_Method"]),
+    "speed_hist": Node(lambda sel: sel.moments.histogram('Recorded_Speed', sel.filters), ROW_FILTERS,
+                       columns=["Recorded_Speed"]),
+    "fine_hist": Node(lambda sel: sel.moments.histogram('Fine_Amount', sel.filters), ROW_FILTERS),
+    # Only the drawn points (or their density) and the annotations are kept,
+    # not the selection's rows
+    "speed_scatter": Node(_speed_scatter, ROW_FILTERS, columns=['Speed_Limit', 'Recorded_Speed'], rows=True),
+    "correlation": Node(lambda sel: sel.moments.moments(sel.filters).correlation(), ROW_FILTERS),
+    "hourly": Node(lambda sel: sel.page_cube("Hour").value_counts('Hour').sort_index(), ROW_FILTERS,
+                   columns=["Hour"]),
+    "daily": Node(_trend('Day', DAY_ORDER), ROW_FILTERS, columns=["Day"]),
+    "monthly": Node(_trend('Month', MONTH_ORDER), ROW_FILTERS, columns=["Month"]),
+    "road_counts": Node(lambda sel: sel.page_cube("Road_Condition").value_counts('Road_Condition'), ROW_FILTERS,
+                        columns=["Road_Condition"]),
+    "weather_road": Node(lambda sel: sel.page_cube("Road_Condition").pivot('Weather_Condition', 'Road_Condition'),
+                         ROW_FILTERS, columns=['Weather_Condition', 'Road_Condition']),
+    "grid_points": Node(_grid_points, ROW_FILTERS),
+    "matched_rows": Node(lambda sel: len(sel.rows), ROW_FILTERS, rows=True),
+    # Daily counts for every State x Violation_Type pair in the selection;
+    # scoring is cheap, so the page re-flags them as its controls change
+    "count_series": Node(lambda sel: count_series(sel.rows.frame(["State", "Violation_Type", "Date"])), ROW_FILTERS,
+                         columns=["State", "Violation_Type", "Date"], rows=True),
+    "top_entities": Node(_sketched(_top_entities), ROW_FILTERS),
+}
+
+
+# --- Page Aggregations ---
+def overview(sel):
+    return {
+        "total_violations": sel.value("total_violations"),
+        "total_fines": sel.value("total_fines"),
+        "violation_types": sel.value("distinct_types"),
+        "states": sel.value("distinct_states"),
+        # A HyperLogLog estimate past a few hundred officers; see format_estimate
+        "officers": sel.value("distinct_officers"),
+        "officers_error": sel.value("distinct_officers_error"),
+        "violation_counts": sel.value("violation_counts"),
+        "status_counts": sel.value("status_counts"),
+        "top_states": sel.value("state_counts").head(10),
+    }
+
+
+def violation_distribution(sel):
+    return {
+        "violation_counts": sel.value("violation_counts"),
+        "payment_counts": sel.value("payment_counts"),
+    }
+
+
+def speed_analysis(sel):
+    # Histograms and correlations merge per-filter-combination partials;
+    # only the scatter reads the matching rows, once per selection
+    return {
+        "speed_hist": sel.value("speed_hist"),
+        "fine_hist": sel.value("fine_hist"),
+        "speed_scatter": sel.value("speed_scatter"),
+        "correlation": sel.value("correlation"),
+    }
+
+
+def trend_analysis(sel):
+    return {
+        "hourly": sel.value("hourly"),
+        "daily": sel.value("daily"),
+        "monthly": sel.value("monthly"),
+    }
+
+
+def weather_risk(sel):
+    return {
+        "weather_counts": sel.value("weather_counts"),
+        "road_counts": sel.value("road_counts"),
+        "weather_road": sel.value("weather_road"),
+    }
+
+
+def location(sel):
+    state_counts = sel.value("state_counts")
+    state_fines = sel.value("state_fines")
+    return {
+        "state_counts": state_counts,
+        "state_fines": state_fines,
+        "top_states": state_counts.head(10),
+        "state_points": geo.state_points(state_counts, state_fines),
+        "grid_points": sel.value("grid_points"),
+    }
+
+
+def data_explorer(sel):
+    return {
+        "matched_rows": sel.value("matched_rows"),
+        "columns": sel.dataset.columns,
+        "stats": sel.dataset.stats,
+        "conflicts": sel.dataset.conflicts,
+    }
+
+
+def explorer_page(sel, page=0, page_size=50, sort_by=None, ascending=True, search="", columns=None):
+    """One page of the selection, sorted and searched without materializing other rows."""
+    dataset = sel.dataset
+    rows = sel.rows.rows
+    if search.strip():
+        rows = np.intersect1d(rows, dataset.search(search), assume_unique=True)
+    if sort_by is not None:
+        selected = np.zeros(len(dataset.df), dtype=bool)
+        selected[rows] = True
+        order = dataset.sort_order(sort_by, ascending)
+        rows = order[selected[order]]
+    total = len(rows)
+    n_pages = max(1, -(-total // page_size))
+    page = min(max(page, 0), n_pages - 1)
+    page_rows = rows[page * page_size:(page + 1) * page_size]
+    return {
+        "frame": dataset.frame(columns or None, page_rows),
+        "total": total,
+        "page": page,
+        "pages": n_pages,
+    }
+
+
+def anomaly_detection(sel):
+    return {
+        "series": sel.value("count_series"),
+    }
+
+
+def pattern_mining(sel):
+    # The selection's rows of the dataset-wide codes; mining runs on the
+    # page with its own support/confidence controls
+    if sel.dataset.streamed:
+        return {"encoded": None}
+    names, categories, codes = sel.dataset.mining_codes
+    rows = sel.rows.rows
+    return {
+        "encoded": (names, categories, [c[rows] for c in codes]),
+    }
+
+
+def top_entities(sel):
+    # A dict of its own: callers reshape the page, and the node's is shared;
+    # empty where a streamed dataset cannot sketch the selection
+    return dict(sel.value("top_entities") or {})
+
+
+PAGE_AGGREGATIONS = {
+    "Overview Dashboard": overview,
+    "Violation Distribution": violation_distribution,
+    "Speed Analysis": speed_analysis,
+    "Trend Analysis": trend_analysis,
+    "Weather Risk Analysis": weather_risk,
+    "Location & Map": location,
+    "Data Explorer": data_explorer,
+    "Anomaly Detection": anomaly_detection,
+    "Pattern Mining": pattern_mining,
+    "Top Entities": top_entities,
+}
+
+
+def format_estimate(value, error):
+    """A count for display: "≈12,345 ±1.6%" (two standard errors) when estimated, "12,345" when exact."""
+    if value is None:
+        return "n/a"
+    if not error:
+        return f"{value:,}"
+    return f"≈{value:,} ±{2 * error:.1%}"
+
+
+def empty_dataset():
+    return Dataset(pd.DataFrame())
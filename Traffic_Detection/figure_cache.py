@@ -0,0 +1,95 @@
+import io
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Same output settings st.pyplot uses, so cached images look identical
+SAVEFIG_KWARGS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}
+
+
+def render_png(fig):
+    """Rasterize a figure to PNG bytes and release it from pyplot."""
+    import matplotlib.pyplot as plt
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **SAVEFIG_KWARGS)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+class FigureCache:
+    """Size-bounded LRU of rendered chart images (or other rendered bytes, e.g. map HTML).
+
+    Keys are expected to identify everything the image depends on, e.g.
+    (dataset version, page, chart id, filter selection).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._images.get(key)
+            if png is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.bytes_used -= len(old)
+            self._images[key] = png
+            self.bytes_used += len(png)
+            while self.bytes_used > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.bytes_used -= len(evicted)
+
+    def get_or_build(self, key, build):
+        """Cached bytes for key, calling build() -> bytes only on a miss.
+
+        Concurrent misses on one key build it once; the other callers wait
+        and take the result from the cache.
+        """
+        while True:
+            with self._lock:
+                data = self._images.get(key)
+                if data is not None:
+                    self._images.move_to_end(key)
+                    self.hits += 1
+                    return data
+                pending = self._building.get(key)
+                if pending is None:
+                    self._building[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Look again once it is built; if the build failed (or was too big
+            # to keep) the next caller through builds it itself
+            pending.wait()
+        try:
+            data = build()
+            self.put(key, data)
+        finally:
+            with self._lock:
+                self._building.pop(key).set()
+        return data
+
+    def get_or_render(self, key, render):
+        """Cached PNG for key, calling render() -> Figure only on a miss."""
+        return self.get_or_build(key, lambda: render_png(render()))
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.bytes_used = 0
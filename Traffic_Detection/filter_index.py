@@ -0,0 +1,193 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cube import FILTER_DIMENSIONS
+from framestore import Buffer
+
+# Bitmap key for rows where the column is missing; selected by any NaN value
+MISSING = None
+
+
+class FilterIndex:
+    """Per-value row bitmaps for the sidebar filter columns.
+
+    A filter selection resolves by OR-ing the bitmaps of the selected values
+    within a column and AND-ing across columns. As with Series.isin, a NaN
+    among the selected values matches the rows where the column is missing. Bitmaps are packed 8 rows per
+    byte, and resolved selections are memoized so reruns with unchanged
+    filters (e.g. switching pages) cost a dictionary lookup. The index is
+    safe to share between sessions: the bytes an index reads are never
+    modified, as extended() only writes past them (see framestore.Buffer).
+    """
+
+    # Sorted positions of rows masked out of every selection (see without)
+    dropped = np.empty(0, dtype=np.intp)
+
+    def __init__(self, df, columns=FILTER_DIMENSIONS, cache_size=32):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        # Growable storage behind each bitmap
+        self._buffers = {}
+        for col in columns:
+            if col in df.columns:
+                self._buffers[col] = {value: Buffer(bits) for value, bits in _column_bitmaps(df[col]).items()}
+                self.bitmaps[col] = {value: buffer.data for value, buffer in self._buffers[col].items()}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, selections):
+        """Sorted row positions matching every {column: values} selection."""
+        key = tuple(sorted((col, frozenset(MISSING if pd.isna(v) else v for v in values))
+                           for col, values in selections.items()
+                           if col in self.bitmaps and values is not None))
+        with self._lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self._cache.move_to_end(key)
+                return rows
+
+        result = None
+        for col, values in key:
+            column_bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for value in values:
+                bits = self.bitmaps[col].get(value)
+                if bits is not None:
+                    np.bitwise_or(column_bits, bits, out=column_bits)
+            result = column_bits if result is None else np.bitwise_and(result, column_bits, out=result)
+        if result is None:
+            rows = np.delete(np.arange(self.n_rows), self.dropped)
+        else:
+            selected = np.unpackbits(result, count=self.n_rows).view(bool)
+            selected[self.dropped] = False
+            rows = np.flatnonzero(selected)
+        rows.setflags(write=False)
+
+        with self._lock:
+            self._cache[key] = rows
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def extended(self, rows):
+        """New index over the indexed rows followed by rows; this one is left as is.
+
+        The new rows' bits are written into the bitmaps' spare capacity, so
+        this costs the new rows (times the number of values), not the rows
+        already indexed.
+        """
+        index = self._copy()
+        index.bitmaps, index._buffers = {}, {}
+        n_bytes, start, tail = (self.n_rows + 7) // 8, self.n_rows // 8, self.n_rows % 8
+        for col, buffers in self._buffers.items():
+            masks = _column_masks(rows[col])
+            empty = np.zeros(len(rows), dtype=bool)
+            index.bitmaps[col], index._buffers[col] = {}, {}
+            for value in buffers.keys() | masks.keys():
+                buffer = buffers.get(value)
+                if buffer is None:
+                    buffer = Buffer(np.zeros(n_bytes, dtype=np.uint8))
+                mask = masks.get(value, empty)
+                if tail:
+                    # Re-pack the partial last byte together with the new rows' bits;
+                    # readers of this index ignore its unused bits
+                    mask = np.concatenate([np.unpackbits(buffer.data[start:start + 1])[:tail].astype(bool), mask])
+                buffer, bits = buffer.extend(n_bytes, np.packbits(mask), start)
+                index._buffers[col][value], index.bitmaps[col][value] = buffer, bits
+        index.n_rows = self.n_rows + len(rows)
+        return index
+
+    def without(self, positions):
+        """New index with the rows at positions left out of every selection; this one is left as is."""
+        index = self._copy()
+        index.dropped = np.union1d(self.dropped, positions).astype(np.intp)
+        return index
+
+    def _copy(self):
+        index = copy.copy(self)
+        index._cache = OrderedDict()
+        index._lock = threading.Lock()
+        return index
+
+    def view(self, df, selections, lazy=None):
+        """Lazy FilteredView of df (and lazy's columns); the selection resolves on first use."""
+        return FilteredView(df, lambda: self.select(selections), lazy)
+
+
+def _column_bitmaps(series):
+    values = series.astype('category') if not isinstance(series.dtype, pd.CategoricalDtype) else series
+    codes = values.cat.codes.to_numpy()
+    # Group row positions by code once instead of comparing every row per value
+    order = np.argsort(codes, kind='stable')
+    # Code -1 (missing) sorts first
+    bounds = np.searchsorted(codes[order], np.arange(-1, len(values.cat.categories) + 1))
+    bitmaps = {}
+    for code, category in enumerate([MISSING] + list(values.cat.categories), start=-1):
+        lo, hi = bounds[code + 1], bounds[code + 2]
+        if category is MISSING and lo == hi:
+            continue
+        mask = np.zeros(len(codes), dtype=bool)
+        mask[order[lo:hi]] = True
+        bitmaps[category] = np.packbits(mask)
+    return bitmaps
+
+
+def _column_masks(series):
+    values = series.astype('category') if not isinstance(series.dtype, pd.CategoricalDtype) else series
+    codes = values.cat.codes.to_numpy()
+    masks = {category: codes == code for code, category in enumerate(values.cat.categories)}
+    missing = codes == -1
+    if missing.any():
+        masks[MISSING] = missing
+    return masks
+
+
+class FilteredView:
+    """Row selection over a shared frame; columns are only gathered on access.
+
+    lazy, if given, is the ingest.LazyColumns kept out of df; frame() reads
+    the selected rows of those it is asked for.
+    """
+
+    def __init__(self, df, rows, lazy=None):
+        self.df = df
+        self._rows = rows
+        self.lazy = lazy
+
+    @property
+    def rows(self):
+        if callable(self._rows):
+            self._rows = self._rows()
+        return self._rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    @property
+    def shape(self):
+        return (len(self.rows), self.df.shape[1])
+
+    def __getitem__(self, column):
+        return self.df[column].iloc[self.rows]
+
+    def frame(self, columns=None):
+        """Materialize the selected rows, optionally for a subset of columns."""
+        source = self.df if columns is None else self.df[[c for c in columns if c in self.df.columns]]
+        frame = source.iloc[self.rows]
+        lazy = [] if columns is None or self.lazy is None else [c for c in columns if c in self.lazy.columns]
+        if lazy:
+            frame = pd.concat([frame, self.lazy.read(lazy, self.rows).set_axis(frame.index)], axis=1)
+            frame = frame[[c for c in columns if c in frame.columns]]
+        return frame
@@ -0,0 +1,243 @@
+"""Append-only column storage, so appending to a dataset costs the new rows.
+
+A FrameStore keeps each column of a cleaned frame in buffers with spare
+capacity at the end, and its frame() is made of views of their first n
+rows. appended() writes the new rows into the spare room and returns a
+store over the longer prefix: every snapshot of a live dataset shares the
+same buffers, and none of them sees rows added after it. A buffer that is
+full is copied into one GROWTH times the size, so an append costs its own
+rows, amortized.
+
+By column kind:
+
+- numpy columns (integers, floats, datetimes): a buffer of values;
+- nullable integers and booleans: buffers of values and of the mask;
+- categoricals: a buffer of codes. Categories are kept sorted, so new
+  rows bringing a new value recode the stored rows; that costs every row
+  held, but is rare once a feed has seen its states and types;
+- Arrow strings: a list of Arrow chunks, merged pairwise as they
+  accumulate so there are O(log n) of them;
+- any other dtype, or new rows of a different dtype (or an ordered
+  categorical gaining values): concatenated whole, which pandas does for
+  these as partitions.concat_frames would.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow strings are then concatenated whole
+    pa = None
+
+# Size a full buffer is reallocated to, as a multiple of the rows it holds
+GROWTH = 1.5
+
+_lock = threading.Lock()
+
+
+class Buffer:
+    """A 1-D numpy array with spare capacity at the end.
+
+    length is how much of it the longest view handed out covers. extend()
+    writes past that, so views never change under their readers; only the
+    holder of that longest view extends in place, and anyone else (a second
+    append to the same snapshot) gets a copy.
+    """
+
+    def __init__(self, data, length=None):
+        self.data = data
+        self.length = len(data) if length is None else length
+
+    def extend(self, length, values, start=None):
+        """(buffer, view): values written from start (default length) on.
+
+        length is the caller's view of this buffer; items before start are
+        kept. A start before length rewrites items the caller's view covers,
+        so only use one where readers ignore them (the unused bits of a
+        bitmap's last byte). The buffer is this one if it had room, else a
+        larger copy.
+        """
+        start = length if start is None else start
+        end = start + len(values)
+        with _lock:
+            buffer = self
+            if self.length != length or end > len(self.data):
+                data = np.empty(max(end, int(end * GROWTH)), dtype=self.data.dtype)
+                data[:start] = self.data[:start]
+                buffer = Buffer(data, start)
+            buffer.data[start:end] = values
+            buffer.length = end
+        return buffer, buffer.data[:end]
+
+
+class _Values:
+    """A numpy column."""
+
+    def __init__(self, buffer, dtype):
+        self.buffer = buffer
+        self.dtype = dtype
+
+    def array(self, n):
+        return self.buffer.data[:n]
+
+    def appended(self, n, values):
+        if values.dtype != self.dtype:
+            return None
+        buffer, _ = self.buffer.extend(n, values.to_numpy())
+        return _Values(buffer, self.dtype)
+
+
+class _Masked:
+    """A nullable integer or boolean column: values plus a missing-value mask."""
+
+    def __init__(self, values, mask, dtype):
+        self.values = values
+        self.mask = mask
+        self.dtype = dtype
+
+    @staticmethod
+    def split(series):
+        dtype = series.dtype.numpy_dtype
+        return series.array.to_numpy(dtype=dtype, na_value=dtype.type(0)), series.isna().to_numpy()
+
+    def array(self, n):
+        return _MASKED_ARRAYS[type(self.dtype)](self.values.data[:n], self.mask.data[:n])
+
+    def appended(self, n, series):
+        if series.dtype != self.dtype:
+            return None
+        values, mask = self.split(series)
+        return _Masked(self.values.extend(n, values)[0], self.mask.extend(n, mask)[0], self.dtype)
+
+
+_MASKED_ARRAYS = {
+    pd.Int8Dtype: pd.arrays.IntegerArray, pd.Int16Dtype: pd.arrays.IntegerArray,
+    pd.Int32Dtype: pd.arrays.IntegerArray, pd.Int64Dtype: pd.arrays.IntegerArray,
+    pd.Float32Dtype: pd.arrays.FloatingArray, pd.Float64Dtype: pd.arrays.FloatingArray,
+    pd.BooleanDtype: pd.arrays.BooleanArray,
+}
+
+
+class _Codes:
+    """A categorical column: integer codes into sorted categories."""
+
+    def __init__(self, codes, dtype):
+        self.codes = codes
+        self.dtype = dtype
+
+    def array(self, n):
+        return pd.Categorical.from_codes(self.codes.data[:n], dtype=self.dtype, validate=False)
+
+    def appended(self, n, series):
+        if not isinstance(series.dtype, pd.CategoricalDtype) or series.dtype.ordered != self.dtype.ordered:
+            return None
+        ours, theirs = self.dtype.categories, series.cat.categories
+        codes, dtype = self.codes, self.dtype
+        new = theirs.difference(ours)
+        if len(new):
+            if self.dtype.ordered:
+                return None
+            # New values: recode the stored rows into the sorted union
+            categories = theirs.sort_values() if not len(ours) else ours.append(new).sort_values()
+            dtype = pd.CategoricalDtype(categories)
+            stored = codes.data[:n]
+            recoded = np.where(stored < 0, -1, categories.get_indexer(ours)[stored])
+            codes = Buffer(recoded.astype(_codes_dtype(categories)))
+        mapping = dtype.categories.get_indexer(theirs)
+        added = series.cat.codes.to_numpy()
+        added = np.where(added < 0, -1, mapping[added]).astype(codes.data.dtype)
+        return _Codes(codes.extend(n, added)[0], dtype)
+
+
+def _codes_dtype(categories):
+    """The code dtype pandas gives a categorical with these categories."""
+    return pd.Categorical([], categories=categories).codes.dtype
+
+
+class _Strings:
+    """An Arrow string column: a list of chunks, largest first."""
+
+    def __init__(self, chunks, dtype):
+        self.chunks = chunks
+        self.dtype = dtype
+
+    @staticmethod
+    def split(series):
+        array = pa.array(series.array)
+        return list(array.chunks) if isinstance(array, pa.ChunkedArray) else [array]
+
+    def array(self, n):
+        return pd.array(pa.chunked_array(self.chunks, self.chunks[0].type), dtype=self.dtype)
+
+    def appended(self, n, series):
+        if series.dtype != self.dtype:
+            return None
+        kind = self.chunks[0].type
+        chunks = list(self.chunks) + [c.cast(kind) for c in self.split(series) if len(c)]
+        # Merge the smallest chunks while the last is at least half the one before,
+        # so chunk sizes halve from first to last
+        while len(chunks) > 1 and 2 * len(chunks[-1]) >= len(chunks[-2]):
+            chunks[-2:] = [pa.concat_arrays(chunks[-2:])]
+        return _Strings(chunks, self.dtype)
+
+
+class _Whole:
+    """Any other column, held as is and concatenated whole."""
+
+    def __init__(self, series):
+        self.series = series
+
+    def array(self, n):
+        return self.series.array
+
+    def appended(self, n, series):
+        return None
+
+
+def _column(series):
+    """Store for one column of a frame; shares the frame's arrays where it can."""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        return _Values(Buffer(series.to_numpy()), dtype)
+    if type(dtype) in _MASKED_ARRAYS:
+        values, mask = _Masked.split(series)
+        return _Masked(Buffer(values), Buffer(mask), dtype)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _Codes(Buffer(series.cat.codes.to_numpy()), dtype)
+    if pa is not None and isinstance(series.array, pd.arrays.ArrowStringArray):
+        return _Strings(_Strings.split(series), dtype)
+    return _Whole(series.reset_index(drop=True))
+
+
+class FrameStore:
+    """A cleaned frame's columns in append-only storage (see module docstring)."""
+
+    def __init__(self, columns, n):
+        self.columns = columns
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls({col: _column(df[col]) for col in df.columns}, len(df))
+
+    def frame(self):
+        """The stored rows, as views of the buffers where the column kind allows."""
+        return pd.DataFrame({col: column.array(self.n) for col, column in self.columns.items()},
+                            index=pd.RangeIndex(self.n), copy=False)
+
+    def appended(self, rows):
+        """Store of these rows followed by rows (a cleaned frame with the same columns); self is unchanged."""
+        rows = rows.reset_index(drop=True)
+        columns = {}
+        for col, column in self.columns.items():
+            grown = column.appended(self.n, rows[col])
+            if grown is None:
+                # Another dtype or kind: concatenate, and buffer the result from here on
+                grown = _column(pd.concat([pd.Series(column.array(self.n)), rows[col]], ignore_index=True))
+            columns[col] = grown
+        return FrameStore(columns, self.n + len(rows))
@@ -0,0 +1,120 @@
+"""Hotspot map data: per-state points and pre-binned coordinate grid cells."""
+import numpy as np
+import pandas as pd
+
+MAP_CENTER = [20.5937, 78.9629]
+
+# Approximate centroids for states and union territories
+STATE_COORDS = {
+    "Andhra Pradesh": [15.9129, 79.7400],
+    "Arunachal Pradesh": [28.2180, 94.7278],
+    "Assam": [26.2006, 92.9376],
+    "Bihar": [25.0961, 85.3131],
+    "Chhattisgarh": [21.2787, 81.8661],
+    "Goa": [15.2993, 74.1240],
+    "Gujarat": [22.2587, 71.1924],
+    "Haryana": [29.0588, 76.0856],
+    "Himachal Pradesh": [31.1048, 77.1734],
+    "Jharkhand": [23.6102, 85.2799],
+    "Karnataka": [15.3173, 75.7139],
+    "Kerala": [10.8505, 76.2711],
+    "Madhya Pradesh": [22.9734, 78.6569],
+    "Maharashtra": [19.7515, 75.7139],
+    "Manipur": [24.6637, 93.9063],
+    "Meghalaya": [25.4670, 91.3662],
+    "Mizoram": [23.1645, 92.9376],
+    "Nagaland": [26.1584, 94.5624],
+    "Odisha": [20.9517, 85.0985],
+    "Punjab": [31.1471, 75.3412],
+    "Rajasthan": [27.0238, 74.2179],
+    "Sikkim": [27.5330, 88.5122],
+    "Tamil Nadu": [11.1271, 78.6569],
+    "Telangana": [18.1124, 79.0193],
+    "Tripura": [23.9408, 91.9882],
+    "Uttar Pradesh": [26.8467, 80.9462],
+    "Uttarakhand": [30.0668, 79.0193],
+    "West Bengal": [22.9868, 87.8550],
+    "Delhi": [28.7041, 77.1025],
+    "Jammu and Kashmir": [33.7782, 76.5762],
+    "Ladakh": [34.1526, 77.5771],
+    "Puducherry": [11.9416, 79.8083],
+    "Chandigarh": [30.7333, 76.7794],
+    "Andaman and Nicobar Islands": [11.7401, 92.6586],
+    "Dadra and Nagar Haveli and Daman and Diu": [20.3974, 72.8328],
+    "Lakshadweep": [10.5667, 72.6417],
+}
+
+# Grid used to pre-bin point coordinates at ingest (~28 km cells)
+GRID_DEGREES = 0.25
+_GRID_OFFSET = 1000    # keeps row/column indexes positive for any latitude/longitude
+_GRID_STRIDE = 10000
+
+MAX_MARKER_RADIUS = 40
+# Densest cells drawn on the grid map; folium slows down past a few thousand markers
+MAX_MAP_POINTS = 2000
+
+
+def grid_cells(lat, lon, cell_deg=GRID_DEGREES):
+    """Integer cell ids for coordinate arrays; missing coordinates map to <NA>."""
+    lat = pd.to_numeric(lat, errors='coerce').to_numpy(dtype=float)
+    lon = pd.to_numeric(lon, errors='coerce').to_numpy(dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    ids = np.zeros(len(lat), dtype=np.int64)
+    ids[valid] = ((np.floor(lat[valid] / cell_deg).astype(np.int64) + _GRID_OFFSET) * _GRID_STRIDE
+                  + np.floor(lon[valid] / cell_deg).astype(np.int64) + _GRID_OFFSET)
+    return pd.arrays.IntegerArray(ids, ~valid)
+
+
+def cell_centers(ids, cell_deg=GRID_DEGREES):
+    """Latitude/longitude of the centre of each grid cell id."""
+    ids = np.asarray(ids, dtype=np.int64)
+    lat = (ids // _GRID_STRIDE - _GRID_OFFSET + 0.5) * cell_deg
+    lon = (ids % _GRID_STRIDE - _GRID_OFFSET + 0.5) * cell_deg
+    return lat, lon
+
+
+def state_points(state_counts, state_fines):
+    """One map point per state with a known centroid."""
+    points = pd.DataFrame({"count": state_counts})
+    points["fines"] = state_fines.reindex(points.index).fillna(0).to_numpy()
+    points = points[points.index.isin(list(STATE_COORDS))]
+    coords = np.array([STATE_COORDS[s] for s in points.index]).reshape(-1, 2)
+    points["lat"], points["lon"] = coords[:, 0], coords[:, 1]
+    points["label"] = points.index.astype(str)
+    return points.reset_index(drop=True)
+
+
+def grid_points(cell_counts, cell_fines, max_points=MAX_MAP_POINTS):
+    """One map point per occupied grid cell, densest cells first."""
+    cell_counts = cell_counts.sort_values(ascending=False).head(max_points)
+    lat, lon = cell_centers(cell_counts.index)
+    return pd.DataFrame({
+        "count": cell_counts.to_numpy(),
+        "fines": cell_fines.reindex(cell_counts.index).fillna(0).to_numpy(),
+        "lat": lat,
+        "lon": lon,
+        "label": [f"{a:.2f}, {b:.2f}" for a, b in zip(lat, lon)],
+    })
+
+
+def build_map_html(points):
+    """Render hotspot points to a standalone folium HTML document."""
+    import folium
+
+    m = folium.Map(location=MAP_CENTER, zoom_start=5, tiles="CartoDB positron")
+    max_count = points["count"].max() if len(points) else 1
+    for row in points.itertuples(index=False):
+        popup_text = f"<b>{row.label}</b><br>Violations: {row.count:,}<br>Fines: ₹{row.fines:,.0f}"
+        folium.CircleMarker(
+            location=[row.lat, row.lon],
+            # Area proportional to count, so dense hotspots don't swallow the map
+            radius=max(5, MAX_MARKER_RADIUS * np.sqrt(row.count / max_count)),
+            popup=folium.Popup(popup_text, max_width=250),
+            color='#2563eb',
+            fill=True,
+            fill_color='#60a5fa',
+            fill_opacity=0.7,
+            weight=2,
+            tooltip=f"{row.label}: {row.count:,}"
+        ).add_to(m)
+    return m.get_root().render()
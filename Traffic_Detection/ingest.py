@@ -0,0 +1,544 @@
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from dedup import DEFAULT_POLICY, KEY_COLUMN, KeyIndex, deduplicate, empty_report
+from framestore import FrameStore
+from geo import grid_cells
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # the sidecar cache and the fast CSV reader are optional
+    pa = None
+
+# --- Column Schema ---
+# Bump when the cleaning rules or dtypes change so stale sidecars are ignored.
+SCHEMA_VERSION = 6
+
+SOURCE_COLUMNS = [
+    "Violation_ID", "Violation_Type", "Fine_Amount", "Location", "Date", "Time",
+    "Vehicle_Type", "Vehicle_Color", "Vehicle_Model_Year", "Registration_State",
+    "Driver_Age", "Driver_Gender", "License_Type", "Penalty_Points",
+    "Weather_Condition", "Road_Condition", "Officer_ID", "Issuing_Agency",
+    "License_Validity", "Number_of_Passengers", "Helmet_Worn", "Seatbelt_Worn",
+    "Traffic_Light_Status", "Speed_Limit", "Recorded_Speed", "Alcohol_Level",
+    "Breathalyzer_Result", "Towed", "Fine_Paid", "Payment_Method",
+    "Court_Appearance_Required", "Previous_Violations", "Comments",
+]
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MONTH_ORDER = ["January", "February", "March", "April", "May", "June", "July", "August",
+               "September", "October", "November", "December"]
+
+# Point coordinates, read when a feed carries them (used for map hotspots)
+OPTIONAL_COLUMNS = ["Latitude", "Longitude"]
+
+# Low-cardinality text columns, stored as pandas categoricals
+CATEGORICAL_COLUMNS = [
+    "Violation_Type", "Location", "Vehicle_Type", "Vehicle_Color",
+    "Registration_State", "Driver_Gender", "License_Type", "Weather_Condition",
+    "Road_Condition", "Issuing_Agency", "License_Validity", "Helmet_Worn",
+    "Seatbelt_Worn", "Traffic_Light_Status", "Breathalyzer_Result", "Payment_Method",
+]
+
+# Yes/No columns, stored as nullable booleans. Read as categoricals, which
+# parse fastest, and converted by clean_frame; other values become missing.
+# (Helmet_Worn and Seatbelt_Worn stay categorical: rule labels read Yes/No.)
+YES_NO_COLUMNS = ["Towed", "Fine_Paid", "Court_Appearance_Required"]
+
+# Small integer columns (nullable, so missing values survive the cast)
+INTEGER_COLUMNS = {
+    "Vehicle_Model_Year": "Int16",
+    "Driver_Age": "Int16",
+    "Penalty_Points": "Int8",
+    "Number_of_Passengers": "Int8",
+    "Speed_Limit": "Int16",
+    "Recorded_Speed": "Int16",
+    "Previous_Violations": "Int16",
+}
+
+FLOAT_COLUMNS = {"Alcohol_Level": "float32", "Latitude": "float64", "Longitude": "float64"}
+
+# Text stored as Arrow-backed strings: one contiguous buffer, no per-row
+# objects. High-cardinality columns go here rather than in categoricals,
+# whose categories grow with every new value and are unioned on each append.
+STRING_COLUMNS = ["Violation_ID", "Date", "Officer_ID", "Time", "Comments"]
+
+REQUIRED_COLUMNS = ["Date", "Time", "Location", "Violation_Type"]
+
+# Columns no page aggregates; a sidecar-backed dataset leaves them on disk
+# until the Data Explorer shows them. Officer_ID too: it is read once to
+# build the officer sketches, and again only for an explorer search.
+LAZY_COLUMNS = [
+    "Time", "Time_Parsed", "Vehicle_Color", "License_Type", "Penalty_Points",
+    "Issuing_Agency", "Number_of_Passengers", "Alcohol_Level", "Towed",
+    "Court_Appearance_Required", "Comments", "Officer_ID",
+]
+
+STATUS_DTYPE = pd.CategoricalDtype(["Paid", "Unpaid"])
+
+# pandas.read_csv's default missing-value markers, so every reader agrees on what is missing
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def csv_dtypes(columns):
+    """Explicit read_csv dtypes for the given source columns."""
+    dtypes = {}
+    for col in columns:
+        if col in CATEGORICAL_COLUMNS or col in YES_NO_COLUMNS:
+            dtypes[col] = "category"
+        elif col in INTEGER_COLUMNS:
+            dtypes[col] = INTEGER_COLUMNS[col]
+        elif col in FLOAT_COLUMNS:
+            dtypes[col] = FLOAT_COLUMNS[col]
+        elif col in STRING_COLUMNS:
+            dtypes[col] = "string"
+    return dtypes
+
+
+def project_columns(available, columns=None):
+    """Source columns to read: the requested ones plus those cleaning needs."""
+    wanted = SOURCE_COLUMNS + OPTIONAL_COLUMNS if columns is None else list(columns)
+    wanted = [("Location" if c == "State" else c) for c in wanted]
+    # The ID too: de-duplication is keyed on it
+    wanted = set(wanted) | set(REQUIRED_COLUMNS) | {KEY_COLUMN}
+    if columns is not None and "Status" in columns:
+        wanted.add("Fine_Paid")
+    if columns is not None and "Grid_Cell" in columns:
+        wanted.update(OPTIONAL_COLUMNS)
+    return [c for c in available if c in wanted]
+
+
+# --- Cleaning ---
+def clean_frame(df, policy=DEFAULT_POLICY, source=""):
+    """Apply the dashboard cleaning rules to a raw violations frame.
+
+    Returns (df, conflicts): the cleaned frame, de-duplicated on Violation_ID
+    by policy, and the report of conflicting copies it dropped (see dedup).
+    """
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+
+    # Block-wise CSV parsing unions categories in order of appearance; sort
+    # them so codes follow value order, as concat_frames and sorting expect
+    for col in df.columns:
+        values = df[col]
+        if (isinstance(values.dtype, pd.CategoricalDtype) and not values.cat.ordered
+                and not values.cat.categories.is_monotonic_increasing):
+            df[col] = values.cat.reorder_categories(values.cat.categories.sort_values())
+
+    # Convert Date & Time
+    df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
+    time_str = df["Time"].astype("string")
+    df["Time_Parsed"] = pd.to_datetime(time_str, format="%H:%M", errors='coerce')
+    mask_missing = df["Time_Parsed"].isna()
+    if mask_missing.any():
+        df.loc[mask_missing, "Time_Parsed"] = pd.to_datetime(time_str[mask_missing], format="%H:%M:%S", errors='coerce')
+
+    # Combined timestamp; the cleaned frame is kept sorted by it for range queries
+    time_of_day = df["Time_Parsed"] - df["Time_Parsed"].dt.normalize()
+    df["Timestamp"] = df["Date"] + time_of_day.fillna(pd.Timedelta(0))
+
+    df["Hour"] = df["Time_Parsed"].dt.hour.astype("Int8")
+    # Ordered categoricals: integer codes in calendar order
+    df["Day"] = pd.Categorical.from_codes(df["Date"].dt.dayofweek.fillna(-1).astype("int8"),
+                                          categories=DAY_ORDER, ordered=True)
+    df["Month"] = pd.Categorical.from_codes((df["Date"].dt.month.fillna(0) - 1).astype("int8"),
+                                            categories=MONTH_ORDER, ordered=True)
+    df["Year"] = df["Date"].dt.year.astype("Int16")
+
+    # Rename 'Location' to 'State'
+    df = df.rename(columns={'Location': 'State'})
+
+    # Numeric parsing (typed reads already did the work; this catches untyped input)
+    df["Fine_Amount"] = pd.to_numeric(df["Fine_Amount"], errors='coerce').fillna(0)
+    for col in ("Driver_Age", "Recorded_Speed", "Speed_Limit"):
+        if col in df.columns and not isinstance(df[col].dtype, pd.Int16Dtype):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in YES_NO_COLUMNS:
+        if col in df.columns:
+            df[col] = yes_no(df[col])
+    if 'Fine_Paid' in df.columns:
+        paid = df['Fine_Paid']
+        codes = np.where(paid.isna(), -1, np.where(paid.fillna(False), 0, 1))
+        df['Status'] = pd.Categorical.from_codes(codes, dtype=STATUS_DTYPE)
+
+    # Pre-bin point coordinates so hotspot maps aggregate cells, not rows
+    if 'Latitude' in df.columns and 'Longitude' in df.columns:
+        df['Grid_Cell'] = grid_cells(df['Latitude'], df['Longitude'])
+
+    # Still in source order here, which is what "last write wins" goes by
+    df, conflicts = deduplicate(df, policy, source)
+    df = df.sort_values("Timestamp", kind="stable", na_position="last")
+    return df.reset_index(drop=True), conflicts
+
+
+def yes_no(series):
+    """Yes/No text as a nullable boolean; any other value is missing."""
+    if isinstance(series.dtype, pd.BooleanDtype):
+        return series
+    values = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    categories = values.cat.categories.astype(str)
+    codes = values.cat.codes.to_numpy()
+    # The extra slot absorbs code -1 (missing)
+    truth = np.append(categories == "Yes", False)[codes]
+    known = np.append(categories.isin(["Yes", "No"]), False)[codes]
+    return pd.Series(pd.arrays.BooleanArray(truth, ~known), index=series.index, name=series.name)
+
+
+# Progress is reported once per block read
+_PROGRESS_BLOCK_BYTES = 1 << 20
+
+
+class _ProgressReader(io.RawIOBase):
+    """A file opened for binary reads that reports the bytes read so far to progress(count)."""
+
+    def __init__(self, file_path, progress):
+        self.fh = open(file_path, "rb")
+        self.progress = progress
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.fh.readinto(buffer)
+        self.count += n
+        self.progress(self.count)
+        return n
+
+    def close(self):
+        self.fh.close()
+        super().close()
+
+
+def apply_dtypes(df, dtypes):
+    """Cast df's columns to dtypes where they parse, leaving dirty ones for clean_frame."""
+    for col, dtype in dtypes.items():
+        if col in df.columns and df[col].dtype != dtype:
+            try:
+                df[col] = df[col].astype(dtype)
+            except (ValueError, TypeError):
+                pass  # left for clean_frame to coerce
+    return df
+
+
+def _arrow_types(dtypes):
+    """pyarrow column types for csv_dtypes; floats parse as float64 and are cast after, as pandas does."""
+    types = {}
+    for col, dtype in dtypes.items():
+        if dtype == "category":
+            types[col] = pa.dictionary(pa.int32(), pa.string())
+        elif dtype == "string":
+            types[col] = pa.string()
+        elif col in FLOAT_COLUMNS:
+            types[col] = pa.float64()
+        else:
+            types[col] = pa.from_numpy_dtype(np.dtype(dtype.lower()))
+    return types
+
+
+def _read_arrow(source, usecols, names, dtypes):
+    """Parse with pyarrow's multithreaded reader straight into the explicit schema."""
+    read_options = pa_csv.ReadOptions(column_names=names) if names is not None else None
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=usecols, column_types=_arrow_types(dtypes),
+        null_values=CSV_NA_VALUES, strings_can_be_null=True,
+    )
+    table = pa_csv.read_csv(source, read_options=read_options, convert_options=convert_options)
+    mapper = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.string(): pd.StringDtype()}
+    df = table.to_pandas(types_mapper=mapper.get)
+    return df.astype({c: t for c, t in dtypes.items() if c in FLOAT_COLUMNS})
+
+
+def read_source(file_path, columns=None, names=None, progress=None, **kwargs):
+    """Read a violations CSV with the explicit schema and column projection.
+
+    file_path may also be bytes of headerless CSV rows, with names giving the
+    header (as the live feed reader passes newly appended lines). progress,
+    if given, is called with the bytes of the file parsed so far.
+
+    With pyarrow installed the file is parsed by its multithreaded reader,
+    straight into the schema. Otherwise, or if a numeric cell does not parse,
+    pandas reads the text columns typed and the numeric ones with default
+    dtypes, which are downcast afterwards: asking the C parser for nullable
+    Int8/Int16 directly makes it about twice as slow as a plain read.
+    """
+    if names is None:
+        header = pd.read_csv(file_path, nrows=0).columns
+    else:
+        header = list(names)
+    usecols = project_columns(header, columns)
+    dtypes = csv_dtypes(usecols)
+
+    def open_source():
+        if isinstance(file_path, bytes):
+            return io.BytesIO(file_path)
+        if progress is not None:
+            return io.BufferedReader(_ProgressReader(file_path, progress), _PROGRESS_BLOCK_BYTES)
+        return open(file_path, "rb")
+
+    if pa is not None and not kwargs:
+        try:
+            with open_source() as source:
+                return _read_arrow(source, usecols, names, dtypes)
+        except pa.ArrowInvalid:
+            pass  # a dirty cell: pandas below reads it untyped
+    if names is not None:
+        kwargs.update(header=None, names=header)
+    text = {c: t for c, t in dtypes.items() if t in ("category", "string")}
+    with open_source() as source:
+        df = pd.read_csv(source, usecols=usecols, dtype=text, **kwargs)
+    return apply_dtypes(df, dtypes)
+
+
+def read_json_lines(data, columns=None):
+    """Parse JSON-lines bytes into a raw frame with the same dtypes as read_source."""
+    df = pd.read_json(io.BytesIO(data), lines=True, dtype=False)
+    df = df[project_columns(df.columns, columns)]
+    return apply_dtypes(df, csv_dtypes(df.columns))
+
+
+def iter_raw_chunks(file_path, chunksize, columns=None):
+    """Yield raw source frames of at most chunksize rows each.
+
+    Numeric columns are read untyped and left for clean_frame to coerce, so a
+    dirty cell deep in the file cannot abort the stream half way through.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = project_columns(header, columns)
+    dtypes = {c: t for c, t in csv_dtypes(usecols).items() if t in ("category", "string")}
+    with pd.read_csv(file_path, usecols=usecols, dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+# --- Sidecar Cache ---
+CACHE_DIR_NAME = ".traffic_cache"
+_SAMPLE_BYTES = 1 << 20
+
+
+def file_fingerprint(file_path):
+    """Cheap content key: path, size, mtime and a hash of the head and tail bytes."""
+    st = os.stat(file_path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|{SCHEMA_VERSION}".encode())
+    with open(file_path, "rb") as fh:
+        h.update(fh.read(_SAMPLE_BYTES))
+        if st.st_size > _SAMPLE_BYTES:
+            fh.seek(max(_SAMPLE_BYTES, st.st_size - _SAMPLE_BYTES))
+            h.update(fh.read())
+    return h.hexdigest()
+
+
+def _cache_path(file_path, tag, suffix):
+    folder = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    return os.path.join(folder, f"{os.path.basename(file_path)}.{tag}{suffix}")
+
+
+def _sidecar_path(file_path, fingerprint, columns=None, policy=DEFAULT_POLICY):
+    tag = f"{fingerprint}-{policy}"
+    if columns is not None:
+        tag += "-" + hashlib.blake2b("|".join(sorted(columns)).encode(), digest_size=4).hexdigest()
+    return _cache_path(file_path, tag, ".arrow")
+
+
+# Written next to a full load's sidecar: the conflicts its de-duplication
+# reported, and the KeyIndex that later files are checked against
+_REPORT_SUFFIX = ".conflicts.csv"
+_INDEX_SUFFIX = ".keys.npz"
+# The SQL backend's database of the cleaned rows (see sqlbackend)
+_DATABASE_SUFFIX = ".duckdb"
+_CACHE_SUFFIXES = (".arrow", _REPORT_SUFFIX, _INDEX_SUFFIX, _DATABASE_SUFFIX)
+
+
+def _open_sidecar(path):
+    """The sidecar as an Arrow table over a memory map; no column is read until used."""
+    return pa_ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def _read_sidecar(path):
+    with pa.memory_map(path, "r") as source:
+        table = pa_ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def _write_sidecar(path, df, file_path, fingerprint):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    # Drop sidecars left behind by older versions of the same source file
+    stem = os.path.basename(file_path) + "."
+    for name in os.listdir(folder):
+        if name.startswith(stem) and name.endswith(_CACHE_SUFFIXES) and fingerprint not in name:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+    tmp = f"{path}.{os.getpid()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa_ipc.new_file(tmp, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def load_dataset(file_path, columns=None, use_cache=True, policy=DEFAULT_POLICY, progress=None):
+    """Load and clean a violations CSV, reusing the columnar sidecar when valid.
+
+    Conflicting duplicates found by a full load are saved for conflict_report().
+    progress, if given, is passed to read_source when the CSV is parsed.
+    """
+    sidecar = fingerprint = None
+    if use_cache:
+        fingerprint = file_fingerprint(file_path)
+        if pa is not None:
+            sidecar = _sidecar_path(file_path, fingerprint, columns, policy)
+            if os.path.exists(sidecar):
+                try:
+                    return _read_sidecar(sidecar)
+                except (OSError, pa.ArrowException):
+                    pass
+
+    df, conflicts = clean_frame(read_source(file_path, columns, progress=progress), policy,
+                                os.path.basename(file_path))
+
+    if sidecar is not None:
+        try:
+            _write_sidecar(sidecar, df, file_path, fingerprint)
+        except (OSError, pa.ArrowException):
+            pass
+    if fingerprint is not None and columns is None:
+        report = _cache_path(file_path, f"{fingerprint}-{policy}", _REPORT_SUFFIX)
+        try:
+            if len(conflicts):
+                os.makedirs(os.path.dirname(report), exist_ok=True)
+                conflicts.to_csv(report, index=False)
+            elif os.path.exists(report):
+                os.remove(report)
+        except OSError:
+            pass
+    return df
+
+
+def conflict_report(file_path, policy=DEFAULT_POLICY):
+    """The conflicting duplicates the last full load of file_path dropped (empty if none)."""
+    report = _cache_path(file_path, f"{file_fingerprint(file_path)}-{policy}", _REPORT_SUFFIX)
+    try:
+        return pd.read_csv(report)
+    except (OSError, pd.errors.EmptyDataError):
+        return empty_report()
+
+
+def key_index(file_path, policy=DEFAULT_POLICY, df=None, use_cache=True):
+    """KeyIndex of file_path's cleaned rows, saved beside its sidecar once built.
+
+    df, if given, is the file's cleaned frame, saving a reload on a cache miss.
+    """
+    path = _cache_path(file_path, f"{file_fingerprint(file_path)}-{policy}", _INDEX_SUFFIX) if use_cache else None
+    if path is not None and os.path.exists(path):
+        try:
+            return KeyIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    if df is None:
+        df = load_dataset(file_path, use_cache=use_cache, policy=policy)
+    index = KeyIndex.build(df)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError:
+            pass
+    return index
+
+
+def database_path(file_path, policy=DEFAULT_POLICY, version=1):
+    """Where the SQL backend keeps file_path's cleaned rows, beside its sidecar.
+
+    version is the layout of the backend's table; a new one gets a new file.
+    """
+    return _cache_path(file_path, f"{file_fingerprint(file_path)}-{policy}-v{version}", _DATABASE_SUFFIX)
+
+
+class LazyColumns:
+    """Columns of a dataset kept out of its in-memory frame.
+
+    Rows line up with the frame's rows. The columns of a sidecar-backed
+    load are read from the memory-mapped sidecar on request; rows appended
+    later are held in memory, in one framestore.FrameStore they are all
+    appended to.
+    """
+
+    def __init__(self, columns, parts):
+        self.columns = list(columns)
+        # Arrow tables over sidecars, then a FrameStore of appended rows
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def extended(self, rows):
+        """LazyColumns with rows' (a cleaned frame's) columns appended; this one is left as is."""
+        rows = rows.reindex(columns=self.columns)
+        if self.parts and isinstance(self.parts[-1], FrameStore):
+            return LazyColumns(self.columns, self.parts[:-1] + [self.parts[-1].appended(rows)])
+        return LazyColumns(self.columns, self.parts + [FrameStore.from_frame(rows.reset_index(drop=True))])
+
+    def read(self, columns, rows=None):
+        """Frame of columns at row positions rows (every row if None), indexed by position."""
+        frames, start = [], 0
+        for part in self.parts:
+            end = start + len(part)
+            if isinstance(part, FrameStore):
+                part = part.frame()
+            if rows is None:
+                order = np.arange(start, end)
+                frame = part[columns] if isinstance(part, pd.DataFrame) else part.select(columns).to_pandas()
+            else:
+                order = np.flatnonzero((rows >= start) & (rows < end))
+                take = rows[order] - start
+                if isinstance(part, pd.DataFrame):
+                    frame = part[columns].iloc[take]
+                else:
+                    frame = part.select(columns).take(take).to_pandas()
+            if len(order):
+                # Indexed by place in rows, so sorting the index restores rows' order
+                frames.append(frame.set_axis(order))
+            start = end
+        if not frames:
+            return pd.DataFrame({col: pd.Series(dtype=object) for col in columns})
+        frame = frames[0] if len(frames) == 1 else pd.concat(frames).sort_index()
+        return frame.set_axis(np.arange(len(self)) if rows is None else rows)
+
+
+def load_compact(file_path, lazy_columns=LAZY_COLUMNS, policy=DEFAULT_POLICY, progress=None):
+    """(frame, LazyColumns or None): a cleaned dataset with lazy_columns left in the sidecar.
+
+    Without pyarrow or a usable sidecar every column is loaded. progress is
+    as for load_dataset.
+    """
+    if pa is None:
+        return load_dataset(file_path, policy=policy, progress=progress), None
+    sidecar = _sidecar_path(file_path, file_fingerprint(file_path), policy=policy)
+    df = None
+    if not os.path.exists(sidecar):
+        # Parses the CSV and writes the sidecar the lazy columns are read from
+        df = load_dataset(file_path, policy=policy, progress=progress)
+    try:
+        table = _open_sidecar(sidecar)
+    except (OSError, pa.ArrowException):
+        return (df if df is not None else load_dataset(file_path, use_cache=False, policy=policy)), None
+    lazy = [c for c in lazy_columns if c in table.column_names]
+    if not lazy:
+        return (df if df is not None else table.to_pandas()), None
+    if df is None:
+        df = table.select([c for c in table.column_names if c not in lazy]).to_pandas()
+    else:
+        df = df.drop(columns=lazy)
+    return df, LazyColumns(lazy, [table.select(lazy)])
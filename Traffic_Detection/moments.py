@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+
+class Moments:
+    """Mergeable count / mean / co-moment accumulator for a fixed set of columns."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    def update(self, df):
+        """Fold the complete rows of df into the accumulator."""
+        values = df[self.columns].dropna().to_numpy(dtype=float)
+        if len(values):
+            self._merge(len(values), values.mean(axis=0), _centered_comoment(values))
+        return self
+
+    def merge(self, other):
+        """Combine another accumulator over the same columns into this one."""
+        if other.n:
+            self._merge(other.n, other.mean, other.comoment)
+        return self
+
+    def _merge(self, n_b, mean_b, comoment_b):
+        # Chan et al. pairwise update
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.comoment = self.comoment + comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.mean = self.mean + delta * (n_b / n)
+        self.n = n
+
+    def covariance(self):
+        """Sample covariance matrix as a DataFrame."""
+        cov = self.comoment / (self.n - 1) if self.n > 1 else np.full_like(self.comoment, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        """Pearson correlation matrix, matching DataFrame.corr() on the same rows."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.diag(self.comoment))
+            corr = self.comoment / np.outer(std, std)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def _centered_comoment(values):
+    centered = values - values.mean(axis=0)
+    return centered.T @ centered
+
+
+# Histogram resolution kept per cell; selections coalesce it down to the display bins
+HIST_BASE_BINS = 300
+HIST_DISPLAY_BINS = 30
+
+
+def bin_edges(lo, hi):
+    """Base bin edges spanning [lo, hi]."""
+    return np.linspace(lo, hi if hi > lo else lo + 1, HIST_BASE_BINS + 1)
+
+
+class MomentCube:
+    """Moment and histogram partials pre-aggregated per filter combination.
+
+    Each cell holds the count, sums and cross-products (of complete rows,
+    centred on the dataset mean) plus per-column histogram counts for one
+    combination of filter values. A selection merges its cells, so its cost
+    follows the number of combinations, not the number of rows.
+    """
+
+    def __init__(self, cells, dims, columns, center, sums, products, hist_edges, hists):
+        self.cells = cells
+        self.dims = list(dims)
+        self.columns = list(columns)
+        self.center = center
+        self.sums = sums
+        self.products = products
+        self.hist_edges = hist_edges
+        self.hists = hists
+
+    @classmethod
+    def build(cls, df, dims, columns, hist_columns=(), center=None, hist_edges=None):
+        """Aggregate a cleaned frame into per-cell partials.
+
+        Pass an existing cube's center and hist_edges to build partials that
+        can be merged into it.
+        """
+        dims = [d for d in dims if d in df.columns]
+        columns = [c for c in columns if c in df.columns]
+        hist_columns = [c for c in hist_columns if c in df.columns]
+        k = len(columns)
+        if df.empty or not dims:
+            return cls(pd.DataFrame(columns=dims + ["rows", "n"]), dims, columns, np.zeros(k),
+                       np.zeros((0, k)), np.zeros((0, k, k)), {}, {})
+        grouped = df.groupby(dims, observed=True, dropna=False)
+        codes = grouped.ngroup().to_numpy()
+        cells = grouped.size().rename("rows").reset_index()
+        n_cells = len(cells)
+
+        values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+        complete = ~np.isnan(values).any(axis=1)
+        if center is None:
+            center = values[complete].mean(axis=0) if complete.any() else np.zeros(k)
+        # Centring first keeps the raw cross-product sums well conditioned
+        x = values[complete] - center
+        g = codes[complete]
+        cells["n"] = np.bincount(g, minlength=n_cells)
+        sums = np.column_stack([np.bincount(g, x[:, i], minlength=n_cells) for i in range(k)]).reshape(n_cells, k)
+        products = np.zeros((n_cells, k, k))
+        for i in range(k):
+            for j in range(i, k):
+                products[:, i, j] = products[:, j, i] = np.bincount(g, x[:, i] * x[:, j], minlength=n_cells)
+
+        fixed_edges = hist_edges
+        hist_edges, hists = {}, {}
+        for col in hist_columns:
+            v = df[col].to_numpy(dtype=float, na_value=np.nan)
+            present = ~np.isnan(v)
+            if not present.any():
+                continue
+            if fixed_edges is not None and col in fixed_edges:
+                edges = fixed_edges[col]
+            else:
+                edges = bin_edges(v[present].min(), v[present].max())
+            bins = np.clip(np.searchsorted(edges, v[present], side='right') - 1, 0, HIST_BASE_BINS - 1)
+            flat = codes[present] * HIST_BASE_BINS + bins
+            hist_edges[col] = edges
+            hists[col] = np.bincount(flat, minlength=n_cells * HIST_BASE_BINS).reshape(n_cells, HIST_BASE_BINS)
+        return cls(cells, dims, columns, center, sums, products, hist_edges, hists)
+
+    def covers(self, df):
+        """Whether df's histogram values fall inside this cube's bin edges."""
+        for col, edges in self.hist_edges.items():
+            if col in df.columns:
+                v = df[col].to_numpy(dtype=float, na_value=np.nan)
+                v = v[~np.isnan(v)]
+                if len(v) and (v.min() < edges[0] or v.max() > edges[-1]):
+                    return False
+        return True
+
+    def merge(self, other):
+        """Cube over the rows of both; other must be built with this cube's center and edges."""
+        cells = pd.concat([self.cells, other.cells], ignore_index=True)
+        grouped = cells.groupby(self.dims, observed=True, dropna=False)
+        codes = grouped.ngroup().to_numpy()
+        merged = grouped[["rows", "n"]].sum().reset_index()
+
+        def add(a, b):
+            out = np.zeros((len(merged),) + a.shape[1:], dtype=a.dtype)
+            np.add.at(out, codes, np.concatenate([a, b]))
+            return out
+
+        def hist(cube, col):
+            return cube.hists.get(col, np.zeros((len(cube.cells), HIST_BASE_BINS), dtype=np.int64))
+
+        # Either side may lack a column's histogram, e.g. a chunk where it is all missing
+        hists = {col: add(hist(self, col), hist(other, col)) for col in self.hists.keys() | other.hists.keys()}
+        return MomentCube(merged, self.dims, self.columns, self.center, add(self.sums, other.sums),
+                          add(self.products, other.products), {**other.hist_edges, **self.hist_edges}, hists)
+
+    def subtract(self, other):
+        """Cube over this cube's rows less other's, which must be among them and built as for merge.
+
+        Cells left without rows are dropped.
+        """
+        negated = MomentCube(other.cells.assign(rows=-other.cells["rows"], n=-other.cells["n"]), other.dims,
+                             other.columns, other.center, -other.sums, -other.products, other.hist_edges,
+                             {col: -hist for col, hist in other.hists.items()})
+        merged = self.merge(negated)
+        keep = merged.cells["rows"].to_numpy() != 0
+        return MomentCube(merged.cells[keep].reset_index(drop=True), self.dims, self.columns, self.center,
+                          merged.sums[keep], merged.products[keep], merged.hist_edges,
+                          {col: hist[keep] for col, hist in merged.hists.items()})
+
+    def _mask(self, selections):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in selections.items():
+            if dim in self.dims and values is not None:
+                mask &= self.cells[dim].isin(values).to_numpy()
+        return mask
+
+    def moments(self, selections):
+        """Merged Moments of the complete rows matching {dim: values} selections."""
+        mask = self._mask(selections)
+        result = Moments(self.columns)
+        n = int(self.cells["n"].to_numpy()[mask].sum()) if len(self.cells) else 0
+        if n:
+            mean = self.sums[mask].sum(axis=0) / n
+            result.n = n
+            result.mean = self.center + mean
+            result.comoment = self.products[mask].sum(axis=0) - n * np.outer(mean, mean)
+        return result
+
+    def histogram(self, column, selections, bins=HIST_DISPLAY_BINS):
+        """(edges, counts) over the occupied range of column, at most bins wide."""
+        if column not in self.hists:
+            return np.zeros(1), np.zeros(0, dtype=np.int64)
+        counts = self.hists[column][self._mask(selections)].sum(axis=0)
+        occupied = np.flatnonzero(counts)
+        if not occupied.size:
+            return np.zeros(1), np.zeros(0, dtype=np.int64)
+        first, last = occupied[0], occupied[-1] + 1
+        width = -(-(last - first) // bins)
+        counts = counts[first:last]
+        counts = np.pad(counts, (0, -len(counts) % width)).reshape(-1, width).sum(axis=1)
+        base = self.hist_edges[column]
+        step = base[1] - base[0]
+        edges = base[0] + (first + np.arange(len(counts) + 1) * width) * step
+        return edges, counts
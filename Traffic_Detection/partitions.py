@@ -0,0 +1,182 @@
+"""Datasets split across many CSV files in key=value partition directories.
+
+Feeds arrive as one file per day and state, laid out like
+
+    <root>/Date=2023-01-05/State=Maharashtra/part-0.csv
+
+Either key may be missing (e.g. <root>/State=Goa/2023.csv) and "Location" is
+accepted as an alias of "State". Loading concatenates the files in
+discover() order, so the result matches load_dataset() on that concatenation:
+a Violation_ID repeated across files is resolved by the same policy as one
+repeated within a file.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from dedup import DEFAULT_POLICY, concat_reports, deduplicate, empty_report, key_hashes
+from ingest import conflict_report, file_fingerprint, key_index, load_dataset
+
+# Directory key -> partition column
+PARTITION_KEYS = {"Date": "Date", "State": "State", "Location": "State"}
+
+
+def discover(root):
+    """One row per CSV file under root: path plus its Date/State partition values."""
+    records = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Skip sidecar caches and other hidden folders; walk in a stable order
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        keys = _partition_keys(os.path.relpath(dirpath, root))
+        for name in sorted(filenames):
+            if name.endswith(".csv"):
+                records.append({"path": os.path.join(dirpath, name), **keys})
+    parts = pd.DataFrame(records, columns=["path", "Date", "State"])
+    parts["Date"] = pd.to_datetime(parts["Date"], errors="coerce")
+    return parts
+
+
+def _partition_keys(relpath):
+    keys = {}
+    for segment in relpath.split(os.sep):
+        name, sep, value = segment.partition("=")
+        if sep and name in PARTITION_KEYS:
+            keys[PARTITION_KEYS[name]] = value
+    return keys
+
+
+def prune(parts, states=None, date_range=None):
+    """Partitions that can hold rows for the given states and inclusive date range.
+
+    Files without a value for a key are always kept for that key.
+    """
+    mask = pd.Series(True, index=parts.index)
+    if states is not None:
+        mask &= parts["State"].isna() | parts["State"].isin(states)
+    if date_range is not None:
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+        mask &= parts["Date"].isna() | parts["Date"].between(start, end)
+    return parts[mask]
+
+
+def partition_states(root):
+    """Sorted State values present in the directory names under root."""
+    return sorted(discover(root)["State"].dropna().unique())
+
+
+def partition_dates(root):
+    """(first, last) Date in the directory names under root, as dates; None if no file has one."""
+    dates = discover(root)["Date"].dropna()
+    if dates.empty:
+        return None
+    return dates.min().date(), dates.max().date()
+
+
+def listing_key(root):
+    """Cheap key over the CSV files under root: their paths, sizes and mtimes.
+
+    Changes when a partition is added, removed or rewritten; nothing is read.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for path in discover(root)["path"]:
+        st = os.stat(path)
+        h.update(f"{path}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def dataset_fingerprint(paths):
+    """Content key over a set of partition files."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        h.update(file_fingerprint(path).encode())
+    return h.hexdigest()
+
+
+def _load_partition(path, use_cache, policy):
+    """(df, hashes, conflicts) for one file.
+
+    hashes are the rows' (key, content) hashes; the content half comes from
+    the file's saved KeyIndex, so files seen before are not hashed again.
+    """
+    df = load_dataset(path, use_cache=use_cache, policy=policy)
+    keys = key_hashes(df)
+    contents = key_index(path, policy, df, use_cache).lookup(keys)
+    conflicts = conflict_report(path, policy) if use_cache else empty_report()
+    return df, (keys, contents), conflicts
+
+
+def combine(frames, policy=None, hashes=None, sources=None):
+    """Concatenate cleaned partition frames into one cleaned frame.
+
+    Returns (df, conflicts). Files are de-duplicated individually when
+    loaded; with a policy, IDs repeated across files are resolved here in
+    frame order, using each frame's (key, content) hashes if given and
+    labelling conflicts with its source. Categoricals are re-encoded to the
+    union of their categories, and the Timestamp order is restored.
+    """
+    keep = [i for i, f in enumerate(frames) if len(f)]
+    frames = [frames[i] for i in keep]
+    if not frames:
+        return pd.DataFrame(), empty_report()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True), empty_report()
+    df = concat_frames(frames)
+    conflicts = empty_report()
+    if policy is not None:
+        if hashes is not None:
+            hashes = tuple(np.concatenate([hashes[i][half] for i in keep]) for half in (0, 1))
+        source = "" if sources is None else np.repeat([sources[i] for i in keep], [len(f) for f in frames])
+        df, conflicts = deduplicate(df, policy, source, hashes)
+    df = df.sort_values("Timestamp", kind="stable", na_position="last")
+    return df.reset_index(drop=True), conflicts
+
+
+def concat_frames(frames):
+    """Row-wise concat of cleaned frames that keeps categoricals categorical."""
+    return pd.DataFrame({col: _concat_column([f[col] for f in frames]) for col in frames[0].columns})
+
+
+def _concat_column(parts):
+    if all(isinstance(p.dtype, pd.CategoricalDtype) and not p.cat.ordered for p in parts):
+        # Union of the categories, sorted as a single read would infer them;
+        # a plain concat of differing categoricals falls back to object.
+        # All-missing parts carry empty object categories; align those first.
+        typed = [p for p in parts if len(p.cat.categories)]
+        if typed:
+            empty = pd.CategoricalDtype(typed[0].cat.categories[:0])
+            parts = [p if len(p.cat.categories) else p.astype(empty) for p in parts]
+        return pd.Series(union_categoricals(parts, sort_categories=True))
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_partitioned(root, states=None, date_range=None, max_workers=None, use_cache=True,
+                     policy=DEFAULT_POLICY):
+    """Load and clean the partitions matching the filters, in parallel.
+
+    Returns (df, version, conflicts). Each file is cleaned (or served from
+    its sidecar) in a worker process; the frames are combined in discover()
+    order, and conflicts gathers the conflicting duplicates dropped within
+    and across files.
+    """
+    paths = list(prune(discover(root), states, date_range)["path"])
+    loaded = None
+    if len(paths) > 1 and max_workers != 1:
+        try:
+            # Platform default start method: under "spawn" every worker would
+            # re-import the running __main__, i.e. the Streamlit script itself
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                loaded = list(pool.map(_load_partition, paths, repeat(use_cache), repeat(policy), chunksize=8))
+        except BrokenProcessPool:
+            # Workers could not start or died; load in-process instead
+            loaded = None
+    if loaded is None:
+        loaded = [_load_partition(path, use_cache, policy) for path in paths]
+    frames, hashes, reports = zip(*loaded) if loaded else ((), (), ())
+    df, conflicts = combine(frames, policy, hashes, paths)
+    return df, dataset_fingerprint(paths), concat_reports(list(reports) + [conflicts])
@@ -0,0 +1,301 @@
+"""Headless report generator: every dashboard page, per state, as HTML or PDF.
+
+Usage:
+    python report.py --source traffic_data.csv --out reports
+    python report.py --source partitions/ --states Goa Kerala --format html pdf --workers 8
+    python report.py --source year.csv --ingest stream
+
+The dataset is loaded once. (state x page) jobs fan out over a process
+pool; workers inherit the loaded Dataset when processes fork, and
+otherwise load it once each from the columnar sidecar, never per job.
+"""
+import argparse
+import base64
+import html
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import anomalies
+import associations
+import engine
+from dedup import DEFAULT_POLICY
+from streaming import STREAM_POLICY
+
+NATIONAL = "All States"
+DEFAULT_PAGES = list(engine.PAGE_AGGREGATIONS)
+FORMATS = ["html", "pdf"]
+TABLE_ROWS = 20
+
+# Dataset shared by the jobs of one process (inherited across fork)
+_dataset = None
+
+
+def page_report(feature, page):
+    """(tables, plots) for one page's aggregates, matching what the app draws.
+
+    tables maps a title to a DataFrame; each plot is (charts.plot_* name,
+    figsize, args, kwargs).
+    """
+    import pandas as pd
+
+    tables, plots = {}, []
+    if feature == "Overview Dashboard":
+        tables["Key figures"] = pd.DataFrame({"Value": {
+            "Total violations": f"{page['total_violations']:,}",
+            "Total fines (₹)": f"{page['total_fines']:,.0f}",
+            "Violation types": page['violation_types'],
+            "States": page['states'],
+            "Officers": engine.format_estimate(page['officers'], page['officers_error']),
+        }})
+        plots += [
+            ("plot_bar", (10, 5), (page["violation_counts"].index, page["violation_counts"].values, "Violation Types"), {}),
+            ("plot_pie_counts", (8, 5), (page["status_counts"], "Payment Status"), {"donut": True}),
+            ("plot_bar", (12, 5), (page["top_states"].index, page["top_states"].values, "Top States by Violations"), {}),
+        ]
+    elif feature == "Violation Distribution":
+        plots += [
+            ("plot_bar", (10, 6), (page["violation_counts"].index, page["violation_counts"].values, "Count by Violation Type"), {}),
+            ("plot_pie_counts", (8, 6), (page["violation_counts"], "Violation Percentage"), {"donut": True}),
+            ("plot_bar", (12, 5), (page["payment_counts"].index, page["payment_counts"].values, "Payment Methods"), {}),
+        ]
+    elif feature == "Speed Analysis":
+        scatter = page["speed_scatter"]
+        plots += [
+            ("plot_hist_counts", (10, 5), (*page["speed_hist"], "Recorded Speed (km/h)"), {"xlabel": "Recorded_Speed", "color": "#4f83cc"}),
+            ("plot_hist_counts", (10, 5), (*page["fine_hist"], "Fine Amount (₹)"), {"xlabel": "Fine_Amount", "color": "#60a5fa"}),
+        ]
+        if scatter is not None and scatter["records"]:
+            plots.append(("plot_scatter_counts", (12, 6), (scatter, "Speed Analysis"), {}))
+        if not page["correlation"].columns.empty:
+            plots.append(("plot_corr_heatmap", (8, 6), (page["correlation"], "Numeric Correlations"), {}))
+    elif feature == "Trend Analysis":
+        plots += [
+            ("plot_line", (10, 5), (page["hourly"].index, page["hourly"].values, "Violations by Hour"), {}),
+            ("plot_bar", (10, 5), (engine.DAY_ORDER, page["daily"].values, "Violations by Day"), {}),
+            ("plot_line", (12, 5), (engine.MONTH_ORDER, page["monthly"].values, "Violations by Month"), {}),
+        ]
+    elif feature == "Weather Risk Analysis":
+        plots += [
+            ("plot_bar", (10, 5), (page["weather_counts"].index, page["weather_counts"].values, "Weather Conditions"), {}),
+            ("plot_bar", (10, 5), (page["road_counts"].index, page["road_counts"].values, "Road Conditions"), {}),
+        ]
+        if page["weather_road"] is not None:
+            plots.append(("plot_count_heatmap", (10, 5), (page["weather_road"], "Weather × Road Condition"), {}))
+    elif feature == "Location & Map":
+        tables["Top states"] = pd.DataFrame({
+            "Violations": page["top_states"],
+            "Fines (₹)": page["state_fines"].reindex(page["top_states"].index),
+        })
+        plots.append(("plot_barh", (10, 6), (page["top_states"].index, page["top_states"].values, "Violations by State"), {}))
+    elif feature == "Data Explorer":
+        # The rows themselves stay in the app; the report summarizes them
+        missing = page["stats"]["missing"]
+        tables["Dataset"] = pd.DataFrame({"Value": {
+            "Matching rows": "n/a" if page["matched_rows"] is None else f"{page['matched_rows']:,}",
+            "Rows in dataset": f"{page['stats']['shape'][0]:,}",
+            "Columns": len(page["columns"]),
+            "Conflicting duplicates dropped": f"{len(page['conflicts']):,}",
+        }})
+        tables["Missing values"] = missing[missing > 0].rename("Missing").to_frame()
+    elif feature == "Anomaly Detection":
+        series = page["series"]
+        if series is not None and series["counts"].size:
+            # Score every series, then plot the one with the strongest spike
+            flagged = anomalies.flag_spikes(series)
+            tables["Flagged spikes"] = flagged.head(TABLE_ROWS)
+            index = 0
+            if not flagged.empty:
+                keys = series["keys"]
+                index = int(keys.index[(keys["State"] == flagged["State"].iloc[0])
+                                       & (keys["Violation_Type"] == flagged["Violation_Type"].iloc[0])][0])
+            title = f"{series['keys']['State'].iloc[index]} · {series['keys']['Violation_Type'].iloc[index]}"
+            plots.append(("plot_anomaly_series", (12, 5), (anomalies.series_frame(series, index), title), {}))
+    elif feature == "Pattern Mining" and page["encoded"] is not None:
+        tables["Association rules by lift"] = associations.mine_rules(page["encoded"]).head(TABLE_ROWS)
+    elif feature == "Top Entities" and page:
+        for measure, label in (("count", "violations"), ("fines", "fines issued")):
+            top = page["top"][("Officer_ID", measure)].head(TABLE_ROWS)
+            tables[f"Top officers by {label}"] = top.rename(columns={"estimate": "Estimate", "error": "Error"})
+        top = page["top"][("Officer_ID", "count")].head(10).iloc[::-1]
+        prior = page["prior_violations"]
+        plots += [
+            ("plot_barh", (10, 6), (top["Officer_ID"].astype(str), top["estimate"], "Top Officers"), {}),
+            ("plot_bar", (10, 4), (prior.index, prior.values, "Violations by Prior Violation Count"), {}),
+        ]
+    return tables, plots
+
+
+def render_plot(plot):
+    """PNG bytes of one page_report plot."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import charts
+    from figure_cache import render_png
+
+    name, figsize, args, kwargs = plot
+    fig, ax = plt.subplots(figsize=figsize)
+    getattr(charts, name)(ax, *args, **kwargs)
+    return render_png(fig)
+
+
+def _load(source, ingest=engine.DEFAULT_INGEST):
+    # Streaming keeps the first copy of a repeated ID; it can apply no other policy
+    policy = STREAM_POLICY if ingest == "stream" else DEFAULT_POLICY
+    return engine.Dataset.from_source(source, policy, ingest=ingest)
+
+
+def _init_worker(source, ingest):
+    global _dataset
+    if _dataset is None:
+        # Not forked from the parent; the sidecar makes this a columnar read, not a
+        # CSV parse (a streamed dataset is streamed again)
+        _dataset = _load(source, ingest)
+
+
+def state_filters(dataset, state):
+    filters = {col: list(values) for col, values in dataset.filter_options.items()}
+    if state != NATIONAL:
+        filters["State"] = [state]
+    return filters
+
+
+def render_job(state, feature):
+    """Aggregate and draw one page for one state in this process's dataset."""
+    sel = _dataset.select(state_filters(_dataset, state))
+    tables, plots = {}, []
+    if not sel.empty:
+        tables, plots = page_report(feature, engine.PAGE_AGGREGATIONS[feature](sel))
+    return {
+        "state": state,
+        "feature": feature,
+        "tables": tables,
+        "images": [render_plot(plot) for plot in plots],
+    }
+
+
+def slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_") or "report"
+
+
+def write_html(path, state, sections, created):
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'>",
+        f"<title>Traffic Violations · {html.escape(state)}</title>",
+        "<style>body{font-family:sans-serif;margin:2rem;color:#333}h1,h2{color:#2563eb}"
+        "img{max-width:100%;margin:0.5rem 0}table{border-collapse:collapse;margin:0.5rem 0}"
+        "td,th{border:1px solid #ddd;padding:4px 8px;font-size:0.9rem}</style></head><body>",
+        f"<h1>🚦 Traffic Violations · {html.escape(state)}</h1><p>Generated {created}</p>",
+    ]
+    for job in sections:
+        parts.append(f"<h2>{html.escape(job['feature'])}</h2>")
+        if not job["tables"] and not job["images"]:
+            parts.append("<p>No violations recorded.</p>")
+        for title, table in job["tables"].items():
+            parts.append(f"<h3>{html.escape(title)}</h3>{table.to_html(border=0)}")
+        for png in job["images"]:
+            parts.append(f"<img src='data:image/png;base64,{base64.b64encode(png).decode()}'>")
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("".join(parts))
+
+
+def write_pdf(path, state, sections):
+    """One PDF page per chart, titled with the dashboard page."""
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        if not any(job["images"] for job in sections):
+            fig = plt.figure(figsize=(11, 3))
+            fig.text(0.5, 0.5, f"{state}: no violations recorded", ha="center", va="center", fontsize=16)
+            pdf.savefig(fig)
+            plt.close(fig)
+        for job in sections:
+            for png in job["images"]:
+                image = plt.imread(io.BytesIO(png), format="png")
+                height, width = image.shape[:2]
+                fig = plt.figure(figsize=(11, 11 * height / width + 0.6))
+                fig.suptitle(f"{state} · {job['feature']}", color="#2563eb", fontweight="bold")
+                ax = fig.add_axes([0, 0, 1, 1 - 0.6 / fig.get_figheight()])
+                ax.imshow(image)
+                ax.axis("off")
+                pdf.savefig(fig)
+                plt.close(fig)
+
+
+def generate(source, out_dir, states=None, pages=DEFAULT_PAGES, formats=("html",), max_workers=None, progress=print,
+             ingest=engine.DEFAULT_INGEST):
+    """Render every (state, page) pair and write one report per state; returns the written paths."""
+    global _dataset
+    _dataset = _load(source, ingest)
+    if states is None:
+        states = [NATIONAL] + sorted(map(str, _dataset.filter_options.get("State", [])))
+    jobs = [(state, feature) for state in states for feature in pages]
+
+    results = None
+    if max_workers != 1 and len(jobs) > 1:
+        try:
+            # Default start method: forked workers inherit _dataset as is
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(source, ingest)) as pool:
+                futures = [pool.submit(render_job, *job) for job in jobs]
+                for done, _ in enumerate(as_completed(futures), 1):
+                    progress(f"rendered {done}/{len(jobs)}")
+                results = [f.result() for f in futures]
+        except BrokenProcessPool:
+            results = None
+    if results is None:
+        results = []
+        for done, job in enumerate(jobs, 1):
+            results.append(render_job(*job))
+            progress(f"rendered {done}/{len(jobs)}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    created = time.strftime("%Y-%m-%d %H:%M")
+    written = []
+    for state in states:
+        sections = [r for r in results if r["state"] == state]
+        if "html" in formats:
+            written.append(os.path.join(out_dir, f"{slug(state)}.html"))
+            write_html(written[-1], state, sections, created)
+        if "pdf" in formats:
+            written.append(os.path.join(out_dir, f"{slug(state)}.pdf"))
+            write_pdf(written[-1], state, sections)
+    if "html" in formats:
+        links = "".join(f"<li><a href='{slug(s)}.html'>{html.escape(s)}</a></li>" for s in states)
+        written.append(os.path.join(out_dir, "index.html"))
+        with open(written[-1], "w", encoding="utf-8") as fh:
+            fh.write(f"<!doctype html><html><head><meta charset='utf-8'><title>Traffic Violation Reports</title>"
+                     f"</head><body><h1>Traffic Violation Reports</h1><p>Generated {created}</p><ul>{links}</ul></body></html>")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="traffic_data.csv", help="CSV file or partitioned directory")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--states", nargs="+", help=f"states to report (default: '{NATIONAL}' plus every state)")
+    parser.add_argument("--pages", nargs="+", default=DEFAULT_PAGES, choices=list(engine.PAGE_AGGREGATIONS))
+    parser.add_argument("--format", nargs="+", default=["html"], choices=FORMATS, dest="formats")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU; 1 = no pool)")
+    parser.add_argument("--ingest", default=engine.DEFAULT_INGEST, choices=engine.INGEST_MODES,
+                        help="keep the cleaned rows in memory, or stream a CSV file into the aggregates alone")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    written = generate(args.source, args.out, args.states, args.pages, args.formats, args.workers,
+                       progress=lambda msg: print(msg, end="\r", flush=True), ingest=args.ingest)
+    print(f"\nwrote {len(written)} files to {args.out} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""Bounded-memory sketches for high-cardinality columns.
+
+Per cell (one State by default) a SketchCube keeps a HyperLogLog for
+distinct counts and Space-Saving summaries of the heaviest values, by
+violation count and by fines issued. Both merge exactly across cells,
+chunks and partitions: HyperLogLog registers by element-wise max, and
+Space-Saving summaries by adding estimates, with each side's floor
+standing in for values it does not monitor.
+
+Cells with few distinct values also keep their exact value hashes, so
+low-cardinality counts (registration states, prior violation counts) are
+exact rather than estimated.
+
+A Space-Saving estimate never undercounts; estimate - error never
+overcounts. Any value left out of a summary has a true weight of at most
+that summary's floor.
+
+Rows can be taken back out of the totals and summaries (subtract), but not
+out of the distinct counts: registers and exact sets only ever grow, so a
+value only the removed rows had is still counted.
+"""
+import numpy as np
+import pandas as pd
+
+SKETCH_DIMENSIONS = ["State"]
+# Columns with top-k summaries
+TOP_K_COLUMNS = ["Officer_ID", "Registration_State", "Vehicle_Model_Year", "Previous_Violations"]
+# Columns with distinct-count registers; the State and Violation_Type
+# KPIs are counted exactly from the page cubes instead
+DISTINCT_COLUMNS = TOP_K_COLUMNS
+MEASURES = ["count", "fines"]
+
+HLL_PRECISION = 14  # 16384 registers (16 KB) per cell and column, ~0.8% standard error
+TOP_K_CAPACITY = 1024  # values monitored per cell and measure
+EXACT_LIMIT = 256  # distinct values per cell counted exactly before falling back to HyperLogLog
+
+
+def _factorize(series):
+    """(codes, uniques) with code -1 for missing values.
+
+    Uniques are in value order, as a categorical's are, so ties between
+    values rank the same however the rows were split into chunks.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series, sort=True)
+
+
+def hash_values(uniques):
+    """64-bit hashes of distinct values, equal for equal values across chunks and dtypes."""
+    values = pd.Series(uniques)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        # Same value read as int in one file and float in another
+        values = values.astype("float64")
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _hll_registers(hashes, codes, n_cells, precision):
+    m = 1 << precision
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    # Rank = position of the leftmost 1-bit in the remaining bits; frexp gives the bit length
+    rank = (rest_bits + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+    registers = np.zeros(n_cells * m, dtype=np.uint8)
+    np.maximum.at(registers, codes * m + index, rank)
+    return registers.reshape(n_cells, m)
+
+
+def _small_sets(cells, hashes, n_cells):
+    """Per cell, its sorted distinct hashes, or None past EXACT_LIMIT; (cells, hashes) sorted by cell."""
+    if not n_cells:
+        return []
+    sizes = np.bincount(cells, minlength=n_cells)
+    return [None if len(part) > EXACT_LIMIT else np.unique(part)
+            for part in np.split(hashes, np.cumsum(sizes)[:-1])]
+
+
+def _union(a, b):
+    if a is None or b is None:
+        return None
+    union = np.union1d(a, b)
+    return union if len(union) <= EXACT_LIMIT else None
+
+
+def hll_error(precision=HLL_PRECISION):
+    """Relative standard error of a HyperLogLog estimate over 2**precision registers."""
+    return 1.04 / np.sqrt(1 << precision)
+
+
+def hll_estimate(registers):
+    """Distinct-count estimate from one row of HyperLogLog registers."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction: linear counting is near exact here
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+def _truncate(summary, floors, capacity):
+    """Keep each cell's capacity heaviest values; dropped values raise the cell's floor."""
+    summary = summary.sort_values(["cell", "estimate"], ascending=[True, False], kind="stable")
+    kept = summary.groupby("cell", sort=False).cumcount().to_numpy() < capacity
+    dropped = summary[~kept]
+    if len(dropped):
+        floors = floors.copy()
+        np.maximum.at(floors, dropped["cell"].to_numpy(), dropped["estimate"].to_numpy())
+    return summary[kept].reset_index(drop=True), floors
+
+
+class SketchCube:
+    """HyperLogLog registers and Space-Saving summaries per cell of dims.
+
+    Like MomentCube, a selection merges the cells it covers, so queries
+    cost the number of cells times the summary capacity, not the rows.
+    """
+
+    def __init__(self, cells, dims, registers, exact, tops, floors, precision, capacity):
+        self.cells = cells
+        self.dims = list(dims)
+        self.registers = registers
+        self.exact = exact
+        self.tops = tops
+        self.floors = floors
+        self.precision = precision
+        self.capacity = capacity
+
+    @classmethod
+    def build(cls, df, dims=SKETCH_DIMENSIONS, columns=TOP_K_COLUMNS, distinct_columns=DISTINCT_COLUMNS,
+              precision=HLL_PRECISION, capacity=TOP_K_CAPACITY):
+        """Sketch a cleaned frame; cubes built with equal precision and capacity merge.
+
+        An empty frame gives an empty cube over dims, a starting point to merge chunks into.
+        """
+        dims = list(dims) if df.empty else [d for d in dims if d in df.columns]
+        columns = [c for c in columns if c in df.columns]
+        distinct_columns = [c for c in distinct_columns if c in df.columns]
+        if df.empty:
+            cells = pd.DataFrame(columns=dims + ["rows", "fines"])
+            n_cells, codes = 0, np.zeros(0, dtype=np.int64)
+        elif dims:
+            grouped = df.groupby(dims, observed=True, dropna=False)
+            codes = grouped.ngroup().to_numpy()
+            cells = grouped.size().rename("rows").reset_index()
+            n_cells = len(cells)
+        else:
+            codes = np.zeros(len(df), dtype=np.int64)
+            cells = pd.DataFrame({"rows": [len(df)]})
+            n_cells = 1
+        fines = (df["Fine_Amount"].to_numpy(dtype=float, na_value=0.0) if "Fine_Amount" in df.columns
+                 else np.zeros(len(df)))
+        if n_cells:
+            cells["fines"] = np.bincount(codes, weights=fines, minlength=n_cells)
+
+        registers, exact, tops, floors = {}, {}, {}, {}
+        for col in dict.fromkeys(distinct_columns + columns):
+            # Hash and group by the column's integer codes, not its values
+            values, uniques = _factorize(df[col])
+            present = values >= 0
+            values, cell = values[present], codes[present]
+            flat = cell * len(uniques) + values
+            counts = np.bincount(flat, minlength=n_cells * len(uniques))
+            seen = np.flatnonzero(counts)
+            if col in distinct_columns:
+                hashes = hash_values(uniques)
+                registers[col] = _hll_registers(hashes[values], cell, n_cells, precision)
+                exact[col] = _small_sets(seen // len(uniques), hashes[seen % len(uniques)], n_cells)
+            if col not in columns:
+                continue
+            weights = {"count": counts.astype(float),
+                       "fines": np.bincount(flat, weights=fines[present], minlength=len(counts))}
+            for measure in MEASURES:
+                summary = pd.DataFrame({"cell": seen // len(uniques), "item": uniques[seen % len(uniques)],
+                                        "estimate": weights[measure][seen], "error": 0.0})
+                tops[col, measure], floors[col, measure] = _truncate(summary, np.zeros(n_cells), capacity)
+        return cls(cells, dims, registers, exact, tops, floors, precision, capacity)
+
+    def merge(self, other):
+        """Cube over the rows of both; other must share dims, precision and capacity."""
+        cells = pd.concat([self.cells, other.cells], ignore_index=True)
+        if self.dims:
+            grouped = cells.groupby(self.dims, observed=True, dropna=False)
+            codes = grouped.ngroup().to_numpy()
+            merged = grouped[["rows", "fines"]].sum().reset_index()
+        else:
+            codes = np.zeros(len(cells), dtype=np.int64)
+            merged = cells[["rows", "fines"]].sum().to_frame().T if len(cells) else cells
+        n_cells = len(merged)
+        ours, theirs = codes[:len(self.cells)], codes[len(self.cells):]
+
+        registers = {}
+        for col in self.registers.keys() | other.registers.keys():
+            out = np.zeros((n_cells, 1 << self.precision), dtype=np.uint8)
+            for cube, mapping in ((self, ours), (other, theirs)):
+                if col in cube.registers:
+                    # A cube's cells map to distinct merged cells, so no index repeats
+                    out[mapping] = np.maximum(out[mapping], cube.registers[col])
+            registers[col] = out
+
+        exact = {}
+        for col in self.exact.keys() | other.exact.keys():
+            sets = [np.empty(0, dtype=np.uint64)] * n_cells
+            for cube, mapping in ((self, ours), (other, theirs)):
+                for i, hashes in enumerate(cube.exact.get(col, [None] * len(mapping))):
+                    sets[mapping[i]] = _union(sets[mapping[i]], hashes)
+            exact[col] = sets
+
+        tops, floors = {}, {}
+        for key in self.tops.keys() | other.tops.keys():
+            sides = []
+            for cube, mapping in ((self, ours), (other, theirs)):
+                floor = np.zeros(n_cells)
+                summary = cube.tops.get(key)
+                if summary is None:
+                    summary = pd.DataFrame(columns=["cell", "item", "estimate", "error"])
+                else:
+                    floor[mapping] = cube.floors[key]
+                    summary = summary.assign(cell=mapping[summary["cell"].to_numpy()])
+                sides.append((summary, floor))
+            (a, floor_a), (b, floor_b) = sides
+            both = a.merge(b, on=["cell", "item"], how="outer", suffixes=("_a", "_b"))
+            cell = both["cell"].to_numpy(dtype=np.int64)
+            # A value one side does not monitor may still have up to that side's floor there
+            both["estimate"] = both["estimate_a"].fillna(pd.Series(floor_a[cell], index=both.index)) \
+                + both["estimate_b"].fillna(pd.Series(floor_b[cell], index=both.index))
+            both["error"] = both["error_a"].fillna(pd.Series(floor_a[cell], index=both.index)) \
+                + both["error_b"].fillna(pd.Series(floor_b[cell], index=both.index))
+            both["cell"] = cell
+            tops[key], floors[key] = _truncate(both[["cell", "item", "estimate", "error"]],
+                                               floor_a + floor_b, self.capacity)
+        return SketchCube(merged, self.dims, registers, exact, tops, floors, self.precision, self.capacity)
+
+    def subtract(self, other):
+        """Cube over this cube's rows less other's, which must be among them; other shares dims.
+
+        Each summary value loses at least what other's summary says the
+        removed rows had, so estimates stay upper bounds, and its error
+        grows by other's, so estimate - error stays a lower bound. Distinct
+        counts are left as they are (see module docstring).
+        """
+        if self.dims:
+            keys = self.cells[self.dims].astype(object).reset_index()
+            mapping = other.cells[self.dims].astype(object).merge(keys, on=self.dims, how="left")["index"].to_numpy()
+        else:
+            mapping = np.zeros(len(other.cells), dtype=np.int64)
+        cells = self.cells.copy()
+        for measure in ("rows", "fines"):
+            values = cells[measure].to_numpy().copy()
+            np.subtract.at(values, mapping, other.cells[measure].to_numpy(dtype=values.dtype))
+            cells[measure] = values
+
+        tops = {}
+        for key, summary in self.tops.items():
+            theirs = other.tops.get(key)
+            if theirs is None:
+                tops[key] = summary
+                continue
+            # A value other does not monitor had anywhere from 0 to other's floor in the removed rows
+            floor = np.zeros(len(cells))
+            floor[mapping] = other.floors[key]
+            both = summary.merge(theirs.assign(cell=mapping[theirs["cell"].to_numpy()]), on=["cell", "item"],
+                                 how="left", suffixes=("", "_o"))
+            cell = both["cell"].to_numpy(dtype=np.int64)
+            removed = both["estimate_o"].fillna(pd.Series(floor[cell], index=both.index))
+            removed_error = both["error_o"].fillna(pd.Series(floor[cell], index=both.index))
+            both["estimate"] = both["estimate"] - (removed - removed_error)
+            both["error"] = np.minimum(both["error"] + removed_error, both["estimate"])
+            both = both[both["estimate"] > 0].sort_values(["cell", "item"], kind="stable")
+            tops[key], _ = _truncate(both[["cell", "item", "estimate", "error"]], self.floors[key], self.capacity)
+        return SketchCube(cells, self.dims, self.registers, self.exact, tops, self.floors, self.precision,
+                          self.capacity)
+
+    def _mask(self, selections):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in selections.items():
+            if dim in self.dims and values is not None:
+                mask &= self.cells[dim].isin(values).to_numpy()
+        return mask
+
+    def totals(self, selections):
+        """(rows, fines) of the cells matching {dim: values} selections."""
+        mask = self._mask(selections)
+        if not mask.any():
+            return 0, 0.0
+        return int(self.cells["rows"].to_numpy()[mask].sum()), float(self.cells["fines"].to_numpy()[mask].sum())
+
+    def _exact_sets(self, column, mask):
+        """The selected cells' value hashes, or None if any cell is past EXACT_LIMIT."""
+        sets = [self.exact[column][i] for i in np.flatnonzero(mask)]
+        return sets if all(hashes is not None for hashes in sets) else None
+
+    def distinct(self, column, selections):
+        """Estimated number of distinct column values in the selected cells."""
+        mask = self._mask(selections)
+        if column not in self.registers or not mask.any():
+            return 0
+        sets = self._exact_sets(column, mask)
+        if sets is not None:
+            return len(np.unique(np.concatenate(sets)))
+        return hll_estimate(self.registers[column][mask].max(axis=0))
+
+    def distinct_error(self, column, selections):
+        """Relative standard error of distinct(); 0.0 where it counts exactly."""
+        mask = self._mask(selections)
+        if column not in self.registers or not mask.any() or self._exact_sets(column, mask) is not None:
+            return 0.0
+        return hll_error(self.precision)
+
+    def top(self, column, measure, selections, n=10):
+        """The n heaviest column values by measure in the selected cells.
+
+        Returns a frame of value, estimate (an upper bound) and error; the
+        true weight is at least estimate - error.
+        """
+        mask = self._mask(selections)
+        key = (column, measure)
+        if key not in self.tops or not mask.any():
+            return pd.DataFrame(columns=[column, "estimate", "error"])
+        summary = self.tops[key]
+        floors = self.floors[key]
+        cell = summary["cell"].to_numpy()
+        summary = summary[mask[cell]]
+        # Every selected cell contributes its floor to values it does not monitor
+        base = floors[summary["cell"].to_numpy()]
+        merged = (summary.assign(estimate=summary["estimate"] - base, error=summary["error"] - base)
+                  .groupby("item", sort=False)[["estimate", "error"]].sum())
+        merged += floors[mask].sum()
+        merged = merged.sort_values("estimate", ascending=False, kind="stable").head(n)
+        return merged.rename_axis(column).reset_index()
@@ -0,0 +1,321 @@
+"""Page aggregates as SQL over an embedded DuckDB database, as an alternative to pandas.
+
+The pandas path (the cubes, sketches and row indexes of engine.Dataset) is
+the reference. With the "duckdb" backend the count-and-sum aggregates in
+QUERIES (KPIs, value counts, the Weather x Road pivot, the hourly, daily and
+monthly trends and the per-state fine sums) are answered by SQL instead, as
+are the sidebar options and date bounds. Everything else keeps running on
+pandas, which loads the rows and builds its structures only once a page
+asks for something SQL does not answer.
+
+DuckDB reads the source CSV with its parallel reader and applies the same
+cleaning and de-duplication rules as ingest.clean_frame, in SQL. Only the
+columns those aggregates read are kept. The result is stored as a columnar
+database file beside the sidecar, keyed by the file's fingerprint and the
+policy, so it is built once per file version. Queries run in that database
+with every core, and filters and column projections are pushed down into
+the scan. No server is involved.
+
+duckdb is optional; only the "duckdb" backend needs it. To check that both
+backends give the same tables on a dataset, run
+python -m bench.sql_parity --source <file>.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cube import DATE_RANGE, FILTER_DIMENSIONS
+from dedup import DEFAULT_POLICY, KEY_COLUMN, check_policy
+from ingest import CSV_NA_VALUES, DAY_ORDER, MONTH_ORDER, REQUIRED_COLUMNS, database_path
+
+try:
+    import duckdb
+except ImportError:  # the SQL backend is optional
+    duckdb = None
+
+BACKENDS = ["pandas", "duckdb"]
+DEFAULT_BACKEND = "pandas"
+
+TABLE = "violations"
+# Bump when the table's columns change, so databases built before are not reused
+TABLE_VERSION = 2
+
+# Cleaned columns the queries read -> SQL over the raw (all text) source
+# columns, with the source columns each needs
+_COLUMNS = {
+    "State": ('"Location"', ["Location"]),
+    "Violation_Type": ('"Violation_Type"', ["Violation_Type"]),
+    "Weather_Condition": ('"Weather_Condition"', ["Weather_Condition"]),
+    "Road_Condition": ('"Road_Condition"', ["Road_Condition"]),
+    "Payment_Method": ('"Payment_Method"', ["Payment_Method"]),
+    "Status": ("""CASE "Fine_Paid" WHEN 'Yes' THEN 'Paid' WHEN 'No' THEN 'Unpaid' END""", ["Fine_Paid"]),
+    "Hour": ("CAST(hour(_time) AS TINYINT)", ["Time"]),
+    "Day": ("dayname(_date)", ["Date"]),
+    "Month": ("monthname(_date)", ["Date"]),
+    # Date plus the time of day, like the frame's Timestamp
+    "Timestamp": ("_date + coalesce(_time - date_trunc('day', _time), INTERVAL 0 SECOND)", ["Date", "Time"]),
+    # {type}: BIGINT when every source value is an integer, as pandas infers it
+    "Fine_Amount": ('coalesce(TRY_CAST("Fine_Amount" AS {type}), 0)', ["Fine_Amount"]),
+}
+
+# The row's position in the pandas frame: sorted by Timestamp, missing ones
+# last, ties in file order
+_POSITION = "_position"
+
+_SOURCE = "read_csv(?, header = true, all_varchar = true, nullstr = ?)"
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown query backend {backend!r}; expected one of {BACKENDS}")
+
+
+def open_backend(backend, file_path, policy=DEFAULT_POLICY):
+    """SqlBackend over file_path for the "duckdb" backend; None for "pandas"."""
+    check_backend(backend)
+    if backend == "pandas":
+        return None
+    return SqlBackend.from_csv(file_path, policy)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _build_sql(header, policy, fine_type="DOUBLE"):
+    """CREATE TABLE statement cleaning and de-duplicating the CSV bound to the first two parameters."""
+    columns = {name: sql.replace("{type}", fine_type)
+               for name, (sql, needs) in _COLUMNS.items() if set(needs) <= set(header)}
+    select = ",\n    ".join(f"{sql} AS {_quote(name)}" for name, sql in columns.items())
+    required = " AND ".join(f"{_quote(c)} IS NOT NULL" for c in REQUIRED_COLUMNS)
+    # Rows sharing an ID keep the last (or first) copy in file order; rows
+    # without one are keyed by their whole content, as in dedup.key_hashes
+    if KEY_COLUMN in header:
+        key = f"{_quote(KEY_COLUMN)}, CASE WHEN {_quote(KEY_COLUMN)} IS NULL THEN _content END"
+    else:
+        key = "_content"
+    order = "DESC" if policy == "last" else "ASC"
+    return f"""
+CREATE TABLE {TABLE} AS
+WITH source AS (
+    SELECT * FROM {_SOURCE}
+), numbered AS (
+    SELECT *, hash(source) AS _content, row_number() OVER () AS _row FROM source
+), kept AS (
+    SELECT *,
+        TRY_CAST("Date" AS TIMESTAMP) AS _date,
+        coalesce(try_strptime("Time", '%H:%M'), try_strptime("Time", '%H:%M:%S')) AS _time
+    FROM numbered
+    WHERE {required}
+    QUALIFY row_number() OVER (PARTITION BY {key} ORDER BY _row {order}) = 1
+)
+SELECT
+    {select},
+    row_number() OVER (ORDER BY "Timestamp" NULLS LAST, _row) - 1 AS {_POSITION}
+FROM kept
+ORDER BY {_POSITION}
+"""
+
+
+class SqlBackend:
+    """The aggregates in QUERIES, answered by SQL over a DuckDB database of cleaned rows.
+
+    One read-only connection is shared; each query runs on a cursor of its
+    own, so sessions on several threads can query at once.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        types = dict(connection.execute(f"SELECT column_name, column_type FROM (DESCRIBE {TABLE})").fetchall())
+        self.columns = list(types)
+        self._fine_type = types.get("Fine_Amount", "DOUBLE")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, file_path, policy=DEFAULT_POLICY, use_cache=True, threads=None):
+        """Backend over a violations CSV; its database is built on first use.
+
+        threads caps the cores DuckDB uses (default: all of them). Without
+        use_cache the database is built in memory and not kept.
+        """
+        if duckdb is None:
+            raise ImportError("the duckdb query backend needs the duckdb package (pip install duckdb)")
+        check_policy(policy)
+        config = {} if threads is None else {"threads": threads}
+        if not use_cache:
+            connection = duckdb.connect(":memory:", config=config)
+            cls._build(connection, file_path, policy)
+            return cls(connection)
+        path = database_path(file_path, policy, TABLE_VERSION)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Built under a temporary name, so readers never open a partial database
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with duckdb.connect(tmp, config=config) as connection:
+                cls._build(connection, file_path, policy)
+            os.replace(tmp, path)
+        return cls(duckdb.connect(path, read_only=True, config=config))
+
+    @staticmethod
+    def _build(connection, file_path, policy):
+        header = list(pd.read_csv(file_path, nrows=0).columns)
+        fine_type = "DOUBLE"
+        if "Fine_Amount" in header:
+            # pandas reads the column as int64 only if every value is a whole number
+            sql = f"""SELECT bool_and(coalesce(regexp_full_match(trim("Fine_Amount"), '[+-]?[0-9]+'), false))
+                      FROM {_SOURCE}"""
+            if connection.execute(sql, [file_path, CSV_NA_VALUES]).fetchone()[0]:
+                fine_type = "BIGINT"
+        connection.execute(_build_sql(header, policy, fine_type), [file_path, CSV_NA_VALUES])
+
+    def close(self):
+        self._connection.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            cursor = self._connection.cursor()
+        try:
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+    def _where(self, filters):
+        """(WHERE clause, parameters) for engine-style {key: values} filters."""
+        clauses, params = ["TRUE"], []
+        for key, values in filters.items():
+            if values is None:
+                continue
+            if key == DATE_RANGE:
+                start, end = values
+                clauses.append('"Timestamp" >= ? AND "Timestamp" < ?')
+                params += [pd.Timestamp(start).to_pydatetime(),
+                           (pd.Timestamp(end) + pd.Timedelta(days=1)).to_pydatetime()]
+            elif key in FILTER_DIMENSIONS and key in self.columns:
+                # Missing values can be selected too (pandas isin matches NaN)
+                present = [v for v in values if not pd.isna(v)]
+                tests = [f"{_quote(key)} IN ({', '.join('?' * len(present))})"] if present else []
+                if len(present) < len(values):
+                    tests.append(f"{_quote(key)} IS NULL")
+                clauses.append("(" + " OR ".join(tests) + ")" if tests else "FALSE")
+                params += present
+        return " AND ".join(clauses), params
+
+    # --- Aggregates ---
+    def total(self, filters):
+        where, params = self._where(filters)
+        return int(self._query(f"SELECT count(*) AS n FROM {TABLE} WHERE {where}", params)["n"].iloc[0])
+
+    def nunique(self, dim, filters):
+        """Like Cube.nunique: distinct non-missing values."""
+        where, params = self._where(filters)
+        sql = f"SELECT count(DISTINCT {_quote(dim)}) AS n FROM {TABLE} WHERE {where}"
+        return int(self._query(sql, params)["n"].iloc[0])
+
+    def total_fines(self, filters):
+        where, params = self._where(filters)
+        sql = f'SELECT coalesce(sum("Fine_Amount"), 0) AS fines FROM {TABLE} WHERE {where}'
+        return float(self._query(sql, params)["fines"].iloc[0])
+
+    def value_counts(self, dim, filters, dropna=True):
+        """Like Cube.value_counts: most frequent first, ties in value order."""
+        where, params = self._where(filters)
+        col = _quote(dim)
+        if dropna:
+            where += f" AND {col} IS NOT NULL"
+        sql = (f"SELECT {col} AS value, count(*) AS count FROM {TABLE} WHERE {where} "
+               f"GROUP BY {col} ORDER BY count DESC, value NULLS LAST")
+        frame = self._query(sql, params)
+        return pd.Series(frame["count"].to_numpy("int64"), index=pd.Index(frame["value"], name=dim), name="count")
+
+    def fine_sums(self, dim, filters):
+        """Like Cube.fine_sums: fines per value, in value order."""
+        where, params = self._where(filters)
+        col = _quote(dim)
+        sql = (f'SELECT {col} AS value, CAST(sum("Fine_Amount") AS {self._fine_type}) AS fines FROM {TABLE} '
+               f"WHERE {where} AND {col} IS NOT NULL GROUP BY {col} ORDER BY value")
+        frame = self._query(sql, params)
+        dtype = "int64" if self._fine_type == "BIGINT" else "float64"
+        return pd.Series(frame["fines"].to_numpy(dtype), index=pd.Index(frame["value"], name=dim), name="fines")
+
+    def pivot(self, rows, cols, filters):
+        """Like Cube.pivot: counts of rows x cols, zero where a pair never occurs."""
+        where, params = self._where(filters)
+        sql = (f"SELECT {_quote(rows)} AS r, {_quote(cols)} AS c, count(*) AS count FROM {TABLE} "
+               f"WHERE {where} AND {_quote(rows)} IS NOT NULL AND {_quote(cols)} IS NOT NULL GROUP BY r, c")
+        frame = self._query(sql, params)
+        table = frame.pivot(index="r", columns="c", values="count").fillna(0).astype("int64")
+        table = table.sort_index().sort_index(axis=1)
+        table.index.name, table.columns.name = rows, cols
+        return table
+
+    def filter_options(self):
+        """Like Dataset.filter_options: each filter column's values in order of first appearance."""
+        options = {}
+        for col in FILTER_DIMENSIONS:
+            if col in self.columns:
+                sql = f"SELECT {_quote(col)} AS value FROM {TABLE} GROUP BY value ORDER BY min({_POSITION})"
+                values = self._query(sql)["value"]
+                options[col] = [np.nan if pd.isna(v) else v for v in values]
+        return options
+
+    def date_bounds(self):
+        """Like Dataset.date_bounds: (first, last) date, or None without timestamps."""
+        if "Timestamp" not in self.columns:
+            return None
+        bounds = self._query(f'SELECT min("Timestamp") AS first, max("Timestamp") AS last FROM {TABLE}')
+        first, last = bounds["first"].iloc[0], bounds["last"].iloc[0]
+        if pd.isna(first):
+            return None
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    def answers(self, name):
+        """Whether QUERIES has the aggregate and this database the columns it reads."""
+        return name in QUERIES and set(QUERY_COLUMNS.get(name, ())) <= set(self.columns)
+
+    def value(self, name, filters):
+        """QUERIES[name] for engine-style filters; same result as the pandas node of that name."""
+        return QUERIES[name](self, filters)
+
+
+def _status_counts(db, filters):
+    counts = db.value_counts("Status", filters, dropna=False)
+    counts.index = counts.index.fillna("Unknown")
+    return counts
+
+
+def _trend(dim, order):
+    return lambda db, filters: db.value_counts(dim, filters).reindex(order).fillna(0).astype(int)
+
+
+# Columns a query reads beyond the filter columns
+QUERY_COLUMNS = {
+    "status_counts": ["Status"],
+    "payment_counts": ["Payment_Method"],
+    "hourly": ["Hour"],
+    "daily": ["Day"],
+    "monthly": ["Month"],
+    "road_counts": ["Road_Condition"],
+    "weather_counts": ["Weather_Condition"],
+    "weather_road": ["Weather_Condition", "Road_Condition"],
+}
+
+# engine.NODES names the SQL backend answers
+QUERIES = {
+    "total_violations": SqlBackend.total,
+    "total_fines": SqlBackend.total_fines,
+    "distinct_types": lambda db, filters: db.nunique("Violation_Type", filters),
+    "distinct_states": lambda db, filters: db.nunique("State", filters),
+    "violation_counts": lambda db, filters: db.value_counts("Violation_Type", filters),
+    "state_counts": lambda db, filters: db.value_counts("State", filters),
+    "state_fines": lambda db, filters: db.fine_sums("State", filters),
+    "weather_counts": lambda db, filters: db.value_counts("Weather_Condition", filters),
+    "status_counts": _status_counts,
+    "payment_counts": lambda db, filters: db.value_counts("Payment_Method", filters),
+    "hourly": lambda db, filters: db.value_counts("Hour", filters).sort_index(),
+    "daily": _trend("Day", DAY_ORDER),
+    "monthly": _trend("Month", MONTH_ORDER),
+    "road_counts": lambda db, filters: db.value_counts("Road_Condition", filters),
+    "weather_road": lambda db, filters: db.pivot("Weather_Condition", "Road_Condition", filters),
+}
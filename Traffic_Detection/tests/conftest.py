@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from bench.synth import generate_chunk
+from ingest import clean_frame, read_source
+
+# Small enough to check every aggregate against pandas directly
+FIXTURE_ROWS = 3000
+
+
+@pytest.fixture(scope="session")
+def violations_csv(tmp_path_factory):
+    """Synthetic violations CSV with some missing weather and speeds."""
+    df = generate_chunk(FIXTURE_ROWS, seed=7, days=120)
+    rng = np.random.default_rng(7)
+    df["Weather_Condition"] = df["Weather_Condition"].where(rng.random(len(df)) > 0.05)
+    df["Recorded_Speed"] = df["Recorded_Speed"].astype(float).where(rng.random(len(df)) > 0.05)
+    path = tmp_path_factory.mktemp("data") / "violations.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def violations(violations_csv):
+    """The fixture CSV cleaned as the dashboard loads it."""
+    df, _ = clean_frame(read_source(violations_csv))
+    return df
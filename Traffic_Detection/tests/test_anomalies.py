@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from anomalies import (MAD_TO_SIGMA, MIN_SCALE, count_series, flag_spikes, resample, rolling_baseline,
+                       robust_zscores)
+
+WINDOW = 7
+
+
+def _pandas_baseline(row, window):
+    """Median and MAD of the window values before each position, with pandas rolling windows."""
+    trailing = pd.Series(row, dtype=float).shift(1).rolling(window)
+    median = trailing.median()
+    mad = trailing.apply(lambda w: np.median(np.abs(w - np.median(w))), raw=True)
+    return median.to_numpy(), mad.to_numpy()
+
+
+def test_count_series_matches_groupby(violations):
+    series = count_series(violations)
+    days = violations["Date"].dt.normalize()
+    expected = violations.groupby(["State", "Violation_Type", days], observed=True).size()
+    assert series["start"] == days.min()
+    assert series["counts"].sum() == len(violations)
+    for (state, vtype), row in zip(series["keys"].itertuples(index=False), series["counts"]):
+        daily = expected.loc[(state, vtype)]
+        offsets = ((daily.index - series["start"]).days).to_numpy()
+        np.testing.assert_array_equal(row[offsets], daily.to_numpy())
+        assert row.sum() == daily.sum()
+
+
+def test_rolling_baseline_matches_pandas():
+    rng = np.random.default_rng(3)
+    counts = rng.poisson(3, size=(5, 40))
+    counts[2, 25] = 30  # a spike
+    for window in (WINDOW, WINDOW + 1):  # odd and even windows
+        median, mad = rolling_baseline(counts, window)
+        for row, m, d in zip(counts, median, mad):
+            expected_median, expected_mad = _pandas_baseline(row, window)
+            np.testing.assert_allclose(m, expected_median, equal_nan=True)
+            np.testing.assert_allclose(d, expected_mad, equal_nan=True)
+
+
+def test_robust_zscores_and_flags():
+    rng = np.random.default_rng(4)
+    counts = rng.poisson(3, size=(3, 30))
+    counts[1, 20] = 40
+    z, baseline = robust_zscores(counts, WINDOW)
+    median, mad = _pandas_baseline(counts[1], WINDOW)
+    expected = (counts[1] - median) / np.maximum(MAD_TO_SIGMA * mad, MIN_SCALE)
+    np.testing.assert_allclose(z[1], expected, equal_nan=True)
+    np.testing.assert_allclose(baseline[1], median, equal_nan=True)
+
+    keys = pd.DataFrame({"State": ["Goa", "Kerala", "Delhi"], "Violation_Type": ["No Helmet"] * 3})
+    series = {"keys": keys, "counts": counts, "start": pd.Timestamp("2024-01-01")}
+    flagged = flag_spikes(series, window=WINDOW)
+    assert ((flagged["State"] == "Kerala") & (flagged["Period"] == pd.Timestamp("2024-01-21"))).any()
+    assert (flagged["Robust_Z"].diff().dropna() <= 0).all()
+
+
+def test_resample_sums_blocks():
+    counts = np.arange(10).reshape(1, 10)
+    np.testing.assert_array_equal(resample(counts, 7), [[0 + 1 + 2 + 3 + 4 + 5 + 6, 7 + 8 + 9]])
@@ -0,0 +1,63 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from api import AggregateService, make_server
+from engine import Dataset
+
+
+@pytest.fixture
+def service(violations):
+    return AggregateService(Dataset(violations, version="v1"))
+
+
+def test_etag_and_cache_hit(service):
+    status, headers, body = service.handle("/api/overview-dashboard", {"state": ["Goa"]})
+    assert status == 200 and headers["X-Cache"] == "MISS"
+    assert json.loads(body)["total_violations"] >= 0
+    # The same query in another order, and with a trailing slash, is the same response
+    status, again, cached = service.handle("/api/overview-dashboard/", {"state": ["Goa"]})
+    assert status == 200 and again["X-Cache"] == "HIT" and cached == body
+    assert again["ETag"] == headers["ETag"]
+    other = service.handle("/api/overview-dashboard", {"state": ["Kerala"]})[1]["ETag"]
+    assert other != headers["ETag"]
+
+
+def test_not_modified(service):
+    etag = service.handle("/api/trend-analysis", {})[1]["ETag"]
+    for header in (etag, f'"stale", W/{etag}', "*"):
+        status, headers, body = service.handle("/api/trend-analysis", {}, header)
+        assert status == 304 and body == b"" and headers["ETag"] == etag
+    assert service.handle("/api/trend-analysis", {}, '"stale"')[0] == 200
+    # A new dataset version gets a new tag, so the old one no longer matches
+    service._dataset = Dataset(service.dataset.df, version="v2")
+    assert service.handle("/api/trend-analysis", {}, etag)[0] == 200
+
+
+def test_wildcard_does_not_hide_errors(service):
+    assert service.handle("/api/no-such-page", {}, "*")[0] == 404
+    assert service.handle("/api/trend-analysis", {"bogus": ["1"]}, "*")[0] == 400
+    assert service.handle("/api/anomaly-detection", {"window": ["x"]}, "*")[0] == 400
+
+
+def test_http_round_trip(service):
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/weather-risk-analysis"
+    try:
+        with urllib.request.urlopen(url) as response:
+            etag = response.headers["ETag"]
+            assert response.status == 200 and "weather_counts" in json.loads(response.read())
+        request = urllib.request.Request(url, headers={"If-None-Match": etag})
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(request)
+        assert e.value.code == 304
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(urllib.request.Request(url + "-typo", headers={"If-None-Match": "*"}))
+        assert e.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+from bench.sql_parity import differences
+from dedup import KEY_COLUMN
+from engine import PAGE_AGGREGATIONS, Dataset, explorer_page
+from moments import MomentCube
+from sketches import SketchCube
+
+# Pages compared with a rebuilt dataset; the other two hold rows or row codes
+PAGES = [page for page in PAGE_AGGREGATIONS if page not in ("Data Explorer", "Pattern Mining")]
+
+
+def _batches(violations, start, size, count):
+    return [violations.iloc[start + i * size:start + (i + 1) * size] for i in range(count)]
+
+
+def _resent(dataset, violations, n):
+    """Changed copies of n loaded rows, stamped with the newest time so they append in order."""
+    copies = violations.iloc[:n].copy()
+    copies["Fine_Amount"] += 1
+    copies["Timestamp"] = dataset.timestamps[-1]
+    return copies
+
+
+def _values(series):
+    """The numpy array behind a column: categorical codes, or a nullable column's values."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array.codes
+    return getattr(series.array, "_data", series.to_numpy())
+
+
+def _selections(dataset):
+    options = dataset.filter_options
+    every = {col: list(values) for col, values in options.items()}
+    first, last = dataset.date_bounds
+    return [every, {**every, "State": options["State"][:3]},
+            {**every, "Weather_Condition": [np.nan, options["Weather_Condition"][0]]},
+            {**every, engine.DATE_RANGE: (first, first + pd.Timedelta(days=30))},
+            {**every, engine.DATE_RANGE: (last - pd.Timedelta(days=3), last)}]
+
+
+def test_small_append_does_not_rebuild(violations, monkeypatch):
+    dataset = Dataset(violations.iloc[:2000])
+    # The first append moves the columns into storage with room to grow
+    dataset = dataset.appended(violations.iloc[2000:2010])
+    built = []
+
+    def recording(fn):
+        return lambda df, *args, **kwargs: built.append(len(df)) or fn(df, *args, **kwargs)
+
+    monkeypatch.setattr(engine, "build_page_cubes", recording(engine.build_page_cubes))
+    monkeypatch.setattr(engine, "FilterIndex", recording(engine.FilterIndex))
+    monkeypatch.setattr(engine, "combine", recording(engine.combine))
+    for cls in (MomentCube, SketchCube):
+        monkeypatch.setattr(cls, "build", classmethod(
+            lambda cls, df, *args, build=cls.build.__func__, **kwargs: built.append(len(df)) or build(cls, df, *args,
+                                                                                                      **kwargs)))
+
+    for rows in _batches(violations, 2010, 20, 5):
+        grown = dataset.appended(rows)
+        # The new rows land in the same buffers and bitmaps the previous dataset reads
+        for col in ("Fine_Amount", "State", "Recorded_Speed"):
+            assert np.shares_memory(_values(dataset.df[col]), _values(grown.df[col]))
+        assert np.shares_memory(dataset.index.bitmaps["State"]["Goa"], grown.index.bitmaps["State"]["Goa"])
+        assert len(dataset.df) == len(grown.df) - len(rows)
+        dataset = grown
+    resent = _resent(dataset, violations, 5)
+    dataset = dataset.appended(resent, replaced=resent[KEY_COLUMN].to_numpy())
+    assert built and max(built) <= 20
+    assert dataset.n_rows == 2110 and len(dataset.df) == 2115 and len(dataset.dropped) == 5
+
+
+@pytest.mark.parametrize("resend", [0, 40])
+def test_appended_matches_rebuild(violations, resend):
+    dataset = Dataset(violations.iloc[:2000])
+    for rows in _batches(violations, 2000, 150, 4):
+        dataset = dataset.appended(rows)
+    live = violations.iloc[:2600]
+    if resend:
+        resent = _resent(dataset, violations, resend)
+        dataset = dataset.appended(resent, replaced=resent[KEY_COLUMN].to_numpy())
+        # ... and again, superseding the copies just appended
+        again = resent.iloc[:10].assign(Fine_Amount=resent["Fine_Amount"].iloc[:10] + 1)
+        dataset = dataset.appended(again, replaced=again[KEY_COLUMN].to_numpy())
+        live = pd.concat([live.iloc[resend:], resent.iloc[10:], again])
+        # Masked out, not rebuilt without them
+        assert len(dataset.conflicts) == len(dataset.dropped) == resend + 10
+    for rows in _batches(violations, 2600, 200, 2):
+        dataset = dataset.appended(rows)
+    live = pd.concat([live, violations.iloc[2600:]], ignore_index=True)
+    reference = Dataset(live)
+
+    assert dataset.n_rows == reference.n_rows == len(live)
+    assert dataset.date_bounds == reference.date_bounds
+    pd.testing.assert_frame_equal(dataset.frame().reset_index(drop=True), reference.frame(), check_categorical=False)
+    assert dataset.stats["missing"].to_dict() == reference.stats["missing"].to_dict()
+    for filters in _selections(reference):
+        for page in PAGES:
+            expected, actual = PAGE_AGGREGATIONS[page](reference.select(filters)), PAGE_AGGREGATIONS[page](
+                dataset.select(filters))
+            assert not differences(expected, actual, page), (filters, differences(expected, actual, page))
+        sel, ref = dataset.select(filters), reference.select(filters)
+        page = explorer_page(sel, page_size=len(live), sort_by="Fine_Amount")["frame"]
+        expected = explorer_page(ref, page_size=len(live), sort_by="Fine_Amount")["frame"]
+        assert page[KEY_COLUMN].tolist() == expected[KEY_COLUMN].tolist()
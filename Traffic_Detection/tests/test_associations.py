@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from associations import MIN_ROWS, association_rules, encode, frequent_itemsets
+
+
+def _mask(df, items):
+    mask = np.ones(len(df), dtype=bool)
+    for item in items:
+        col, value = item.split("=", 1)
+        mask &= (df[col] == value).to_numpy()
+    return mask
+
+
+def test_rules_match_pandas(violations):
+    rules = association_rules(violations, min_support=0.02, min_confidence=0.2, max_length=3)
+    assert len(rules)
+    n = len(violations)
+    for rule in rules.itertuples(index=False):
+        antecedent = _mask(violations, rule.Antecedent.split(" + "))
+        consequent = _mask(violations, [rule.Consequent])
+        both = antecedent & consequent
+        assert rule.Count == both.sum()
+        assert rule.Support == pytest.approx(both.sum() / n)
+        assert rule.Confidence == pytest.approx(both.sum() / antecedent.sum())
+        assert rule.Lift == pytest.approx(rule.Confidence / (consequent.sum() / n))
+        assert rule.Support >= 0.02 and rule.Confidence >= 0.2
+    assert (rules["Lift"].diff().dropna() <= 1e-12).all()
+
+
+def test_consequent_column(violations):
+    rules = association_rules(violations, min_support=0.01, min_confidence=0.1,
+                              consequent_column="Violation_Type")
+    assert len(rules)
+    assert rules["Consequent"].str.startswith("Violation_Type=").all()
+
+
+def test_frequent_itemsets_skip_missing(violations):
+    # Missing weather (code -1) is never an item, and counts match value_counts
+    names, categories, codes = encode(violations, ["Weather_Condition", "Road_Condition"])
+    supports = frequent_itemsets(codes, [len(c) for c in categories], MIN_ROWS, max_length=2)
+    weather = violations["Weather_Condition"].value_counts()
+    for value, count in weather.items():
+        assert supports[((0, categories[0].get_loc(value)),)] == count
+    pairs = violations.groupby(["Weather_Condition", "Road_Condition"], observed=True).size()
+    for (w, r), count in pairs.items():
+        key = ((0, categories[0].get_loc(w)), (1, categories[1].get_loc(r)))
+        assert supports.get(key, 0) == (count if count >= MIN_ROWS else 0)
+    assert sum(v for k, v in supports.items() if len(k) == 2) == pairs[pairs >= MIN_ROWS].sum()
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import CUBE_DIMENSIONS, FILTER_DIMENSIONS, Cube
+from moments import HIST_BASE_BINS, MomentCube
+
+SPEED_COLUMNS = ["Recorded_Speed", "Speed_Limit", "Fine_Amount", "Driver_Age"]
+HIST_COLUMNS = ["Recorded_Speed", "Fine_Amount"]
+SELECTIONS = [
+    {},
+    {"State": ["Delhi", "Goa", "Kerala"]},
+    {"Violation_Type": ["No Helmet"], "Weather_Condition": ["Clear", np.nan]},
+    {"State": []},
+]
+
+
+def _rows(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in selections.items():
+        mask &= df[col].isin(values).to_numpy()
+    return df[mask]
+
+
+def _parts(df, n=3):
+    """Row blocks of df, as partitions or chunks would deliver them."""
+    bounds = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[lo:hi].reset_index(drop=True) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _merged_cube(df):
+    cubes = [Cube.build(part) for part in _parts(df)]
+    merged = cubes[0]
+    for cube in cubes[1:]:
+        merged = merged.merge(cube)
+    return merged
+
+
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_cube_matches_pandas(violations, selections):
+    rows = _rows(violations, selections)
+    for cube in (Cube.build(violations), _merged_cube(violations)):
+        sliced = cube.slice(selections)
+        assert sliced.total() == len(rows)
+        assert sliced.total_fines() == pytest.approx(rows["Fine_Amount"].sum())
+        for dim in CUBE_DIMENSIONS:
+            expected = rows[dim].value_counts()
+            expected = expected[expected > 0]
+            actual = sliced.value_counts(dim)
+            assert actual.sort_index().to_dict() == expected.sort_index().to_dict(), dim
+            assert list(actual.to_numpy()) == sorted(actual.to_numpy(), reverse=True)
+        expected = rows.groupby("State", observed=True)["Fine_Amount"].sum()
+        assert sliced.fine_sums("State").to_dict() == pytest.approx(expected.to_dict())
+        pivot = sliced.pivot("Weather_Condition", "Road_Condition")
+        expected = pd.crosstab(rows["Weather_Condition"], rows["Road_Condition"])
+        if expected.empty:
+            assert pivot.empty
+        else:
+            np.testing.assert_array_equal(pivot.to_numpy(), expected.to_numpy())
+            assert list(pivot.columns) == list(expected.columns)
+
+
+def _moment_cubes(df):
+    whole = MomentCube.build(df, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS)
+    parts = _parts(df)
+    merged = MomentCube.build(parts[0], FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS,
+                              center=whole.center, hist_edges=whole.hist_edges)
+    for part in parts[1:]:
+        merged = merged.merge(MomentCube.build(part, FILTER_DIMENSIONS, SPEED_COLUMNS, HIST_COLUMNS,
+                                               center=whole.center, hist_edges=whole.hist_edges))
+    return whole, merged
+
+
+@pytest.mark.parametrize("selections", SELECTIONS[:3])
+def test_moment_cube_matches_pandas(violations, selections):
+    rows = _rows(violations, selections)
+    complete = rows[SPEED_COLUMNS].dropna().astype(float)
+    for cube in _moment_cubes(violations):
+        moments = cube.moments(selections)
+        assert moments.n == len(complete)
+        np.testing.assert_allclose(moments.mean, complete.mean().to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(moments.covariance().to_numpy(), complete.cov().to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(moments.correlation().to_numpy(), complete.corr().to_numpy(), rtol=1e-9)
+
+
+def test_moment_cube_histograms_merge_exactly(violations):
+    whole, merged = _moment_cubes(violations)
+    for col in HIST_COLUMNS:
+        np.testing.assert_array_equal(merged.hists[col].sum(axis=0), whole.hists[col].sum(axis=0))
+        values = violations[col].dropna().to_numpy(dtype=float)
+        # Base bins hold every present value, counted as np.histogram bins them
+        expected, _ = np.histogram(values, bins=whole.hist_edges[col])
+        np.testing.assert_array_equal(whole.hists[col].sum(axis=0), expected)
+        assert whole.hists[col].shape[1] == HIST_BASE_BINS
+        edges, counts = merged.histogram(col, {})
+        assert counts.sum() == len(values)
+        assert len(edges) == len(counts) + 1
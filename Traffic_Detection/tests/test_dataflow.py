@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from dataflow import Memo, Node, filters_key
+from engine import NODES, ROW_FILTERS, Dataset
+
+
+def _filters(dataset, **overrides):
+    filters = {col: list(options) for col, options in dataset.filter_options.items()}
+    filters.update(overrides)
+    return filters
+
+
+def _counts(memo):
+    return memo.hits, memo.misses
+
+
+def test_filters_key_ignores_order():
+    assert filters_key({"State": ["Goa", "Kerala"], "Weather_Condition": None}) == \
+        filters_key({"Weather_Condition": None, "State": ["Kerala", "Goa"]})
+    assert filters_key({"State": ["Goa"]}) != filters_key({"State": ["Kerala"]})
+
+
+def test_filters_key_missing_values():
+    # Every spelling of missing is the same selection, and none is the string "nan" or "None"
+    missing = {filters_key({"Weather_Condition": [value, "Clear"]}) for value in (np.nan, None, pd.NA, float("nan"))}
+    assert len(missing) == 1
+    for text in ("nan", "None", "<NA>"):
+        assert filters_key({"Weather_Condition": [text, "Clear"]}) not in missing
+    assert filters_key({"Weather_Condition": None}) != filters_key({"Weather_Condition": []})
+
+
+def test_node_restrict_and_narrow():
+    node = Node(lambda sel: None, filters=["State", "Violation_Type"], narrow="State")
+    assert node.restrict({"State": ["Goa"], "Violation_Type": ["No Helmet"], "Weather_Condition": ["Clear"]}) == \
+        {"Violation_Type": ["No Helmet"]}
+    counts = pd.Series([3, 2, 1], index=["Goa", "Kerala", "Delhi"])
+    assert node.narrowed(counts, {"State": ["Kerala", "Delhi"]}).to_dict() == {"Kerala": 2, "Delhi": 1}
+    assert node.narrowed(counts, {}).equals(counts)
+
+
+def test_changed_filter_recomputes(violations):
+    dataset = Dataset(violations)
+    memo = dataset.memo
+    filters = _filters(dataset)
+    total = dataset.select(filters).value("total_violations")
+    assert total == len(violations)
+    assert _counts(memo) == (0, 1)
+    # Same filters from another selection (another session or page): a hit
+    assert dataset.select(dict(filters)).value("total_violations") == total
+    assert _counts(memo) == (1, 1)
+    # A changed filter the node reads is recomputed, and matches pandas
+    states = filters["State"][:3]
+    narrowed = dataset.select(_filters(dataset, State=states)).value("total_violations")
+    assert _counts(memo) == (1, 2)
+    assert narrowed == violations["State"].isin(states).sum()
+
+
+def test_nodes_declare_their_filters():
+    for name, node in NODES.items():
+        assert set(node.filters) <= set(ROW_FILTERS), name
+        if node.narrow is not None:
+            assert node.narrow in node.filters and not node.depends_on(node.narrow), name
+
+
+def test_unrelated_filter_is_not_recomputed(violations):
+    dataset = Dataset(violations)
+    memo = dataset.memo
+    filters = _filters(dataset)
+    pages = ["total_violations", "status_counts", "hourly", "speed_hist"]
+    before = {name: dataset.select(filters).value(name) for name in pages}
+    misses = memo.misses
+    # Keys no node reads (a page control, a filter the pages do not apply) are lookups
+    for extra in ({"Payment_Method": ["Cash"]}, {"Payment_Method": ["Card", "UPI"]}, {"threshold": [3.0]}):
+        sel = dataset.select({**filters, **extra})
+        for name in pages:
+            assert sel.value(name) is before[name]
+    assert memo.misses == misses
+    # A filter the nodes do read is not
+    dataset.select({**filters, "State": filters["State"][:2]}).value("hourly")
+    assert memo.misses == misses + 1
+
+
+def test_narrow_dimension_is_a_lookup(violations):
+    dataset = Dataset(violations)
+    memo = dataset.memo
+    filters = _filters(dataset)
+    everything = dataset.select(filters).value("state_counts")
+    misses = memo.misses
+    # state_counts groups by State: changing the State filter only narrows the memoized table
+    states = filters["State"][:4]
+    counts = dataset.select(_filters(dataset, State=states)).value("state_counts")
+    assert memo.misses == misses
+    expected = violations.loc[violations["State"].isin(states), "State"].value_counts()
+    assert counts.to_dict() == expected[expected > 0].to_dict()
+    assert everything.sum() == len(violations)
+    # Any other filter does invalidate it
+    dataset.select(_filters(dataset, Violation_Type=filters["Violation_Type"][:2])).value("state_counts")
+    assert memo.misses == misses + 1
+
+
+def test_appended_dataset_starts_fresh(violations):
+    half = len(violations) // 2
+    first = Dataset(violations.iloc[:half])
+    filters = _filters(first)
+    assert first.select(filters).value("total_violations") == half
+    grown = first.appended(violations.iloc[half:].reset_index(drop=True))
+    assert grown.memo is not first.memo
+    assert grown.select(filters).value("total_violations") == \
+        np.count_nonzero(violations["State"].isin(filters["State"])
+                         & violations["Violation_Type"].isin(filters["Violation_Type"])
+                         & violations["Weather_Condition"].isin(filters["Weather_Condition"]))
+    # The original is untouched and still answers from its memo
+    hits = first.memo.hits
+    assert first.select(filters).value("total_violations") == half
+    assert first.memo.hits == hits + 1
+
+
+def test_memo_evicts_least_recently_used():
+    memo = Memo(max_bytes=3200)
+    value = np.zeros(100)  # 800 bytes: four fit
+    for key in "abcd":
+        memo.get_or_compute(key, lambda: value)
+    memo.get_or_compute("a", lambda: value)  # a is now the most recent
+    memo.get_or_compute("e", lambda: value)
+    assert memo.bytes_used <= memo.max_bytes
+    calls = []
+    memo.get_or_compute("b", lambda: calls.append("b") or value)
+    memo.get_or_compute("a", lambda: calls.append("a") or value)
+    assert calls == ["b"]
+    # Over a quarter of the budget: returned but not kept
+    big = np.zeros(200)
+    assert memo.get_or_compute("big", lambda: big) is big
+    assert memo.get_or_compute("big", lambda: None) is None
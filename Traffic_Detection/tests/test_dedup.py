@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dedup
+from bench.synth import generate_chunk
+from dedup import KEY_COLUMN, RESOLUTIONS, KeyIndex, deduplicate
+from engine import Dataset
+from ingest import clean_frame, conflict_report, key_index, load_dataset
+
+
+def _uploads():
+    """Two uploads overlapping on 50 IDs: 10 of them changed, 40 sent again unchanged."""
+    first = generate_chunk(100, seed=1, days=30)
+    second = pd.concat([first.iloc[50:], generate_chunk(50, start_id=100, seed=2, days=30)],
+                       ignore_index=True)
+    second.loc[:9, "Fine_Amount"] += 1
+    return first, second
+
+
+def _without_ids(df, rows):
+    df = df.copy()
+    df.loc[rows, KEY_COLUMN] = np.nan
+    return df
+
+
+def test_deduplicate_within_a_frame():
+    df = generate_chunk(20, seed=3, days=30)
+    exact = df.iloc[[0]]
+    changed = df.iloc[[1]].assign(Fine_Amount=df["Fine_Amount"].iloc[1] + 1)
+    frame = pd.concat([df, exact, changed], ignore_index=True)
+    for policy, fine in (("last", changed["Fine_Amount"].iloc[0]), ("first", df["Fine_Amount"].iloc[1])):
+        rows, conflicts = deduplicate(frame, policy, "upload.csv")
+        assert len(rows) == 20 and rows[KEY_COLUMN].is_unique
+        assert rows.loc[rows[KEY_COLUMN] == df[KEY_COLUMN].iloc[1], "Fine_Amount"].item() == fine
+        # The exact copy is dropped quietly; only the other version is reported
+        assert conflicts[KEY_COLUMN].tolist() == [df[KEY_COLUMN].iloc[1]]
+        assert conflicts["Fine_Amount"].item() != fine
+        assert conflicts["Resolution"].item() == RESOLUTIONS[policy]
+        assert conflicts["Conflict_Source"].item() == "upload.csv"
+
+
+def test_rows_without_an_id_are_keyed_by_content():
+    df = _without_ids(generate_chunk(10, seed=4, days=30), [0, 1])
+    frame = pd.concat([df, df.iloc[[0]], df.iloc[[1]].assign(Fine_Amount=1)], ignore_index=True)
+    rows, conflicts = deduplicate(frame)
+    # The repeated row is a duplicate; the edited one is just another row
+    assert len(rows) == 11 and rows[KEY_COLUMN].isna().sum() == 3
+    assert conflicts.empty
+
+    index = KeyIndex.build(df)
+    again = pd.concat([df.iloc[[0]], df.iloc[[1]].assign(Fine_Amount=1)], ignore_index=True)
+    rows, conflicts, replaced = index.filter(again, "last")
+    assert rows["Fine_Amount"].tolist() == [1]
+    assert conflicts.empty and len(replaced) == 0
+    assert len(index) == 11
+
+
+def test_frame_without_id_column():
+    df = generate_chunk(10, seed=5, days=30).drop(columns=KEY_COLUMN)
+    rows, conflicts = deduplicate(pd.concat([df, df.iloc[:3]], ignore_index=True))
+    assert len(rows) == 10 and conflicts.empty
+    rows, _, replaced = KeyIndex.build(df).filter(df.iloc[:3].assign(Fine_Amount=1))
+    assert len(rows) == 3 and len(replaced) == 0
+
+
+def test_last_upload_wins_across_uploads():
+    first, second = _uploads()
+    index = KeyIndex.build(first)
+    rows, conflicts, replaced = index.filter(second, "last", "second.csv")
+    assert conflicts.empty
+    # The changed versions come back for the caller to swap in, with their IDs
+    assert rows[KEY_COLUMN].tolist() == second[KEY_COLUMN].iloc[:10].tolist() + second[KEY_COLUMN].iloc[50:].tolist()
+    assert list(replaced) == second[KEY_COLUMN].iloc[:10].tolist()
+    assert len(index) == 150
+    # The index now holds the new versions: the same upload again adds nothing
+    rows, conflicts, replaced = index.filter(second, "last")
+    assert rows.empty and conflicts.empty and len(replaced) == 0
+
+    # ... which drop the rows they supersede from a Dataset
+    changed = clean_frame(second.iloc[list(range(10)) + list(range(50, 100))])[0]
+    dataset = Dataset(clean_frame(first)[0]).appended(changed, replaced=second[KEY_COLUMN].iloc[:10].to_numpy())
+    assert len(dataset.df) == 150 and dataset.df[KEY_COLUMN].is_unique
+    fines = dataset.df.set_index(KEY_COLUMN)["Fine_Amount"]
+    assert (fines[second[KEY_COLUMN].iloc[:10]].to_numpy() == second["Fine_Amount"].iloc[:10].to_numpy()).all()
+
+
+def test_first_upload_wins_across_uploads():
+    first, second = _uploads()
+    index = KeyIndex.build(first)
+    rows, conflicts, replaced = index.filter(second, "first", "second.csv")
+    assert rows[KEY_COLUMN].tolist() == second[KEY_COLUMN].iloc[50:].tolist()
+    assert len(replaced) == 0
+    assert conflicts[KEY_COLUMN].tolist() == second[KEY_COLUMN].iloc[:10].tolist()
+    assert (conflicts["Fine_Amount"] == second["Fine_Amount"].iloc[:10].to_numpy()).all()
+    assert set(conflicts["Conflict_Source"]) == {"second.csv"}
+    assert set(conflicts["Resolution"]) == {RESOLUTIONS["first"]}
+    # The kept versions are still the indexed ones, so the changes conflict again
+    rows, conflicts, _ = index.filter(second, "first")
+    assert rows.empty and len(conflicts) == 10
+
+
+def test_key_index_survives_save_and_load(tmp_path):
+    first, second = _uploads()
+    index = KeyIndex.build(first)
+    path = tmp_path / "index.npz"
+    index.save(path)
+    loaded = KeyIndex.load(path)
+    assert np.array_equal(loaded.keys, index.keys) and np.array_equal(loaded.contents, index.contents)
+    for policy in dedup.POLICIES:
+        expected = KeyIndex.build(first).filter(second, policy)
+        actual = KeyIndex.load(path).filter(second, policy)
+        pd.testing.assert_frame_equal(actual[0], expected[0])
+        pd.testing.assert_frame_equal(actual[1], expected[1])
+
+
+@pytest.mark.parametrize("policy", dedup.POLICIES)
+def test_conflicts_and_key_index_persist_across_reloads(tmp_path, monkeypatch, policy):
+    first, second = _uploads()
+    path = tmp_path / "violations.csv"
+    pd.concat([first, second], ignore_index=True).to_csv(path, index=False)
+    df = load_dataset(path, policy=policy)
+    assert len(df) == 150 and df[KEY_COLUMN].is_unique
+    report = conflict_report(path, policy)
+    assert sorted(report[KEY_COLUMN]) == sorted(second[KEY_COLUMN].iloc[:10])
+    assert set(report["Resolution"]) == {RESOLUTIONS[policy]}
+    assert set(report["Conflict_Source"]) == {"violations.csv"}
+    saved = key_index(path, policy, df)
+
+    # A reload is served from the cache: no CSV parse, no rebuilt index,
+    # and the same conflicts and keys as the first load
+    monkeypatch.setattr("ingest.read_source", None)
+    monkeypatch.setattr(KeyIndex, "build", None)
+    pd.testing.assert_frame_equal(load_dataset(path, policy=policy), df)
+    pd.testing.assert_frame_equal(conflict_report(path, policy), report)
+    reloaded = key_index(path, policy)
+    assert np.array_equal(reloaded.keys, saved.keys) and np.array_equal(reloaded.contents, saved.contents)
+    assert len(Dataset.from_csv(str(path), policy).conflicts) == 10
+    monkeypatch.undo()
+
+    # Rewriting the file without the conflicting copies drops the old report
+    first.to_csv(path, index=False)
+    load_dataset(path, policy=policy)
+    assert conflict_report(path, policy).empty
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from engine import Dataset, explorer_page
+
+
+@pytest.fixture(scope="module")
+def dataset(violations):
+    return Dataset(violations)
+
+
+def _selection(dataset):
+    options = dataset.filter_options
+    return dataset.select({"State": options["State"][:6], "Violation_Type": options["Violation_Type"],
+                           "Weather_Condition": options["Weather_Condition"]})
+
+
+def test_page_boundaries(dataset, violations):
+    sel = _selection(dataset)
+    rows = np.flatnonzero(violations["State"].isin(dataset.filter_options["State"][:6]))
+    total, size = len(rows), 50
+    pages = -(-total // size)
+    assert total % size  # so the last page is a partial one
+    first = explorer_page(sel, page=0, page_size=size, columns=["Violation_ID"])
+    assert (first["total"], first["page"], first["pages"]) == (total, 0, pages)
+    assert first["frame"].index.tolist() == rows[:size].tolist()
+    second = explorer_page(sel, page=1, page_size=size, columns=["Violation_ID"])
+    assert second["frame"].index.tolist() == rows[size:2 * size].tolist()
+    last = explorer_page(sel, page=pages - 1, page_size=size)
+    assert len(last["frame"]) == total % size and last["frame"].index[-1] == rows[-1]
+    assert list(last["frame"].columns) == dataset.columns
+    # Out-of-range pages are clamped to the first and last
+    assert explorer_page(sel, page=-3, page_size=size)["page"] == 0
+    assert explorer_page(sel, page=pages + 10, page_size=size)["page"] == pages - 1
+
+
+def test_search(dataset, violations):
+    sel = _selection(dataset)
+    selected = violations["State"].isin(dataset.filter_options["State"][:6])
+    text = violations["Officer_ID"].iloc[0][:5].lower()
+    matches = selected & (violations["Officer_ID"].str.lower().str.contains(text, regex=False)
+                          | violations["Violation_ID"].str.lower().str.contains(text, regex=False))
+    result = explorer_page(sel, page_size=500, search=f"  {text.upper()} ")
+    assert result["total"] == matches.sum() > 0
+    assert result["frame"].index.tolist() == np.flatnonzero(matches)[:500].tolist()
+
+    empty = explorer_page(sel, search="no such id", columns=["Violation_ID", "Officer_ID"])
+    assert (empty["total"], empty["page"], empty["pages"]) == (0, 0, 1)
+    assert empty["frame"].empty and list(empty["frame"].columns) == ["Violation_ID", "Officer_ID"]
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+def test_sort_is_stable_on_ties(dataset, violations, ascending):
+    sel = _selection(dataset)
+    # Few values, so most rows tie with others; ties keep frame order
+    selected = violations[violations["State"].isin(dataset.filter_options["State"][:6])]
+    expected = selected.sort_values("Violation_Type", ascending=ascending, kind="stable").index
+    result = explorer_page(sel, page=2, page_size=100, sort_by="Violation_Type", ascending=ascending,
+                           columns=["Violation_Type"])
+    assert result["frame"].index.tolist() == expected[200:300].tolist()
+    # Missing values sort last either way
+    speeds = explorer_page(sel, page_size=len(selected), sort_by="Recorded_Speed", ascending=ascending,
+                           columns=["Recorded_Speed"])["frame"]["Recorded_Speed"]
+    n_missing = selected["Recorded_Speed"].isna().sum()
+    assert n_missing and speeds.iloc[-n_missing:].isna().all() and speeds.iloc[:-n_missing].notna().all()
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from figure_cache import FigureCache, render_png
+
+
+def test_concurrent_misses_build_once():
+    cache = FigureCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"png"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_build("k", build))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [b"png"] * 8 and len(calls) == 1
+    assert cache.misses == 1 and cache.hits == 7
+
+
+def test_failed_build_is_retried_by_waiters():
+    cache = FigureCache()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("render failed")
+
+    errors = []
+
+    def first():
+        try:
+            cache.get_or_build("k", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    waiter_result = []
+    waiter = threading.Thread(target=lambda: waiter_result.append(cache.get_or_build("k", lambda: b"ok")))
+    waiter.start()
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+    # The waiter does not hang on the failed build; it builds the image itself
+    assert len(errors) == 1 and waiter_result == [b"ok"]
+    assert cache.get("k") == b"ok"
+
+
+def test_lru_eviction():
+    cache = FigureCache(max_bytes=30)
+    for key in "abc":
+        cache.get_or_build(key, lambda: b"x" * 10)
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.get_or_build("d", lambda: b"x" * 10)
+    assert cache.bytes_used == 30
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    # Too big to keep at all: returned, not stored, and nothing evicted for it
+    assert cache.get_or_build("big", lambda: b"x" * 31) == b"x" * 31
+    assert cache.get("big") is None and cache.bytes_used == 30
+
+
+def test_new_dataset_version_misses():
+    cache = FigureCache()
+    built = []
+
+    def chart(version, selection):
+        key = (version, "Overview Dashboard", "top_states", selection)
+        return cache.get_or_build(key, lambda: built.append(key) or repr(key).encode())
+
+    chart("v1", (("State", ("Goa",)),))
+    chart("v1", (("State", ("Goa",)),))
+    assert len(built) == 1
+    # An appended or reloaded dataset has a new version, so nothing stale is served
+    assert chart("v2", (("State", ("Goa",)),)) != chart("v1", (("State", ("Goa",)),))
+    assert len(built) == 2
+
+
+def test_render_png_closes_the_figure():
+    plt = pytest.importorskip("matplotlib.pyplot")
+    fig, ax = plt.subplots()
+    ax.plot([1, 2, 3])
+    png = render_png(fig)
+    assert png.startswith(b"\x89PNG") and not plt.fignum_exists(fig.number)
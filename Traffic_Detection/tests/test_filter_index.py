@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from engine import Dataset
+from filter_index import FilterIndex
+
+
+def _frame():
+    return pd.DataFrame({
+        "State": pd.Categorical(["Goa", "Kerala", "Goa", "Delhi", "Kerala", "Goa", "Delhi", "Goa", "Kerala"]),
+        "Violation_Type": pd.Categorical(["Speeding", "Parking", "Parking", "Speeding", "Speeding",
+                                          "Parking", "Parking", "Speeding", "Parking"]),
+        "Weather_Condition": pd.Categorical(["Clear", None, "Rainy", "Clear", None, "Rainy", None, "Clear", "Foggy"]),
+        "Fine_Amount": [100, 200, 300, 400, 500, 600, 700, 800, 900],
+    })
+
+
+def _isin(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in selections.items():
+        mask &= df[col].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+
+SELECTIONS = [
+    {},
+    {"State": ["Goa", "Kerala"]},
+    {"Weather_Condition": [np.nan]},
+    {"Weather_Condition": ["Clear", np.nan], "State": ["Kerala", "Delhi"]},
+    {"Weather_Condition": ["Clear", "Rainy", "Foggy"]},
+    {"Weather_Condition": [None, "Foggy"], "Violation_Type": ["Parking"]},
+    {"State": []},
+]
+
+
+def test_select_matches_isin():
+    df = _frame()
+    index = FilterIndex(df)
+    for selections in SELECTIONS:
+        assert index.select(selections).tolist() == _isin(df, selections).tolist(), selections
+        # Memoized on the second call
+        assert index.select(selections).tolist() == _isin(df, selections).tolist(), selections
+
+
+def test_missing_values_selected_by_nan():
+    # Every option, NaN included, selects every row; regression for missing rows being dropped
+    df = _frame()
+    options = {col: list(df[col].unique()) for col in ["State", "Violation_Type", "Weather_Condition"]}
+    assert len(FilterIndex(df).select(options)) == len(df)
+    sel = Dataset(df).select(options)
+    assert sel.value("matched_rows") == sel.value("total_violations") == len(df)
+
+
+def test_extended_matches_full_index():
+    df = _frame()
+    # The first part has no missing weather; the appended rows bring the first ones
+    index = FilterIndex(df.iloc[:1]).extended(df.iloc[1:].reset_index(drop=True))
+    for selections in SELECTIONS:
+        assert index.select(selections).tolist() == _isin(df, selections).tolist(), selections
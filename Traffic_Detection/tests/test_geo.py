@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import geo
+
+
+def test_grid_cells_round_trip():
+    lat = pd.Series([28.61, 28.90, 28.61, -33.9, np.nan, 12.97])
+    lon = pd.Series([77.20, 77.10, 77.20, 151.2, 77.59, None])
+    cells = geo.grid_cells(lat, lon)
+    assert str(cells.dtype) == "Int64"
+    # Missing either coordinate: no cell
+    assert cells.isna().tolist() == [False, False, False, False, True, True]
+    assert cells[0] == cells[2] and cells[0] != cells[1]
+    # Each point lies in the cell whose centre is within half a cell of it
+    centre_lat, centre_lon = geo.cell_centers(cells[:4].astype("int64"))
+    assert np.all(np.abs(centre_lat - lat[:4]) <= geo.GRID_DEGREES / 2)
+    assert np.all(np.abs(centre_lon - lon[:4]) <= geo.GRID_DEGREES / 2)
+    # Text coordinates parse like numbers
+    assert geo.grid_cells(pd.Series(["28.61"]), pd.Series(["77.20"]))[0] == cells[0]
+
+
+def test_points():
+    counts = pd.Series({"Delhi": 5, "Atlantis": 3, "Goa": 1})
+    points = geo.state_points(counts, pd.Series({"Delhi": 500.0}))
+    # States without a known centroid are left off the map
+    assert points["label"].tolist() == ["Delhi", "Goa"]
+    assert points["fines"].tolist() == [500.0, 0.0]
+    assert points[["lat", "lon"]].to_numpy().tolist() == [list(geo.STATE_COORDS["Delhi"]), list(geo.STATE_COORDS["Goa"])]
+
+    cells = geo.grid_cells(pd.Series([10.1, 20.1, 30.1]), pd.Series([70.1, 75.1, 80.1])).astype("int64")
+    grid = geo.grid_points(pd.Series([1, 9, 4], index=cells), pd.Series([10.0, 90.0], index=cells[:2]), max_points=2)
+    assert grid["count"].tolist() == [9, 4] and grid["fines"].tolist() == [90.0, 0.0]
+
+
+def test_build_map_html():
+    pytest.importorskip("folium")
+    counts = pd.Series({"Delhi": 5, "Goa": 1, "Kerala": 2})
+    html = geo.build_map_html(geo.state_points(counts, counts * 100.0))
+    assert html.startswith("<!DOCTYPE html>") and html.count("L.circleMarker(") == 3
+    assert "Delhi: 5" in html and "₹500" in html
+    # No points still gives a map
+    assert "L.map(" in geo.build_map_html(geo.state_points(counts.iloc[:0], counts.iloc[:0]))
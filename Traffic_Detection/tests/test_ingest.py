@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from engine import Dataset
+from ingest import LAZY_COLUMNS, STRING_COLUMNS, YES_NO_COLUMNS, load_compact, yes_no
+
+
+def test_yes_no():
+    raw = pd.Series(["Yes", "No", None, "Maybe", "Yes"], dtype="category")
+    assert yes_no(raw).tolist() == [True, False, pd.NA, pd.NA, True]
+    assert yes_no(raw.astype(object)).dtype == "boolean"
+
+
+def test_cleaned_dtypes(violations, violations_csv):
+    raw = pd.read_csv(violations_csv).set_index("Violation_ID")
+    for col in YES_NO_COLUMNS:
+        assert violations[col].dtype == "boolean"
+        expected = raw.loc[violations["Violation_ID"], col].eq("Yes").to_numpy()
+        assert (violations[col].to_numpy() == expected).all()
+    assert violations["Status"].eq("Paid").equals(violations["Fine_Paid"].astype(bool))
+    for col in ("Officer_ID", "Time", "Comments"):
+        assert col in STRING_COLUMNS and isinstance(violations[col].dtype, pd.StringDtype)
+
+
+def test_lazy_officer_ids_match(violations_csv, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "violations.csv"
+    path.write_bytes(open(violations_csv, "rb").read())
+    df, lazy = load_compact(str(path))
+    assert "Officer_ID" not in df.columns and lazy.columns == LAZY_COLUMNS
+    compact = Dataset(df, lazy=lazy)
+    full = Dataset(compact.frame())
+    # Sketches and search read the lazy column and agree with an in-memory one
+    states = compact.filter_options["State"][:3]
+    types = compact.filter_options["Violation_Type"][:2]
+    for filters in ({}, {"State": states, "Violation_Type": types}):
+        want = full.select(filters).value("top_entities")["top"][("Officer_ID", "count")]
+        got = compact.select(filters).value("top_entities")["top"][("Officer_ID", "count")]
+        pd.testing.assert_frame_equal(got, want)
+    officer = full.df["Officer_ID"].iloc[0]
+    assert (compact.search(officer.lower()) == full.search(officer)).all()
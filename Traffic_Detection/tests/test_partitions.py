@@ -0,0 +1,77 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from dedup import POLICIES
+from ingest import load_dataset
+from partitions import discover, listing_key, load_partitioned, partition_dates
+
+
+@pytest.fixture(scope="module")
+def partitioned(violations_csv, tmp_path_factory):
+    """Three weeks of the fixture CSV, plus changed copies of some IDs, split by
+    day and, for two states, by state.
+
+    Returns (root, the concatenation of the files in discover() order, the
+    rows of the one file without partition keys).
+    """
+    df = pd.read_csv(violations_csv)
+    df = df[df["Date"] < (pd.Timestamp(df["Date"].min()) + pd.Timedelta(days=21)).strftime("%Y-%m-%d")]
+    copies = df.iloc[:40].copy()
+    copies.loc[:19, "Fine_Amount"] += 1
+    # Later copies fall on other days, so they land in other files
+    copies["Date"] = (pd.to_datetime(copies["Date"]) + pd.Timedelta(days=3)).dt.strftime("%Y-%m-%d")
+    df = pd.concat([df, copies], ignore_index=True)
+    root = tmp_path_factory.mktemp("partitioned")
+    split = df["Location"].where(df["Location"].isin(df["Location"].unique()[:2]), "")
+    for (date, state), part in df.groupby(["Date", split]):
+        folder = root / f"Date={date}" / (f"Location={state}" if state else "")
+        folder.mkdir(parents=True, exist_ok=True)
+        part.to_csv(folder / "part-0.csv" if state else folder / "rest.csv", index=False)
+    # A file without partition keys is always read
+    extra = df.iloc[-5:]
+    extra.to_csv(root / "extra.csv", index=False)
+    concat = pd.concat([pd.read_csv(path) for path in discover(root)["path"]], ignore_index=True)
+    return str(root), concat, extra
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_matches_the_concatenated_csv(partitioned, tmp_path, policy):
+    root, concat, _ = partitioned
+    path = tmp_path / "all.csv"
+    concat.to_csv(path, index=False)
+    expected = load_dataset(str(path), use_cache=False, policy=policy)
+    df, _, conflicts = load_partitioned(root, max_workers=1, use_cache=False, policy=policy)
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+    assert len(conflicts) > 0
+
+
+def test_date_range_prunes_files(partitioned):
+    root, concat, extra = partitioned
+    first, last = partition_dates(root)
+    assert (first, last) == (pd.Timestamp(concat["Date"].min()).date(), pd.Timestamp(concat["Date"].max()).date())
+    window = (first + datetime.timedelta(days=5), first + datetime.timedelta(days=12))
+    df, version, _ = load_partitioned(root, date_range=window, max_workers=1, use_cache=False)
+    days = df["Timestamp"].dt.date
+    # Only the window's day directories, plus the unkeyed file
+    outside = ~days.between(*window)
+    assert outside.sum() <= 5 and df["Violation_ID"][outside].isin(extra["Violation_ID"]).all()
+    assert days.between(*window).sum() > 0
+    assert version != load_partitioned(root, max_workers=1, use_cache=False)[1]
+
+
+def test_listing_key_changes_with_the_files(tmp_path):
+    folder = tmp_path / "State=Goa"
+    folder.mkdir()
+    (folder / "a.csv").write_text("Violation_ID\n1\n")
+    key = listing_key(str(tmp_path))
+    assert listing_key(str(tmp_path)) == key
+    (folder / "b.csv").write_text("Violation_ID\n2\n")
+    added = listing_key(str(tmp_path))
+    assert added != key
+    (folder / "b.csv").write_text("Violation_ID\n2\n3\n")
+    assert listing_key(str(tmp_path)) != added
+    os.remove(folder / "b.csv")
+    assert listing_key(str(tmp_path)) == key
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import engine
+import report
+
+pytest.importorskip("matplotlib")
+
+
+def test_report_renders_every_page(violations_csv, tmp_path, capsys):
+    state = sorted(engine.Dataset.from_csv(violations_csv).filter_options["State"])[0]
+    out = tmp_path / "reports"
+    assert report.main(["--source", violations_csv, "--out", str(out), "--workers", "1",
+                        "--states", report.NATIONAL, state, "--format", "html", "pdf"]) == 0
+    assert "wrote 5 files" in capsys.readouterr().out
+    assert sorted(os.listdir(out)) == sorted(["index.html", "All_States.html", "All_States.pdf",
+                                              f"{report.slug(state)}.html", f"{report.slug(state)}.pdf"])
+    national = (out / "All_States.html").read_text(encoding="utf-8")
+    for feature in engine.PAGE_AGGREGATIONS:
+        assert f"<h2>{feature.replace('&', '&amp;')}</h2>" in national
+    assert "No violations recorded" not in national
+    assert (out / "All_States.pdf").read_bytes().startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("feature", list(engine.PAGE_AGGREGATIONS))
+def test_every_page_has_output(violations_csv, feature):
+    report._dataset = engine.Dataset.from_csv(violations_csv)
+    try:
+        job = report.render_job(report.NATIONAL, feature)
+    finally:
+        report._dataset = None
+    assert job["tables"] or job["images"]
+    assert all(png.startswith(b"\x89PNG") for png in job["images"])
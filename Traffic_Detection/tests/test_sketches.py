@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from sketches import EXACT_LIMIT, HLL_PRECISION, SketchCube, hll_error
+
+# HyperLogLog's relative standard error is 1.04 / sqrt(registers); allow four of them
+HLL_TOLERANCE = 4 * 1.04 / np.sqrt(1 << HLL_PRECISION)
+# Small enough that Officer_ID overflows it and the summaries carry errors
+CAPACITY = 32
+
+
+def _chunked(df, n=4, **kwargs):
+    bounds = np.linspace(0, len(df), n + 1).astype(int)
+    sketches = SketchCube.build(df.iloc[:0], **kwargs)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        sketches = sketches.merge(SketchCube.build(df.iloc[lo:hi], **kwargs))
+    return sketches
+
+
+def test_distinct_counts(violations):
+    whole, merged = SketchCube.build(violations), _chunked(violations)
+    busiest = list(violations["State"].value_counts().index[:8])
+    for selections in ({}, {"State": busiest}):
+        rows = violations[violations["State"].isin(selections["State"])] if selections else violations
+        # Few values: counted exactly
+        for col in ("Registration_State", "Previous_Violations"):
+            assert whole.distinct(col, selections) == merged.distinct(col, selections) == rows[col].nunique()
+        true = rows["Officer_ID"].nunique()
+        assert true > EXACT_LIMIT
+        estimate = whole.distinct("Officer_ID", selections)
+        assert abs(estimate - true) <= HLL_TOLERANCE * true
+        # Registers merge by max, so chunks give the very same estimate
+        assert merged.distinct("Officer_ID", selections) == estimate
+        # The error shown next to the estimate; none for exact counts
+        assert whole.distinct_error("Officer_ID", selections) == hll_error() == pytest.approx(0.0081, abs=1e-4)
+        assert whole.distinct_error("Registration_State", selections) == 0.0
+
+
+@pytest.mark.parametrize("measure", ["count", "fines"])
+def test_top_k_bounds(violations, measure):
+    grouped = violations.groupby("Officer_ID", observed=True)["Fine_Amount"]
+    true = grouped.size() if measure == "count" else grouped.sum()
+    for sketches in (SketchCube.build(violations, capacity=CAPACITY), _chunked(violations, capacity=CAPACITY)):
+        top = sketches.top("Officer_ID", measure, {}, n=CAPACITY)
+        assert len(top) == CAPACITY
+        weights = true[top["Officer_ID"]].to_numpy()
+        # Estimates never undercount; estimate - error never overcounts
+        assert (top["estimate"].to_numpy() >= weights - 1e-6).all()
+        assert (top["estimate"].to_numpy() - top["error"].to_numpy() <= weights + 1e-6).all()
+        # Anything no cell monitors weighs at most the summed floors
+        floor = sketches.floors["Officer_ID", measure].sum()
+        monitored = set(sketches.tops["Officer_ID", measure]["item"])
+        assert true[~true.index.isin(monitored)].max() <= floor + 1e-6
+
+
+def test_top_k_exact_within_capacity(violations):
+    # Fewer values than the capacity: no errors, the counts are exact
+    sketches = _chunked(violations)
+    top = sketches.top("Previous_Violations", "count", {}, n=sketches.capacity)
+    assert (top["error"] == 0).all()
+    expected = violations["Previous_Violations"].value_counts()
+    assert dict(zip(top["Previous_Violations"], top["estimate"].astype(int))) == expected.to_dict()
+    rows, fines = sketches.totals({})
+    assert rows == len(violations)
+    assert fines == pytest.approx(violations["Fine_Amount"].sum())
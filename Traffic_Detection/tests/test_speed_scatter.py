@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import engine
+from engine import Dataset
+
+
+@pytest.fixture
+def dataset(violations):
+    return Dataset(violations)
+
+
+def _expected(violations):
+    clean = violations[["Speed_Limit", "Recorded_Speed"]].dropna()
+    excess = clean["Recorded_Speed"] - clean["Speed_Limit"]
+    return clean, (excess > 0).mean() * 100, excess[excess > 0].mean()
+
+
+def test_annotations_match_the_selection(dataset, violations):
+    states = dataset.filter_options["State"][:4]
+    scatter = dataset.select({"State": states}).value("speed_scatter")
+    clean, pct_over, avg_excess = _expected(violations[violations["State"].isin(states)])
+    assert scatter["records"] == len(clean) > 0
+    assert scatter["pct_over"] == pytest.approx(pct_over) and scatter["avg_excess"] == pytest.approx(avg_excess)
+    x, y = scatter["points"]
+    np.testing.assert_array_equal(x, clean["Speed_Limit"])
+    np.testing.assert_array_equal(y, clean["Recorded_Speed"])
+
+
+def test_switches_to_density_above_max_points(dataset, violations, monkeypatch):
+    n = len(violations[["Speed_Limit", "Recorded_Speed"]].dropna())
+    monkeypatch.setattr(engine.speed_scatter, "__defaults__", (n,))
+    at_limit = dataset.select({}).value("speed_scatter")
+    assert at_limit["density"] is None and len(at_limit["points"][0]) == n
+
+    monkeypatch.setattr(engine.speed_scatter, "__defaults__", (n - 1,))
+    over = Dataset(violations).select({}).value("speed_scatter")
+    counts, xedges, yedges = over["density"]
+    assert over["points"] is None and counts.shape == (engine.SCATTER_BINS, engine.SCATTER_BINS)
+    assert counts.sum() == n and over["records"] == n
+    # Same annotations whichever way the points are drawn
+    assert (over["pct_over"], over["avg_excess"]) == (at_limit["pct_over"], at_limit["avg_excess"])
+
+
+def test_memoized_per_selection(dataset, monkeypatch):
+    calls = []
+    original = engine.speed_scatter
+    monkeypatch.setattr(engine, "speed_scatter", lambda x, y: calls.append(1) or original(x, y))
+    states = dataset.filter_options["State"][:3]
+    first = dataset.select({"State": states}).value("speed_scatter")
+    # A later rerun with the same filters reuses it, as does a change to a filter it ignores
+    assert dataset.select({"State": states, "threshold": 2}).value("speed_scatter") is first
+    assert len(calls) == 1
+    dataset.select({"State": states[:2]}).value("speed_scatter")
+    assert len(calls) == 2
+
+
+def test_chart_draws_points_or_density(violations):
+    plt = pytest.importorskip("matplotlib.pyplot")
+    from matplotlib.collections import PathCollection, QuadMesh
+
+    import charts
+
+    clean = violations[["Speed_Limit", "Recorded_Speed"]].dropna()
+    for max_points, artist in ((len(clean), PathCollection), (len(clean) - 1, QuadMesh)):
+        fig, ax = plt.subplots()
+        charts.plot_scatter_with_ref(ax, clean["Speed_Limit"], clean["Recorded_Speed"], "Speed", max_points)
+        assert any(isinstance(c, artist) for c in ax.collections)
+        assert f"{len(clean):,} records" in ax.texts[0].get_text()
+        plt.close(fig)
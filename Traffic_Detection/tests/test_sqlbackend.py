@@ -0,0 +1,107 @@
+import datetime
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sqlbackend
+from bench.sql_parity import differences, random_filters
+from bench.synth import generate_chunk
+from cube import DATE_RANGE
+from dedup import POLICIES
+from engine import NODES, PAGE_AGGREGATIONS, Dataset
+
+pytest.importorskip("duckdb")
+
+# Row-level pages: not served by SQL, and the same pandas code either way
+ROW_PAGES = ["Data Explorer", "Pattern Mining"]
+
+
+@pytest.fixture(scope="module")
+def source(violations_csv, tmp_path_factory):
+    """The fixture CSV plus later copies of 60 of its IDs, 20 of them changed."""
+    df = pd.read_csv(violations_csv)
+    copies = df.iloc[:60].copy()
+    copies.loc[:19, "Fine_Amount"] += 1
+    path = tmp_path_factory.mktemp("sql") / "violations.csv"
+    pd.concat([df, copies], ignore_index=True).to_csv(path, index=False)
+    return str(path)
+
+
+def _selections(dataset):
+    options = dataset.filter_options
+    every = {col: list(values) for col, values in options.items()}
+    first, last = dataset.date_bounds
+    selections = [
+        {},
+        every,
+        {**every, "State": options["State"][:3]},
+        # Missing weather alone, and with a value
+        {**every, "Weather_Condition": [np.nan]},
+        {**every, "Weather_Condition": [np.nan, "Clear"]},
+        # Nothing selected, and a date window with no rows
+        {**every, "State": []},
+        {**every, DATE_RANGE: (last + datetime.timedelta(days=1), last + datetime.timedelta(days=30))},
+        {**every, DATE_RANGE: (first, first + datetime.timedelta(days=20))},
+    ]
+    rng = random.Random(0)
+    return selections + [random_filters(dataset, rng) for _ in range(10)]
+
+
+def _plain(options):
+    return {col: [None if pd.isna(v) else str(v) for v in values] for col, values in options.items()}
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_queries_match_pandas(source, policy):
+    reference = Dataset.from_csv(source, policy)
+    backend = sqlbackend.SqlBackend.from_csv(source, policy, use_cache=False)
+    assert backend.total({}) == len(reference.df) == 3000
+    empty = 0
+    for filters in _selections(reference):
+        sel = reference.select(filters)
+        empty += sel.empty
+        for name in sqlbackend.QUERIES:
+            assert backend.answers(name)
+            expected, actual = NODES[name].compute(sel), backend.value(name, filters)
+            assert not differences(expected, actual, name), (filters, differences(expected, actual, name))
+    assert empty >= 2
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_dataset_loads_rows_on_first_pandas_node(source, policy):
+    reference = Dataset.from_csv(source, policy)
+    dataset = Dataset.from_csv(source, policy, backend="duckdb")
+    # The sidebar and every SQL node come from the database
+    assert _plain(dataset.filter_options) == _plain(reference.filter_options)
+    assert dataset.date_bounds == reference.date_bounds
+    assert dataset.n_rows == reference.n_rows
+    assert len(dataset.conflicts) == len(reference.conflicts) == 20
+    for filters in _selections(reference):
+        sel = dataset.select(filters)
+        assert sel.empty == reference.select(filters).empty
+        for name in sqlbackend.QUERIES:
+            sel.value(name)
+    assert not {"df", "cubes", "index", "moments", "sketches"} & set(vars(dataset))
+
+    # Pages mixing SQL and pandas nodes load the rows once something needs them
+    for filters in _selections(reference):
+        for feature, aggregate in PAGE_AGGREGATIONS.items():
+            if feature in ROW_PAGES:
+                continue
+            expected, actual = aggregate(reference.select(filters)), aggregate(dataset.select(filters))
+            assert not differences(expected, actual, feature), (filters, differences(expected, actual, feature))
+    assert "df" in vars(dataset) and len(dataset.df) == len(reference.df)
+
+
+def test_frame_order_of_options(tmp_path):
+    # Values first seen late in the file but early in time come first, like Series.unique()
+    df = generate_chunk(200, seed=11, days=30)
+    df = pd.concat([df, df.iloc[:1].assign(Violation_ID="LATE", Location="Atlantis", Date="2000-01-01")],
+                   ignore_index=True)
+    path = tmp_path / "violations.csv"
+    df.to_csv(path, index=False)
+    dataset = Dataset.from_csv(str(path), backend="duckdb")
+    assert dataset.filter_options["State"][0] == "Atlantis"
+    assert _plain(dataset.filter_options) == _plain(Dataset.from_csv(str(path)).filter_options)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.sql_parity import differences
+from bench.synth import generate_chunk
+from dedup import KEY_COLUMN
+from engine import NODES, Dataset, pattern_mining
+from ingest import clean_frame, read_source
+from streaming import STREAM_POLICY
+
+# Nodes that read rows, which a streamed dataset does not keep
+ROW_NODES = [name for name, node in NODES.items() if node.rows]
+# Read from the sketches, which a streamed dataset has for whole states only
+SKETCH_NODES = ["distinct_officers", "distinct_officers_error", "top_entities"]
+
+
+def _selections(dataset):
+    options = dataset.filter_options
+    every = {col: list(values) for col, values in options.items()}
+    return [
+        {},
+        every,
+        {**every, "State": options["State"][:3]},
+        {**every, "Weather_Condition": [np.nan, "Clear"]},
+        {**every, "State": []},
+    ]
+
+
+def _ranked(top):
+    """Top-k tables in an order that does not depend on ties."""
+    return {key: frame.astype({frame.columns[0]: str}).sort_values(["estimate", frame.columns[0]], ignore_index=True)
+            for key, frame in top.items()}
+
+
+@pytest.fixture(scope="module")
+def memory(violations):
+    return Dataset(violations)
+
+
+@pytest.mark.parametrize("chunksize", [700, 5000])
+def test_stream_matches_memory(violations_csv, memory, chunksize):
+    streamed = Dataset.from_stream(violations_csv, chunksize)
+    assert streamed.streamed and streamed.df.empty
+    assert streamed.n_rows == memory.n_rows
+    assert {col: set(map(str, values)) for col, values in streamed.filter_options.items()} == \
+        {col: set(map(str, values)) for col, values in memory.filter_options.items()}
+    assert streamed.stats["missing"].to_dict() == memory.stats["missing"].to_dict()
+    for filters in _selections(memory):
+        expected, actual = memory.select(filters), streamed.select(filters)
+        for name in NODES:
+            if name in ROW_NODES:
+                continue
+            want, got = expected.value(name), actual.value(name)
+            if name in SKETCH_NODES and actual.sketches is None:
+                assert got is None
+                continue
+            if name == "top_entities":
+                # Ties may come out in either order
+                want, got = dict(want, top=_ranked(want["top"])), dict(got, top=_ranked(got["top"]))
+            assert not differences(want, got, name), (filters, differences(want, got, name))
+
+
+def test_views_that_need_rows(violations_csv):
+    streamed = Dataset.from_stream(violations_csv, 1000)
+    sel = streamed.select({})
+    for name in ROW_NODES:
+        assert sel.value(name) is None
+    assert pattern_mining(sel)["encoded"] is None
+    assert streamed.date_bounds is None
+    with pytest.raises(ValueError):
+        streamed.appended(pd.DataFrame())
+    # Sketches split by State only: a narrower selection has none to rank,
+    # while the exact counts still come from the cubes
+    narrowed = streamed.select({"Violation_Type": streamed.filter_options["Violation_Type"][:1]})
+    assert narrowed.value("top_entities") is None and narrowed.value("distinct_officers") is None
+    assert narrowed.value("distinct_types") == 1
+
+
+def test_first_copy_kept_across_chunks(tmp_path):
+    df = generate_chunk(300, seed=9, days=30)
+    # Later copies of early IDs: 20 changed, 30 identical
+    copies = df.iloc[:50].copy()
+    copies.loc[:19, "Fine_Amount"] += 1
+    path = tmp_path / "dupes.csv"
+    pd.concat([df, copies], ignore_index=True).to_csv(path, index=False)
+
+    streamed = Dataset.from_stream(str(path), 100)
+    rows, conflicts = clean_frame(read_source(str(path)), STREAM_POLICY)
+    expected = Dataset(rows)
+    assert streamed.n_rows == expected.n_rows == 300
+    assert streamed.select({}).value("total_fines") == pytest.approx(expected.select({}).value("total_fines"))
+    assert sorted(streamed.conflicts[KEY_COLUMN]) == sorted(conflicts[KEY_COLUMN]) == sorted(df[KEY_COLUMN].iloc[:20])
+
+
+def test_stream_needs_first_seen(violations_csv):
+    with pytest.raises(ValueError):
+        Dataset.from_source(violations_csv, "last", ingest="stream")
+    assert Dataset.from_source(violations_csv, STREAM_POLICY, ingest="stream").streamed
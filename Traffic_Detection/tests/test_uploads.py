@@ -0,0 +1,97 @@
+import io
+import os
+import time
+
+import pytest
+
+import uploads
+from bench.synth import generate_chunk
+from uploads import UploadJob
+
+# Long enough for the fixture to parse on a slow machine, short enough that a hung job fails the test
+TIMEOUT_SECONDS = 60
+
+
+def _wait(job):
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while not job.finished:
+        assert time.monotonic() < deadline, f"upload stuck in {job.phase!r}"
+        time.sleep(0.01)
+    return job
+
+
+class RecordingJob(UploadJob):
+    """Records (phase, progress()) each time the job reports parsing progress."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = []
+
+    def _parsed(self, count):
+        super()._parsed(count)
+        self.seen.append((self.phase, self.progress()))
+
+
+class RecordingFile(io.BytesIO):
+    """An upload that records the job's progress at every block read."""
+
+    job = None
+
+    def read(self, size=-1):
+        if self.job is not None:
+            self.job.seen.append((self.job.phase, self.job.progress()))
+        return super().read(size)
+
+
+def test_upload_success(violations_csv, tmp_path):
+    data = open(violations_csv, "rb").read()
+    job = _wait(UploadJob("folder/violations.csv", io.BytesIO(data), len(data), folder=str(tmp_path)).start())
+    assert job.phase == "ready" and job.error is None
+    assert job.name == "violations.csv" and os.path.dirname(job.path) == str(tmp_path)
+    assert job.dataset.n_rows == 3000 and job.source is None
+    assert job.progress() == (1.0, "Ready")
+    # The same content again reuses the saved copy
+    again = _wait(UploadJob("violations.csv", io.BytesIO(data), len(data), folder=str(tmp_path)).start())
+    assert again.path == job.path and len(os.listdir(tmp_path)) == 2  # the copy and its cache folder
+
+
+def test_upload_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "COPY_BLOCK_BYTES", 256 * 1024)
+    # Several of the parser's ~1 MB read blocks, so parsing reports progress part way through
+    data = generate_chunk(20_000, seed=5, days=60).to_csv(index=False).encode()
+    source = RecordingFile(data)
+    job = RecordingJob("violations.csv", source, len(data), folder=str(tmp_path))
+    source.job = job
+    assert job.progress() == (0.0, "Waiting for the upload worker")
+    _wait(job.start())
+    assert job.phase == "ready"
+    phases = [phase for phase, _ in job.seen]
+    assert phases[0] == "saving" and "parsing" in phases and phases[-1] == "indexing"
+    assert phases.index("parsing") > phases.index("saving")
+    fractions = [fraction for _, (fraction, _) in job.seen]
+    # The bar only moves forward, within each phase's share of it
+    assert fractions == sorted(fractions) and 0.0 <= fractions[0] and fractions[-1] == pytest.approx(0.8)
+    assert any(0.0 < f < 0.2 for f in fractions) and any(0.2 < f < 0.8 for f in fractions)
+    assert " MB" in next(text for phase, (_, text) in job.seen if phase == "saving")
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"a,b\n1,2\n",
+    b'Violation_ID,Violation_Type,Location,Date,Time\nV1,"unterminated,Goa,2024-01-01,10:00\n',
+    bytes(range(256)) * 50,
+], ids=["empty", "no violations columns", "unterminated quote", "binary"])
+def test_malformed_upload_fails(data, tmp_path):
+    job = _wait(UploadJob("bad.csv", io.BytesIO(data), len(data), folder=str(tmp_path)).start())
+    assert job.phase == "failed" and job.dataset is None
+    assert job.error and job.progress()[1] == "Failed"
+
+
+def test_failed_read_leaves_no_partial_copy(tmp_path):
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("connection reset")
+
+    job = _wait(UploadJob("bad.csv", Broken(b"x"), 1, folder=str(tmp_path)).start())
+    assert job.phase == "failed" and job.error == "OSError: connection reset"
+    assert os.listdir(tmp_path) == []
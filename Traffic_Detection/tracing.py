@@ -0,0 +1,119 @@
+"""Per-stage timing spans for one run: a dashboard rerun or an API request.
+
+    trace = Trace(enabled, page="Overview Dashboard")
+    with trace.span("filter") as span:
+        sel = dataset.select(filters)
+        span.set(rows=sel.cube.total())
+    trace.write_jsonl(path)
+
+A span records its wall time, the change in resident memory and any rows
+or bytes its caller attaches. A disabled Trace hands out one shared no-op
+span, so instrumented code pays a method call per stage; callers guard
+attributes that are costly to compute with trace.enabled.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+# "1" traces every run, whatever the in-app toggle says
+TRACE_ENV = "TRAFFIC_TRACE"
+TRACE_FILE_ENV = "TRAFFIC_TRACE_FILE"
+DEFAULT_TRACE_FILE = os.path.join("traces", "spans.jsonl")
+
+_write_lock = threading.Lock()
+
+
+def enabled_by_env():
+    return os.environ.get(TRACE_ENV, "") not in ("", "0")
+
+
+def trace_file():
+    return os.environ.get(TRACE_FILE_ENV, DEFAULT_TRACE_FILE)
+
+
+def rss_bytes():
+    """Current resident set size (Linux /proc; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, trace, stage, attrs):
+        self.trace = trace
+        self.stage = stage
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.rss = rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.records.append({
+            "stage": self.stage,
+            "offset_ms": round((self.start - self.trace.start) * 1000, 3),
+            "ms": round((end - self.start) * 1000, 3),
+            "rss_delta_mb": round((rss_bytes() - self.rss) / 1024**2, 2),
+            **self.attrs,
+        })
+        return False
+
+
+class Trace:
+    """The spans of one run, in the order they finished."""
+
+    def __init__(self, enabled=False, **context):
+        self.enabled = enabled
+        self.context = context
+        self.records = []
+        self.run = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.start = time.perf_counter()
+
+    def span(self, stage, **attrs):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage, attrs)
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def write_jsonl(self, path=None):
+        """Append one JSON line per span, tagged with the run id and context."""
+        if not self.enabled or not self.records:
+            return
+        path = path or trace_file()
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started))
+        lines = "".join(json.dumps({"run": self.run, "ts": ts, **self.context, **record}, default=str) + "\n"
+                        for record in self.records)
+        with _write_lock:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
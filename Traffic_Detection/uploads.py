@@ -0,0 +1,120 @@
+"""Background ingest of violations CSVs uploaded through the dashboard.
+
+An UploadJob copies the upload to UPLOAD_DIR in blocks, then parses, cleans
+and indexes it with Dataset.from_csv (the same rules and sidecar cache as
+the default source) on a worker thread. The script thread only polls
+progress(); the finished Dataset is published with a single assignment, so
+a reader sees either no dataset or a complete one.
+
+The CSV tokenizer releases the GIL while it parses, so other sessions keep
+rendering. Jobs share one worker: two large uploads at once would only
+compete for the same cores and memory.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dedup import DEFAULT_POLICY
+from engine import Dataset
+
+UPLOAD_DIR = "uploads"
+COPY_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Phase -> (status text, where it starts on the progress bar, where it ends)
+PHASES = {
+    "queued": ("Waiting for the upload worker", 0.0, 0.0),
+    "saving": ("Saving upload", 0.0, 0.2),
+    "parsing": ("Parsing", 0.2, 0.8),
+    "indexing": ("Cleaning and indexing", 0.8, 0.8),
+    "ready": ("Ready", 1.0, 1.0),
+    "failed": ("Failed", 0.0, 0.0),
+}
+
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload")
+
+
+class UploadJob:
+    """One uploaded file on its way to a Dataset.
+
+    source is the uploaded file object (read from the start) and size its
+    length in bytes, when known.
+    """
+
+    def __init__(self, name, source, size=None, folder=UPLOAD_DIR, policy=DEFAULT_POLICY):
+        self.name = os.path.basename(name) or "upload.csv"
+        self.source = source
+        self.folder = folder
+        self.policy = policy
+        self.phase = "queued"
+        self.done = 0
+        self.total = size or 0
+        self.path = None
+        self.error = None
+        self.dataset = None
+
+    def start(self):
+        _worker.submit(self._run)
+        return self
+
+    @property
+    def finished(self):
+        return self.phase in ("ready", "failed")
+
+    def progress(self):
+        """(fraction done from 0 to 1, status text)."""
+        text, start, end = PHASES[self.phase]
+        share = min(self.done / self.total, 1.0) if self.total else 0.0
+        if self.phase in ("saving", "parsing"):
+            text += f" · {self.done / 1024**2:,.1f} of {self.total / 1024**2:,.1f} MB"
+        return start + (end - start) * share, text
+
+    def _run(self):
+        try:
+            self.path = self._save()
+            self.done, self.total = 0, os.path.getsize(self.path)
+            self.phase = "parsing"
+            dataset = Dataset.from_csv(self.path, self.policy, progress=self._parsed)
+            # Published before the phase says so
+            self.dataset = dataset
+            self.phase = "ready"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.phase = "failed"
+        finally:
+            # Let go of the in-memory upload
+            self.source = None
+
+    def _parsed(self, count):
+        self.done = count
+        if count >= self.total:
+            self.phase = "indexing"
+
+    def _save(self):
+        """Copy the upload into folder; returns its path there.
+
+        Files are named by content, so uploading the same file again reuses
+        the saved copy and its sidecar instead of parsing it a second time.
+        """
+        self.phase = "saving"
+        os.makedirs(self.folder, exist_ok=True)
+        stem, ext = os.path.splitext(self.name)
+        tmp = os.path.join(self.folder, f".{stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.blake2b(digest_size=8)
+        try:
+            self.source.seek(0)
+            with open(tmp, "wb") as out:
+                while block := self.source.read(COPY_BLOCK_BYTES):
+                    digest.update(block)
+                    out.write(block)
+                    self.done += len(block)
+        except BaseException:
+            # A failed read leaves no partial copy behind
+            os.remove(tmp)
+            raise
+        path = os.path.join(self.folder, f"{stem}.{digest.hexdigest()}{ext or '.csv'}")
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+        return path